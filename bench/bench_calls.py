@@ -0,0 +1,89 @@
+# Measures user-function calls per second on a recursive fib program.
+#
+# The 'exception' variant rebuilds the old return path, where ReturnNode raised an
+# exception that FuncCall caught, so both strategies can be compared on the same tree.
+#
+#   python bench/bench_calls.py [--n N] [--repeat R]
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as lang
+
+SOURCE = """
+int fib(int n) {
+    if (n < 2) {
+        return n;
+    }
+    return fib(n - 1) + fib(n - 2);
+}
+
+int main() {
+    printf(fib(%d));
+}
+"""
+
+class ReturnException(Exception):
+    def __init__(self, value, var_type):
+        self.value = value
+        self.var_type = var_type
+
+class ExceptionReturnNode(lang.ReturnNode):
+    __slots__ = ()
+
+    def Evaluate(self, frame, func_table):
+        value, var_type = self.expression.Evaluate(frame, func_table)
+        raise ReturnException(value, var_type)
+
+class ExceptionFuncCall(lang.FuncCall):
+    __slots__ = ()
+
+    def Evaluate(self, frame, func_table):
+        try:
+            return lang.FuncCall.Evaluate(self, frame, func_table)
+        except ReturnException as ret:
+            return (ret.value, ret.var_type)
+
+def use_exceptions(node):
+    if isinstance(node, lang.ReturnNode):
+        node.__class__ = ExceptionReturnNode
+    elif type(node) is lang.FuncCall:
+        node.__class__ = ExceptionFuncCall
+    return node
+
+def fib_calls(n):
+    # fib(n) performs 2 * fib(n + 1) - 1 calls
+    a, b = 0, 1
+    for _ in range(n + 1):
+        a, b = b, a + b
+    return 2 * a - 1
+
+def measure(n, variant):
+    ast = lang.Parser.run(SOURCE % n)
+    if variant == 'exception':
+        ast.Transform(use_exceptions)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        lang.execute(ast, 'tree')
+        return time.perf_counter() - start
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--n', type=int, default=20)
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    calls = fib_calls(args.n)
+    print(f"fib({args.n}): {calls} chamadas")
+    for variant in ('exception', 'completion'):
+        best = min(measure(args.n, variant) for _ in range(args.repeat))
+        print(f"{variant:<12}{best:>10.4f} s{calls / best:>14,.0f} chamadas/s")
+
+if __name__ == '__main__':
+    main()
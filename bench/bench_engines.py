@@ -0,0 +1,123 @@
+# Compares the tree-walking interpreter against the bytecode VM, the closure engine and
+# the Python transpiler, on an arithmetic-heavy loop and a call-heavy recursion, reporting each
+# speedup over the tree engine. Then checks that every variant fails the same way on
+# programs whose runtime checks must stay.
+#
+#   python bench/bench_engines.py [--repeat N] [--limits]
+#
+# --limits runs every variant under generous execution limits, to measure their cost.
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as lang
+
+PROGRAMS = {
+    'while': """
+int main() {
+    int i = 0, j = 0, total = 0;
+    while (i < 300) {
+        j = 0;
+        while (j < 300) {
+            total = total + i * j - j / 3;
+            j = j + 1;
+        }
+        i = i + 1;
+    }
+    printf(total);
+}
+""",
+    'recursion': """
+int fib(int n) {
+    if (n < 2) {
+        return n;
+    }
+    return fib(n - 1) + fib(n - 2);
+}
+
+int main() {
+    printf(fib(20));
+}
+""",
+}
+
+# Uses of a variable declared without a value: each must stop the program on every
+# engine, after the same output
+FAILING_SOURCE = """
+int main() {
+    int x;
+    printf(0);
+    %s
+    printf(2);
+}
+"""
+
+FAILING = {
+    'if': "if (x) { printf(1); }",
+    'not': "printf(!x);",
+    'and': "printf(x && 1);",
+    'neg': "printf(-x);",
+    'compare': "printf(x < 1);",
+    'while': "while (x) { x = 0; }",
+}
+
+def run_once(ast, engine, limited=False):
+    limits = lang.Limits(max_steps=10 ** 9, timeout=3600, max_string_size=10 ** 9) if limited else None
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        start = time.perf_counter()
+        lang.execute(ast, engine, limits=limits)
+        elapsed = time.perf_counter() - start
+    return elapsed, output.getvalue()
+
+def check_failing():
+    for name, statement in FAILING.items():
+        for engine in lang.ENGINES:
+            ast = lang.Parser.run(FAILING_SOURCE % statement)
+            lang.Optimizer.run(ast)
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                try:
+                    lang.execute(ast, engine)
+                    failed = False
+                except Exception:
+                    failed = True
+            if not failed or output.getvalue() != "0\n":
+                raise SystemExit(f"'{name}' com engine '{engine}' deveria falhar após imprimir 0; "
+                                 f"imprimiu {output.getvalue()!r}")
+    print(f"{len(FAILING)} programas com variável sem valor: todas as engines falham")
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--limits', action='store_true')
+    args = arg_parser.parse_args()
+
+    print(f"{'programa':<12}{'engine':<8}{'melhor (s)':>12}{'speedup':>10}")
+    for name, source in PROGRAMS.items():
+        baseline = None
+        expected = None
+        for engine in lang.ENGINES:
+            timings = []
+            for _ in range(args.repeat):
+                ast = lang.Parser.run(source)
+                elapsed, output = run_once(ast, engine, args.limits)
+                timings.append(elapsed)
+                if expected is None:
+                    expected = output
+                elif output != expected:
+                    raise SystemExit(f"Saída divergente em '{name}' com engine '{engine}'")
+            best = min(timings)
+            baseline = baseline or best
+            print(f"{name:<12}{engine:<8}{best:>12.4f}{baseline / best:>9.2f}x")
+
+    check_failing()
+
+if __name__ == '__main__':
+    main()
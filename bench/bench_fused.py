@@ -0,0 +1,151 @@
+# Measures the fused nodes on the tree engine: a loop made of the fused shapes runs with no
+# fusion, with each kind of fused node alone and with all of them. --check N then runs N
+# random programs (with unassigned variables and failing operations) fused and unfused,
+# and compares their output and error messages.
+#
+#   python bench/bench_fused.py [--repeat N] [--check N] [--seed S]
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as lang
+
+SOURCE = """
+int main() {
+    int i = 0, n = 200000, total = 0, step = 3, a = 0, b = 0;
+    while (i < n) {
+        total = total + step;
+        if (a == b) {
+            a = a + 2;
+        } else {
+            b = b + 1;
+        }
+        i = i + 1;
+    }
+    printf(total);
+    printf(a);
+    printf(b);
+}
+"""
+
+FUSED = [lang.IncrementVariable, lang.AccumulateVariable, lang.CompareConstant, lang.CompareVariables]
+
+class Capture:
+    def __init__(self):
+        self.text = ''
+
+    def write(self, text):
+        self.text += text
+
+    def flush(self):
+        pass
+
+def fuse_only(kinds):
+    def fuse(node):
+        fused = lang.Fuser.fuse(node)
+        return fused if type(fused) in kinds else node
+    return fuse
+
+def build(source, kinds):
+    ast = lang.Parser.run(source)
+    lang.Optimizer.run(ast, fuse=False)
+    if kinds:
+        ast.Transform(fuse_only(kinds))
+    return ast
+
+def run_once(ast):
+    output = Capture()
+    start = time.perf_counter()
+    try:
+        lang.execute(ast, 'tree', io=lang.ProgramIO(stdout=output))
+    except Exception as e:
+        output.write(f"Erro: {e}\n")
+    return time.perf_counter() - start, output.text
+
+def random_program(rng):
+    ints = ['a', 'b', 'c', 'd']
+    lines = ["int main() {", "    int a = 1, b = 2, c, d = 0;", "    str s = \"x\", t = \"x\";"]
+    loops = 0
+
+    def body(depth):
+        return ' '.join(statement(depth + 1) for _ in range(rng.randint(1, 3)))
+
+    def statement(depth):
+        nonlocal loops
+        x, y = rng.choice(ints), rng.choice(ints)
+        op = rng.choice(list(lang.COMPARISONS))
+        kind = rng.randrange(11 if depth < 3 else 6)
+        if kind == 0:
+            return f"{x} = {x} + {rng.randint(-3, 5)};"
+        if kind == 1:
+            return f"{x} = {x} - {rng.randint(0, 5)};"
+        if kind == 2:
+            return f"{x} = {x} + {y};"
+        if kind == 3:
+            return f"{x} = {y} * 2 - {x};"
+        if kind == 4:
+            return f"printf({x});"
+        if kind == 5:
+            return f"s = s + \"{rng.choice('xy')}\";"
+        if kind == 6:
+            return f"if ({x} {op} {rng.randint(-2, 6)}) {{ {body(depth)} }}"
+        if kind == 7:
+            return f"if ({x} {op} {y}) {{ {body(depth)} }} else {{ {body(depth)} }}"
+        if kind == 8:
+            return f"if (s {rng.choice(['==', '!='])} t) {{ {body(depth)} }}"
+        if kind == 9:
+            return f"if ({rng.randint(0, 5)} {op} {x}) {{ {body(depth)} }}"
+        loops += 1
+        counter = f"i{loops}"
+        lines.insert(1, f"    int {counter} = 0;")
+        return f"while ({counter} < {rng.randint(0, 6)}) {{ {body(depth)} {counter} = {counter} + 1; }}"
+
+    for _ in range(rng.randint(3, 10)):
+        lines.append("    " + statement(0))
+    lines += ["    printf(a + b + d);", "    printf(s);", "}"]
+    return "\n".join(lines)
+
+def check(count, seed):
+    rng = random.Random(seed)
+    for index in range(count):
+        source = random_program(rng)
+        plain = run_once(build(source, []))[1]
+        fused = run_once(build(source, FUSED))[1]
+        if plain != fused:
+            raise SystemExit(f"Saída divergente no programa {index}:\n{source}\n--- sem fusão\n{plain}--- com fusão\n{fused}")
+    print(f"{count} programas aleatórios: mesma saída com e sem fusão")
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--check', type=int, default=500)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args()
+
+    variants = [('sem fusão', [])] + [(kind.__name__, [kind]) for kind in FUSED] + [('todos', FUSED)]
+    baseline = None
+    expected = None
+    print(f"{'nós fundidos':<22}{'melhor (s)':>12}{'speedup':>10}")
+    for label, kinds in variants:
+        timings = []
+        for _ in range(args.repeat):
+            elapsed, output = run_once(build(SOURCE, kinds))
+            timings.append(elapsed)
+            if expected is None:
+                expected = output
+            elif output != expected:
+                raise SystemExit(f"Saída divergente com '{label}'")
+        best = min(timings)
+        baseline = baseline or best
+        print(f"{label:<22}{best:>12.4f}{baseline / best:>9.2f}x")
+
+    if args.check:
+        check(args.check, args.seed)
+
+if __name__ == '__main__':
+    main()
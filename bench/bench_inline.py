@@ -0,0 +1,73 @@
+# Runs a loop calling small helper functions on every engine with the Inliner off and on,
+# checks that both give the same output and reports the speedup of expanding the calls.
+#
+#   python bench/bench_inline.py [--repeat N] [--inline-size N]
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as lang
+
+SOURCE = """
+int sq(int x) {
+    return x * x;
+}
+
+int dist(int x, int y) {
+    return sq(x) + sq(y);
+}
+
+int clamp(int v) {
+    return v - v / 1000 * 1000;
+}
+
+int main() {
+    int i = 0, total = 0;
+    while (i < 100000) {
+        total = clamp(total + dist(i, i + 1) + sq(i - 3));
+        i = i + 1;
+    }
+    printf(total);
+}
+"""
+
+def run_once(engine, inline_size):
+    ast = lang.Parser.run(SOURCE)
+    lang.Optimizer.run(ast, inline_size)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        start = time.perf_counter()
+        lang.execute(ast, engine)
+        elapsed = time.perf_counter() - start
+    return elapsed, output.getvalue()
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--inline-size', type=int, default=lang.DEFAULT_INLINE_SIZE)
+    args = arg_parser.parse_args()
+
+    print(f"{'engine':<10}{'sem expansão (s)':>18}{'com expansão (s)':>18}{'speedup':>10}")
+    for engine in lang.ENGINES:
+        best = {}
+        outputs = set()
+        for inline_size in (0, args.inline_size):
+            timings = []
+            for _ in range(args.repeat):
+                elapsed, output = run_once(engine, inline_size)
+                timings.append(elapsed)
+                outputs.add(output)
+            best[inline_size] = min(timings)
+        if len(outputs) != 1:
+            raise SystemExit(f"Saída divergente com engine '{engine}': {sorted(outputs)}")
+        plain, inlined = best[0], best[args.inline_size]
+        print(f"{engine:<10}{plain:>18.4f}{inlined:>18.4f}{plain / inlined:>9.2f}x")
+
+if __name__ == '__main__':
+    main()
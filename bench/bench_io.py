@@ -0,0 +1,122 @@
+# Compares per-call printf/scanf (print() and input() for every value, as before) against
+# the buffered ProgramIO layer: first the I/O layer alone, then whole programs that print
+# or read many lines, where interpretation overhead dilutes the difference. Each time is
+# the best of --repeat runs, since a single run is too noisy for the smaller gains.
+#
+#   python bench/bench_io.py [--lines N] [--engine tree|vm|closure|python] [--repeat N]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as lang
+
+PRINT_SOURCE = """
+int main() {
+    int i = 0;
+    while (i < %d) {
+        printf(i);
+        i = i + 1;
+    }
+}
+"""
+
+SCAN_SOURCE = """
+int main() {
+    int i = 0, total = 0;
+    while (i < %d) {
+        total = total + scanf();
+        i = i + 1;
+    }
+    printf(total);
+}
+"""
+
+class PerCallIO(lang.ProgramIO):
+    # The previous behaviour: one print() and one input() per value
+    def __init__(self, stdin, stdout):
+        super().__init__(stdin, stdout)
+        self.read_int = self.read_input
+
+    def write(self, value):
+        print(value, file=self.stdout)
+
+    def read_input(self):
+        return int(input())
+
+def time_layer(io_class, input_name, output_name, lines):
+    saved = sys.stdin
+    with open(input_name) as stdin, open(output_name, 'w') as stdout:
+        sys.stdin = stdin
+        try:
+            io = io_class(stdin, stdout)
+            start = time.perf_counter()
+            for i in range(lines):
+                io.write(i)
+            io.flush()
+            middle = time.perf_counter()
+            for _ in range(lines):
+                io.read_int()
+            end = time.perf_counter()
+        finally:
+            sys.stdin = saved
+    return middle - start, end - middle
+
+def run_once(io_class, source, input_name, output_name, engine):
+    ast = lang.Parser.run(source)
+    saved = sys.stdin, sys.stdout
+    with open(input_name) as stdin, open(output_name, 'w') as stdout:
+        sys.stdin, sys.stdout = stdin, stdout
+        try:
+            io = io_class(stdin, stdout)
+            start = time.perf_counter()
+            lang.execute(ast, engine, io=io)
+            elapsed = time.perf_counter() - start
+        finally:
+            sys.stdin, sys.stdout = saved
+    with open(output_name) as output:
+        return elapsed, output.read()
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--lines', type=int, default=10 ** 6)
+    arg_parser.add_argument('--engine', choices=lang.ENGINES, default='vm')
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        input_name = os.path.join(directory, 'input.txt')
+        output_name = os.path.join(directory, 'output.txt')
+        with open(input_name, 'w') as stdin:
+            stdin.writelines(f"{i % 1000}\n" for i in range(args.lines))
+
+        print(f"{'camada':<10}{'E/S':<12}{'escrita (s)':>12}{'leitura (s)':>12}")
+        for label, io_class in (('por chamada', PerCallIO), ('buffer', lang.ProgramIO)):
+            timings = [time_layer(io_class, input_name, output_name, args.lines) for _ in range(args.repeat)]
+            write_time = min(write for write, _ in timings)
+            read_time = min(read for _, read in timings)
+            print(f"{'':<10}{label:<12}{write_time:>12.4f}{read_time:>12.4f}")
+        print()
+
+        print(f"{'programa':<10}{'E/S':<12}{'tempo (s)':>12}{'speedup':>10}")
+        for name, source in (('printf', PRINT_SOURCE), ('scanf', SCAN_SOURCE)):
+            baseline = None
+            expected = None
+            for label, io_class in (('por chamada', PerCallIO), ('buffer', lang.ProgramIO)):
+                runs = [run_once(io_class, source % args.lines, input_name, output_name, args.engine)
+                        for _ in range(args.repeat)]
+                elapsed = min(elapsed for elapsed, _ in runs)
+                output = runs[0][1]
+                if expected is None:
+                    expected = output
+                elif output != expected:
+                    raise SystemExit(f"Saída divergente em '{name}' com E/S '{label}'")
+                baseline = baseline or elapsed
+                print(f"{name:<10}{label:<12}{elapsed:>12.4f}{baseline / elapsed:>9.2f}x")
+
+if __name__ == '__main__':
+    main()
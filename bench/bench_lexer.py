@@ -0,0 +1,71 @@
+# Reports Tokenizer throughput (tokens/s and MB/s) on a large machine-generated program.
+#
+#   python bench/bench_lexer.py [--mb SIZE] [--repeat R]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as lang
+
+FUNCTION_TEMPLATE = """
+int func_{index}(int n, str label) {{
+    int i = 0, total_{index} = {index};
+    str text = "linha gerada numero {index} com um literal um pouco mais longo";
+    while (i < n) {{
+        if (i / 2 * 2 == i && !(total_{index} >= 1000000)) {{
+            total_{index} = total_{index} + i * {index} - (i - 1);
+        }} else {{
+            text = text + label;
+        }}
+        i = i + 1;
+    }}
+    return total_{index};
+}}
+"""
+
+def generate_source(size_bytes):
+    parts = []
+    size = 0
+    index = 0
+    while size < size_bytes:
+        part = FUNCTION_TEMPLATE.format(index=index)
+        parts.append(part)
+        size += len(part)
+        index += 1
+    parts.append("int main() {\n    printf(func_0(10, \"x\"));\n}\n")
+    return ''.join(parts)
+
+def count_tokens(source):
+    tokenizer = lang.Tokenizer(source)
+    count = 0
+    while tokenizer.next.type != 'EOF':
+        tokenizer.selectNext()
+        count += 1
+    return count
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--mb', type=float, default=4.0)
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    source = generate_source(int(args.mb * 1024 * 1024))
+    megabytes = len(source.encode()) / (1024 * 1024)
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        tokens = count_tokens(source)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+
+    print(f"fonte: {megabytes:.2f} MB, {tokens} tokens")
+    print(f"tempo: {best:.3f} s")
+    print(f"vazão: {tokens / best:,.0f} tokens/s, {megabytes / best:.2f} MB/s")
+
+if __name__ == '__main__':
+    main()
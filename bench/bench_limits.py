@@ -0,0 +1,148 @@
+# Runs programs that try to outrun the execution limits on every engine, as separate
+# main.py processes, and checks that each one is stopped with the limit's exit status
+# and, for --timeout, close to the deadline (the slack covers starting Python). The
+# squaring loop takes few steps but huge products: it must stop under --timeout alone.
+# Then times the programs of bench_engines with each limit against no limits: the ratio
+# of each pair of runs made back to back, median of --repeat pairs, which the noise of
+# a busy machine moves less than separate best times.
+#
+#   python bench/bench_limits.py [--engines E ...] [--slack SECONDS] [--repeat N]
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as lang
+from bench_engines import PROGRAMS
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+
+SQUARING = """
+int main() {
+    int x = 3;
+    while (1) {
+        x = x * x;
+    }
+}
+"""
+
+SPIN = """
+int main() {
+    int i = 0;
+    while (1) {
+        i = i + 1;
+    }
+}
+"""
+
+RECURSION = """
+int f(int n) {
+    return f(n + 1);
+}
+
+int main() {
+    printf(f(0));
+}
+"""
+
+GROWING_STRING = """
+int main() {
+    str s = "x";
+    while (1) {
+        s = s + s;
+    }
+}
+"""
+
+# (name, source, limit arguments, expected exit status)
+CASES = [
+    ('quadrados', SQUARING, ['--timeout', '1'], lang.TimeLimitExceeded.exit_code),
+    ('quadrados', SQUARING, ['--max-memory', '1000000'], lang.MemoryLimitExceeded.exit_code),
+    ('laço', SPIN, ['--timeout', '1'], lang.TimeLimitExceeded.exit_code),
+    ('laço', SPIN, ['--max-steps', '100000'], lang.StepLimitExceeded.exit_code),
+    ('recursão', RECURSION, ['--max-steps', '100000'], lang.StepLimitExceeded.exit_code),
+    ('string', GROWING_STRING, ['--max-string-size', '1000000'], lang.StringLimitExceeded.exit_code),
+    ('string', GROWING_STRING, ['--max-memory', '1000000'], lang.MemoryLimitExceeded.exit_code),
+]
+
+# Limits too generous to be reached, timed against no limits
+OVERHEAD = {
+    '--max-steps': dict(max_steps=10 ** 9),
+    '--timeout': dict(timeout=3600),
+    '--max-string-size': dict(max_string_size=10 ** 9),
+    'os três': dict(max_steps=10 ** 9, timeout=3600, max_string_size=10 ** 9),
+}
+
+def timed_run(source, engine, limits):
+    ast = lang.Parser.run(source)
+    lang.Optimizer.run(ast)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        lang.execute(ast, engine, limits=limits)
+        return time.perf_counter() - start
+
+def measure_overhead(engines, repeat):
+    print(f"\n{'programa':<12}{'engine':<10}{'sem limites (s)':>16}" + "".join(f"{name:>19}" for name in OVERHEAD))
+    for name, source in PROGRAMS.items():
+        for engine in engines:
+            ratios = {limit: [] for limit in OVERHEAD}
+            best = None
+            for round_ in range(repeat):
+                for limit, options in OVERHEAD.items():
+                    # Alternates which run of the pair goes first
+                    if round_ % 2:
+                        plain = timed_run(source, engine, None)
+                        limited = timed_run(source, engine, lang.Limits(**options))
+                    else:
+                        limited = timed_run(source, engine, lang.Limits(**options))
+                        plain = timed_run(source, engine, None)
+                    ratios[limit].append(limited / plain)
+                    best = plain if best is None else min(best, plain)
+            print(f"{name:<12}{engine:<10}{best:>16.4f}"
+                  + "".join(f"{statistics.median(values):>18.3f}x" for values in ratios.values()))
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--engines', nargs='+', choices=lang.ENGINES, default=list(lang.ENGINES))
+    arg_parser.add_argument('--slack', type=float, default=2.0)
+    arg_parser.add_argument('--repeat', type=int, default=9)
+    args = arg_parser.parse_args()
+
+    failures = 0
+    print(f"{'programa':<12}{'limite':<28}{'engine':<10}{'saída':>6}{'tempo (s)':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, source, limit, expected in CASES:
+            file_name = os.path.join(directory, f"{name}.c")
+            with open(file_name, 'w') as file:
+                file.write(source)
+            # A run that ignores its limit is killed well after any acceptable stop
+            deadline = float(limit[1]) + args.slack if limit[0] == '--timeout' else 30
+            for engine in args.engines:
+                start = time.perf_counter()
+                try:
+                    status = subprocess.run([sys.executable, MAIN, file_name, '--engine', engine, *limit],
+                                            capture_output=True, timeout=deadline).returncode
+                except subprocess.TimeoutExpired:
+                    status = None
+                elapsed = time.perf_counter() - start
+                ok = status == expected
+                failures += not ok
+                print(f"{name:<12}{' '.join(limit):<28}{engine:<10}{str(status):>6}{elapsed:>11.2f}"
+                      + ("" if ok else f"  ERRO: esperado {expected}"))
+
+    if failures:
+        raise SystemExit(f"{failures} execução(ões) não pararam no limite")
+    print("todas as execuções pararam no limite")
+
+    measure_overhead(args.engines, args.repeat)
+
+if __name__ == '__main__':
+    main()
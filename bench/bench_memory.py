@@ -0,0 +1,69 @@
+# Measures the memory taken by the AST of a large machine-generated program with
+# tracemalloc: total bytes, bytes per node and the ratio to the size of the source, once
+# for the parser's output and again after Optimizer.run. Nodes are counted once each:
+# literals are shared, and count_nodes would count them at every reference.
+# --compare loads another version of the interpreter (e.g. 'git show HEAD~1:main.py >
+# /tmp/old_main.py') and measures the same source with it, for a before/after table.
+#
+#   python bench/bench_memory.py [--mb SIZE] [--compare OTHER_MAIN.py]
+
+import argparse
+import gc
+import importlib.util
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as lang
+from bench_lexer import generate_source
+
+def load_interpreter(path):
+    spec = importlib.util.spec_from_file_location('interpreter_' + str(abs(hash(path))), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def count_unique_nodes(ast):
+    seen = set()
+
+    def visit(node):
+        seen.add(id(node))
+        return node
+
+    ast.Transform(visit)
+    return len(seen)
+
+def measure(interpreter, source):
+    # Bytes and distinct nodes of the parsed AST, then of the same AST once optimized
+    gc.collect()
+    tracemalloc.start()
+    ast = interpreter.Parser.run(source)
+    gc.collect()
+    parsed = (tracemalloc.get_traced_memory()[0], count_unique_nodes(ast))
+    interpreter.Optimizer.run(ast)
+    gc.collect()
+    optimized = (tracemalloc.get_traced_memory()[0], count_unique_nodes(ast))
+    tracemalloc.stop()
+    return {'análise': parsed, 'otimizada': optimized}
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--mb', type=float, default=4.0)
+    arg_parser.add_argument('--compare', metavar='MAIN_PY', help="outra versão de main.py a medir com o mesmo fonte")
+    args = arg_parser.parse_args()
+
+    source = generate_source(int(args.mb * 1024 * 1024))
+    versions = [('atual', lang)]
+    if args.compare:
+        versions.insert(0, (os.path.basename(args.compare), load_interpreter(args.compare)))
+
+    print(f"fonte: {len(source)} bytes")
+    print(f"{'versão':<20}{'AST':<11}{'nós':>10}{'AST (MB)':>12}{'bytes/nó':>12}{'AST/fonte':>12}")
+    for label, interpreter in versions:
+        for phase, (size, nodes) in measure(interpreter, source).items():
+            print(f"{label:<20}{phase:<11}{nodes:>10}{size / 2 ** 20:>12.1f}{size / nodes:>12.1f}{size / len(source):>11.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# Concurrency stress test for the Parser: parses hundreds of programs from a thread
+# pool and checks every AST against the one produced by a serial parse.
+#
+#   python bench/bench_parallel_parse.py [--programs N] [--workers W]
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as lang
+from bench_lexer import generate_source
+
+def fields(node):
+    for cls in type(node).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            if hasattr(node, name):
+                yield name, getattr(node, name)
+
+def ast_dump(node):
+    # Structural form of a tree: node classes and field values, without object identity
+    if isinstance(node, lang.Node):
+        return (type(node).__name__, tuple(sorted((name, ast_dump(value)) for name, value in fields(node))))
+    if isinstance(node, (list, tuple)):
+        return tuple(ast_dump(item) for item in node)
+    return node
+
+def make_programs(count):
+    # Programs of different sizes so the threads interleave at different points
+    return [generate_source(2000 + 150 * (index % 40)) for index in range(count)]
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--programs', type=int, default=300)
+    arg_parser.add_argument('--workers', type=int, default=16)
+    args = arg_parser.parse_args()
+
+    sources = make_programs(args.programs)
+    parser = lang.Parser()
+
+    start = time.perf_counter()
+    expected = [ast_dump(parser.parse(source)) for source in sources]
+    serial = time.perf_counter() - start
+
+    # Switch threads as often as possible to provoke interleaved parses
+    sys.setswitchinterval(1e-6)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(lambda source: ast_dump(parser.parse(source)), sources))
+    parallel = time.perf_counter() - start
+
+    mismatches = sum(1 for got, want in zip(results, expected) if got != want)
+    print(f"{args.programs} programas, {args.workers} threads")
+    print(f"serial: {serial:.3f} s, paralelo: {parallel:.3f} s")
+    if mismatches:
+        raise SystemExit(f"{mismatches} ASTs divergentes entre execução serial e paralela")
+    print("todas as ASTs idênticas")
+
+if __name__ == '__main__':
+    main()
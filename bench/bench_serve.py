@@ -0,0 +1,86 @@
+# Runs the same small program N times as separate processes, once with main.py and once with
+# client.py against a --serve server started here, checks that both give the same output and
+# compares the time per job. The server's own view of the jobs comes from --server-stats.
+#
+#   python bench/bench_serve.py [--runs N] [-j N] [--engine E]
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SOURCE = """
+int fib(int n) {
+    if (n < 2) {
+        return n;
+    }
+    return fib(n - 1) + fib(n - 2);
+}
+
+int main() {
+    int n;
+    n = scanf();
+    printf(fib(n));
+}
+"""
+
+def run_jobs(command, runs):
+    timings = []
+    outputs = set()
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(command, input="15\n", capture_output=True, text=True)
+        timings.append(time.perf_counter() - start)
+        outputs.add((result.returncode, result.stdout, result.stderr))
+    if len(outputs) != 1:
+        raise SystemExit(f"Saída variando entre execuções de {command}: {sorted(outputs)}")
+    timings.sort()
+    return timings, outputs.pop()
+
+def wait_for(path, server):
+    while not os.path.exists(path):
+        if server.poll() is not None:
+            raise SystemExit("O servidor terminou ao iniciar")
+        time.sleep(0.01)
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--runs', type=int, default=30)
+    arg_parser.add_argument('-j', '--jobs', type=int, default=2)
+    arg_parser.add_argument('--engine', default='tree')
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, 'fib.c')
+        with open(file_name, 'w') as file:
+            file.write(SOURCE)
+        path = os.path.join(directory, 'serve.sock')
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'main.py'), '--serve', path, '-j', str(args.jobs)],
+                                  stderr=subprocess.DEVNULL)
+        try:
+            wait_for(path, server)
+            local, expected = run_jobs([sys.executable, os.path.join(ROOT, 'main.py'), file_name, '--engine', args.engine],
+                                       args.runs)
+            client = [sys.executable, os.path.join(ROOT, 'client.py'), '--connect', path]
+            served, output = run_jobs(client + [file_name, '--engine', args.engine], args.runs)
+            if output != expected:
+                raise SystemExit(f"Saída divergente:\nlocal: {expected}\nservidor: {output}")
+            stats = json.loads(subprocess.run(client + ['--server-stats'], capture_output=True, text=True).stdout)
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{'modo':<12}{'mediana (ms)':>14}{'máximo (ms)':>14}")
+    for label, timings in (('local', local), ('servidor', served)):
+        print(f"{label:<12}{timings[len(timings) // 2] * 1000:>14.1f}{timings[-1] * 1000:>14.1f}")
+    print(f"speedup: {local[len(local) // 2] / served[len(served) // 2]:.2f}x")
+    print(f"no servidor: {stats['jobs']} programas, latência p50 {stats['latency_ms']['p50']} ms, "
+          f"p95 {stats['latency_ms']['p95']} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# Builds a long string with 's = s + "x"' in a loop, with ropes and with plain string
+# concatenation (ROPE_THRESHOLD raised so no rope is ever created), and checks the output.
+#
+#   python bench/bench_strings.py [--sizes N ...] [--plain-max N] [--engine tree|vm]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as lang
+
+SOURCE = """
+int main() {
+    str s = "";
+    int i = 0;
+    while (i < %d) {
+        s = s + "x";
+        i = i + 1;
+    }
+    printf(s);
+}
+"""
+
+class Discard:
+    # stdout replacement that only keeps the length of what was written
+    def __init__(self):
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(text)
+
+    def flush(self):
+        pass
+
+def run_once(size, engine, threshold):
+    saved = lang.ROPE_THRESHOLD
+    lang.ROPE_THRESHOLD = threshold
+    try:
+        ast = lang.Parser.run(SOURCE % size)
+        output = Discard()
+        start = time.perf_counter()
+        lang.execute(ast, engine, io=lang.ProgramIO(stdout=output))
+        elapsed = time.perf_counter() - start
+    finally:
+        lang.ROPE_THRESHOLD = saved
+    # The string plus the newline written by printf
+    if output.size != size + 1:
+        raise SystemExit(f"Saída com {output.size} caracteres, esperado {size + 1}")
+    return elapsed
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=[10 ** 4, 10 ** 5, 10 ** 6])
+    arg_parser.add_argument('--plain-max', type=int, default=10 ** 5,
+                            help="maior tamanho medido com concatenação simples, que é quadrática")
+    arg_parser.add_argument('--engine', choices=lang.ENGINES, default='vm')
+    args = arg_parser.parse_args()
+
+    print(f"{'caracteres':>12}{'simples (s)':>14}{'rope (s)':>12}{'speedup':>10}")
+    for size in args.sizes:
+        rope = run_once(size, args.engine, lang.ROPE_THRESHOLD)
+        if size <= args.plain_max:
+            plain = run_once(size, args.engine, float('inf'))
+            print(f"{size:>12}{plain:>14.4f}{rope:>12.4f}{plain / rope:>9.2f}x")
+        else:
+            print(f"{size:>12}{'-':>14}{rope:>12.4f}{'-':>10}")
+
+if __name__ == '__main__':
+    main()
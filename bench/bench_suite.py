@@ -0,0 +1,234 @@
+# Regression suite: runs every program in bench/programs (x.c reads x.in, if it exists) and a
+# large generated source, timing each phase separately over --repeat runs after --warmup runs:
+# Parser.run (tokenizing included: the tokenizer streams tokens to the parser, as in a real
+# run), Optimizer.run and then the execution of the optimized AST on every engine in ENGINES.
+# Reports the median and p95 of each phase and, from one more run under tracemalloc, the
+# memory peak. All engines must print the same output.
+#
+# --save writes the results as a JSON baseline; --compare reads one and exits with status 1
+# when a phase's median or a program's memory peak grew by more than --threshold, or when a
+# program's output changed. Baselines only make sense on the machine that recorded them.
+#
+#   python bench/bench_suite.py [--repeat N] [--warmup N] [--programs NAME ...] [--generated-kb KB]
+#                               [--save FILE] [--compare FILE] [--threshold FRACTION]
+
+import argparse
+import gc
+import hashlib
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as lang
+
+PROGRAMS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'programs')
+
+PHASES = ('parse', 'optimize') + lang.ENGINES
+
+# Phases this short are all noise on a busy machine: a regression also has to add this much
+MIN_DELTA = 0.002
+MIN_DELTA_KB = 64
+
+GENERATED_FUNCTION = """
+/* Generated function {index} */
+int func_{index}(int n, str label) {{
+    int i = 0, total = {index};
+    str text = "texto gerado {index}";
+    while (i < n) {{
+        if (i / 2 * 2 == i && !(total >= 1000000)) {{
+            total = total + i * {index} - (i - 1);
+        }} else {{
+            text = text + label;
+        }}
+        i = i + 1;
+    }}
+    return total;
+}}
+"""
+
+class Digest:
+    # Program stdout that keeps only a hash of what was written
+    def __init__(self):
+        self.hash = hashlib.sha256()
+
+    def write(self, text):
+        self.hash.update(text.encode())
+
+    def flush(self):
+        pass
+
+def generated_source(size_kb):
+    parts = []
+    size = 0
+    index = 0
+    while size < size_kb * 1024:
+        part = GENERATED_FUNCTION.format(index=index)
+        parts.append(part)
+        size += len(part)
+        index += 1
+    calls = ' + '.join(f"func_{i}(20, \"x\")" for i in range(0, index, max(1, index // 50)))
+    parts.append(f"int main() {{\n    printf({calls});\n}}\n")
+    return ''.join(parts)
+
+def load_programs(names, generated_kb):
+    programs = {}
+    for file_name in sorted(os.listdir(PROGRAMS_DIR)):
+        name, extension = os.path.splitext(file_name)
+        if extension != '.c':
+            continue
+        with open(os.path.join(PROGRAMS_DIR, file_name)) as file:
+            source = file.read()
+        input_name = os.path.join(PROGRAMS_DIR, name + '.in')
+        stdin = ''
+        if os.path.exists(input_name):
+            with open(input_name) as file:
+                stdin = file.read()
+        programs[name] = (source, stdin)
+    if generated_kb:
+        programs['generated'] = (generated_source(generated_kb), '')
+    if names:
+        unknown = set(names) - set(programs)
+        if unknown:
+            raise SystemExit(f"Programas desconhecidos: {', '.join(sorted(unknown))}")
+        programs = {name: programs[name] for name in names}
+    return programs
+
+def run_phases(source, stdin):
+    # One run of the whole pipeline; returns the seconds spent in each phase and the output
+    # hash of each engine
+    timings = {}
+    start = time.perf_counter()
+    ast = lang.Parser.run(source)
+    timings['parse'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lang.Optimizer.run(ast)
+    timings['optimize'] = time.perf_counter() - start
+
+    # Engines leave the AST as they found it, so they all run the same one
+    outputs = {}
+    for engine in lang.ENGINES:
+        output = Digest()
+        program_io = lang.ProgramIO(stdin=io.StringIO(stdin), stdout=output)
+        start = time.perf_counter()
+        lang.execute(ast, engine, io=program_io)
+        timings[engine] = time.perf_counter() - start
+        outputs[engine] = output.hash.hexdigest()
+    return timings, outputs
+
+def percentile(values, fraction):
+    # Nearest rank, so that p95 is one of the measured runs
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def measure(name, source, stdin, repeat, warmup):
+    outputs = set()
+    samples = {phase: [] for phase in PHASES}
+    for index in range(warmup + repeat):
+        # Garbage left by the previous run is not collected in the middle of this one
+        gc.collect()
+        try:
+            timings, engine_outputs = run_phases(source, stdin)
+        except Exception as e:
+            raise SystemExit(f"Erro ao executar '{name}': {e}")
+        reference = lang.ENGINES[0]
+        differing = [engine for engine, output in engine_outputs.items() if output != engine_outputs[reference]]
+        if differing:
+            raise SystemExit(f"Saída de '{name}' em {', '.join(differing)} difere da engine {reference}")
+        outputs.add(engine_outputs[reference])
+        if index >= warmup:
+            for phase in PHASES:
+                samples[phase].append(timings[phase])
+    if len(outputs) != 1:
+        raise SystemExit(f"Saída de '{name}' variando entre execuções")
+
+    tracemalloc.start()
+    run_phases(source, stdin)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'phases': {phase: {'median': statistics.median(values), 'p95': percentile(values, 0.95)}
+                   for phase, values in samples.items()},
+        'peak_kb': round(peak / 1024, 1),
+        'output': outputs.pop(),
+    }
+
+def regressions(results, baseline, threshold):
+    found = []
+    for name, result in results.items():
+        before = baseline['programs'].get(name)
+        if before is None:
+            continue
+        if result['output'] != before['output']:
+            found.append(f"{name}: saída diferente da referência")
+        for phase, timing in result['phases'].items():
+            # Baselines recorded before a phase existed have nothing to compare it with
+            if phase not in before['phases']:
+                continue
+            old = before['phases'][phase]['median']
+            new = timing['median']
+            if new > old * (1 + threshold) and new - old > MIN_DELTA:
+                found.append(f"{name}/{phase}: mediana {old * 1000:.2f} ms -> {new * 1000:.2f} ms "
+                             f"(+{(new / old - 1) * 100:.0f}%)")
+        old, new = before['peak_kb'], result['peak_kb']
+        if new > old * (1 + threshold) and new - old > MIN_DELTA_KB:
+            found.append(f"{name}: pico de memória {old:.0f} KB -> {new:.0f} KB (+{(new / old - 1) * 100:.0f}%)")
+    return found
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--warmup', type=int, default=1)
+    arg_parser.add_argument('--programs', nargs='+', metavar='NAME')
+    arg_parser.add_argument('--generated-kb', type=int, default=512)
+    arg_parser.add_argument('--save', metavar='FILE')
+    arg_parser.add_argument('--compare', metavar='FILE')
+    arg_parser.add_argument('--threshold', type=float, default=0.15)
+    args = arg_parser.parse_args()
+    if args.repeat < 1:
+        arg_parser.error("--repeat deve ser pelo menos 1")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+    results = {}
+    print(f"{'programa':<12}{'fase':<10}{'mediana (ms)':>14}{'p95 (ms)':>12}" + (f"{'vs. referência':>16}" if baseline else ""))
+    for name, (source, stdin) in load_programs(args.programs, args.generated_kb).items():
+        result = results[name] = measure(name, source, stdin, args.repeat, args.warmup)
+        before = baseline['programs'].get(name) if baseline else None
+        for phase, timing in result['phases'].items():
+            line = f"{name:<12}{phase:<10}{timing['median'] * 1000:>14.2f}{timing['p95'] * 1000:>12.2f}"
+            if before and phase in before['phases']:
+                old = before['phases'][phase]['median']
+                line += f"{(timing['median'] / old - 1) * 100 if old else 0:>+15.0f}%"
+            print(line)
+        print(f"{name:<12}{'pico':<10}{result['peak_kb']:>11.0f} KB")
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump({'python': platform.python_version(), 'repeat': args.repeat, 'warmup': args.warmup,
+                       'programs': results}, file, indent=2)
+        print(f"referência gravada em {args.save}")
+
+    if baseline:
+        found = regressions(results, baseline, args.threshold)
+        if found:
+            print(f"{len(found)} regressão(ões) acima de {args.threshold * 100:.0f}%:")
+            for message in found:
+                print(f"  {message}")
+            sys.exit(1)
+        print(f"nenhuma regressão acima de {args.threshold * 100:.0f}%")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# Runs an accumulator-style tail-recursive sum to n = 10^6 on every engine, with and without
+# the optimizer (tail calls are marked by the Resolver, so both must run flat) and under
+# --memoize, with the tail call after an 'if' and inside a 'while', and checks the result.
+# --memory runs each size again under tracemalloc and reports the peak, which stays flat as
+# n grows since tail calls reuse the frame (tracing slows the run down a lot).
+#
+#   python bench/bench_tail.py [--sizes N ...] [--memory]
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main as lang
+
+SOURCES = {
+    'if': """
+int sum(int n, int acc) {
+    if (n == 0) {
+        return acc;
+    }
+    return sum(n - 1, acc + n);
+}
+
+int main() {
+    printf(sum(%d, 0));
+}
+""",
+    'while': """
+int sum(int n, int acc) {
+    while (n > 0) {
+        return sum(n - 1, acc + n);
+    }
+    return acc;
+}
+
+int main() {
+    printf(sum(%d, 0));
+}
+""",
+}
+
+MODES = ('otimizado', 'sem otimização', 'memoizado')
+
+class Capture:
+    def __init__(self):
+        self.text = ''
+
+    def write(self, text):
+        self.text += text
+
+    def flush(self):
+        pass
+
+def run_once(source, size, engine, mode, traced=False):
+    ast = lang.Parser.run(source % size)
+    if mode != 'sem otimização':
+        lang.Optimizer.run(ast)
+    if mode == 'memoizado':
+        lang.Memoizer().instrument(ast)
+    output = Capture()
+    if traced:
+        tracemalloc.start()
+    start = time.perf_counter()
+    lang.execute(ast, engine, io=lang.ProgramIO(stdout=output))
+    elapsed = time.perf_counter() - start
+    peak = None
+    if traced:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    if output.text != f"{size * (size + 1) // 2}\n":
+        raise SystemExit(f"Resultado incorreto com engine '{engine}' ({mode}) e n = {size}: {output.text!r}")
+    return elapsed, peak
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=[10 ** 4, 10 ** 5, 10 ** 6])
+    arg_parser.add_argument('--memory', action='store_true')
+    args = arg_parser.parse_args()
+
+    print(f"{'engine':<10}{'programa':<10}{'modo':<16}{'n':>10}{'tempo (s)':>12}" + (f"{'pico (KB)':>12}" if args.memory else ""))
+    for engine in lang.ENGINES:
+        for name, source in SOURCES.items():
+            for mode in MODES:
+                for size in args.sizes:
+                    elapsed, _ = run_once(source, size, engine, mode)
+                    line = f"{engine:<10}{name:<10}{mode:<16}{size:>10}{elapsed:>12.3f}"
+                    if args.memory:
+                        line += f"{run_once(source, size, engine, mode, traced=True)[1] / 1024:>12.1f}"
+                    print(line)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+/* Arithmetic loop: integer operations, comparisons and branches */
+int main() {
+    int i = 0, n = 50000, total = 0, odd = 0;
+    while (i < n) {
+        total = total + i * 3 - i / 7;
+        if (i - i / 2 * 2 == 1) {
+            odd = odd + 1;
+        } else {
+            total = total - 1;
+        }
+        if (total > 1000000) {
+            total = total - 1000000;
+        }
+        i = i + 1;
+    }
+    printf(total);
+    printf(odd);
+}
@@ -0,0 +1,10 @@
+/* Heavy printf: one line per iteration, integers and strings, reading the count from stdin */
+int main() {
+    int i = 0, n;
+    n = scanf();
+    while (i < n) {
+        printf(i);
+        printf("linha");
+        i = i + 1;
+    }
+}
@@ -0,0 +1,24 @@
+/* Deep recursion: a non-tail recursive sum, repeated, and a call-heavy Fibonacci */
+int sum(int n) {
+    if (n == 0) {
+        return 0;
+    }
+    return n + sum(n - 1);
+}
+
+int fib(int n) {
+    if (n < 2) {
+        return n;
+    }
+    return fib(n - 1) + fib(n - 2);
+}
+
+int main() {
+    int i = 0, total = 0;
+    while (i < 300) {
+        total = total + sum(150);
+        i = i + 1;
+    }
+    printf(total);
+    printf(fib(20));
+}
@@ -0,0 +1,26 @@
+/* String building: repeated concatenation and comparisons */
+str repeat(str s, int n) {
+    str out = "";
+    int i = 0;
+    while (i < n) {
+        out = out + s;
+        i = i + 1;
+    }
+    return out;
+}
+
+int main() {
+    int i = 0, same = 0;
+    str text = "";
+    while (i < 20000) {
+        text = text + "ab";
+        if (i - i / 100 * 100 == 0) {
+            if (repeat("ab", i / 100 + 1) == repeat("ab", i / 100 + 1)) {
+                same = same + 1;
+            }
+        }
+        i = i + 1;
+    }
+    printf(same);
+    printf(text == repeat("ab", 20000));
+}
@@ -0,0 +1,114 @@
+# Client for a server started with `main.py --serve SOCKET`. It takes the same arguments as
+# main.py plus --connect SOCKET and behaves like a local run, with the same output, error
+# messages and exit status:
+#
+#   python client.py --connect /tmp/lc.sock programa.c --engine vm < entrada.txt
+#
+# It only imports what talking to the server needs, so each run starts much faster than
+# main.py; the arguments are checked by the server. main.py imports the protocol from here.
+
+import json
+import os
+import socket
+import struct
+import sys
+
+# Messages between the --serve server, its clients and its workers: a one-byte kind, the
+# payload size and the payload. A client sends a job (JSON with its arguments and working
+# directory) or a stats request. While the job runs, its stdout and stderr come back as
+# they are written, and each read of its stdin asks the client for the next piece of the
+# client's stdin; its exit status comes last.
+FRAME_HEADER = struct.Struct('!cI')
+FRAME_JOB = b'J'
+FRAME_STATS = b'S'
+FRAME_STDOUT = b'o'
+FRAME_STDERR = b'e'
+FRAME_INPUT = b'i'  # Request for stdin: at most N bytes, a line if N is 0, everything if N < 0
+FRAME_INPUT_DATA = b'I'  # The bytes read, empty at end of file
+FRAME_EXIT = b'x'
+FRAME_STATS_REPLY = b's'
+
+RECEIVE_SIZE = 1 << 16
+
+def send_frame(sock, kind, payload):
+    sock.sendall(FRAME_HEADER.pack(kind, len(payload)) + payload)
+
+def receive_frame(sock):
+    # Returns (kind, payload), or (None, None) once the other end is closed
+    header = receive_exactly(sock, FRAME_HEADER.size)
+    if header is None:
+        return None, None
+    kind, size = FRAME_HEADER.unpack(header)
+    payload = receive_exactly(sock, size)
+    if payload is None:
+        return None, None
+    return kind, payload
+
+def receive_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, RECEIVE_SIZE))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def socket_path(argv):
+    # The value of --connect, without parsing the rest of the arguments
+    for index, arg in enumerate(argv):
+        if arg.startswith('--connect='):
+            return arg.split('=', 1)[1]
+        if arg == '--connect' and index + 1 < len(argv):
+            return argv[index + 1]
+    return None
+
+def connect(argv):
+    path = socket_path(argv)
+    if path is None:
+        print("Erro: informe o socket do servidor com --connect SOCKET", file=sys.stderr)
+        return 2
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"Erro: nenhum servidor atendendo em '{path}'", file=sys.stderr)
+        return 1
+
+    with sock:
+        if '--server-stats' in argv:
+            send_frame(sock, FRAME_STATS, b'')
+            kind, payload = receive_frame(sock)
+            if kind != FRAME_STATS_REPLY:
+                print("Erro: conexão com o servidor encerrada", file=sys.stderr)
+                return 1
+            print(json.dumps(json.loads(payload), indent=2))
+            return 0
+
+        # The worker reads the file itself, from this directory
+        job = {'argv': argv, 'cwd': os.getcwd(), 'tty': sys.stdin.isatty()}
+        send_frame(sock, FRAME_JOB, json.dumps(job).encode())
+        stdin = sys.stdin.buffer
+        while True:
+            kind, payload = receive_frame(sock)
+            if kind is None:
+                print("Erro: conexão com o servidor encerrada", file=sys.stderr)
+                return 1
+            if kind == FRAME_INPUT:
+                size = int(payload)
+                data = stdin.read() if size < 0 else stdin.readline() if size == 0 else stdin.read1(size)
+                send_frame(sock, FRAME_INPUT_DATA, data)
+                continue
+            if kind == FRAME_EXIT:
+                result = json.loads(payload)
+                if '--stats' in argv and 'queued' in result:
+                    print(f"servidor: {result['queued'] * 1000:.1f} ms na fila, {result['elapsed'] * 1000:.1f} ms "
+                          f"de execução", file=sys.stderr)
+                return result['status']
+            stream = sys.stdout if kind == FRAME_STDOUT else sys.stderr
+            stream.write(payload.decode())
+            stream.flush()
+
+if __name__ == "__main__":
+    sys.exit(connect(sys.argv[1:]))
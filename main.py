@@ -1,403 +1,534 @@
 import sys
 from abc import ABC, abstractmethod
+import argparse
+import asyncio
+import codecs
+import io
+import json
+import operator
+import hashlib
+import itertools
+import os
+import pickle
 import re
+import signal
+import socket
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from client import (FRAME_HEADER, FRAME_JOB, FRAME_STATS, FRAME_STDOUT, FRAME_STDERR, FRAME_INPUT, FRAME_INPUT_DATA,
+                    FRAME_EXIT, FRAME_STATS_REPLY, send_frame, receive_frame, connect)
 
 class Token:
-    def __init__(self, type: str, value):
+    __slots__ = ('type', 'value', 'line', 'column')
+
+    def __init__(self, type: str, value, line=None, column=None):
         self.type = type
         self.value = value
+        self.line = line
+        self.column = column
+
+RESERVED_WORDS = frozenset(['printf', 'if', 'while', 'scanf', 'int', 'str', 'else', 'return', 'void'])
+
+# One master pattern: whitespace followed by exactly one token. A /* */ comment is matched
+# as a token of its own, after the operators, so sources without comments never pay for it
+TOKEN_PATTERN = re.compile(r"""
+    \s*
+    (?:
+        "(?P<STRING>[^"]*)"
+      | (?P<INT>\d+)
+      | (?P<ID>[^\W\d]\w*)
+      | (?P<OPERATOR><=|>=|==|!=|&&|\|\||[-+*(){}=;><!&|,]|/(?!\*))
+      | (?P<COMMENT>/\*.*?\*/)
+      | (?P<UNCLOSED>/\*|")
+      | (?P<EOF>\Z)
+    )
+""", re.VERBOSE | re.DOTALL)
+
+# Characters read from file-like sources per refill
+CHUNK_SIZE = 1 << 16
 
 class Tokenizer:
-    def __init__(self, source):
-        self.source = source.strip()
-        self.position = 0
+    # Lazily tokenizes a string, a text or binary file object or an mmap, reading it in
+    # chunks; 'lookahead' bounds how many tokens past 'next' can be peeked. 'first_line' is
+    # the line number of the source's first line, for sources cut from a larger file.
+    def __init__(self, source, lookahead=4, first_line=1):
+        self.lookahead = lookahead
+        self.buffer = deque()
+        self.tokens = self.scan(source, first_line)
         self.next = None
         self.selectNext()
 
     def selectNext(self):
-        # Skip whitespace
-        while self.position < len(self.source) and self.source[self.position].isspace():
-            self.position += 1
+        if self.buffer:
+            self.next = self.buffer.popleft()
+        else:
+            self.next = next(self.tokens)
 
-        if self.position == len(self.source):
-            self.next = Token('EOF', None)
-            return
+    def peek(self, k=1):
+        # Token k positions after 'next' (k = 1 is the one selectNext would produce)
+        if not 1 <= k <= self.lookahead:
+            raise ValueError(f"Lookahead de {k} tokens além do limite de {self.lookahead}")
+        while len(self.buffer) < k:
+            self.buffer.append(next(self.tokens))
+        return self.buffer[k - 1]
+
+    @staticmethod
+    def reader(source):
+        if isinstance(source, str):
+            return None
+        decoder = codecs.getincrementaldecoder('utf-8')()
+
+        def read():
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if isinstance(chunk, str):
+                    return chunk
+                text = decoder.decode(chunk, final=not chunk)
+                # A chunk ending mid-character decodes to nothing until the next one arrives
+                if text or not chunk:
+                    return text
+        return read
+
+    def scan(self, source, first_line=1):
+        read = Tokenizer.reader(source)
+        buffer = source if read is None else read()
+        eof = read is None or not buffer
+        match_token = TOKEN_PATTERN.match
+        intern = sys.intern
+        position = 0
+        line = first_line
+        line_start = 0  # Buffer offset where the current line begins
+        next_newline = Tokenizer.find_newline(buffer, 0)
+
+        while True:
+            match = match_token(buffer, position)
+
+            # A token touching the end of the buffer may continue in the next chunk
+            if not eof and (match is None or match.end() == len(buffer) or match.lastgroup == 'UNCLOSED'):
+                chunk = read()
+                if chunk:
+                    buffer = buffer[position:] + chunk
+                    line_start -= position
+                    next_newline = Tokenizer.find_newline(buffer, 0)
+                    position = 0
+                else:
+                    eof = True
+                continue
 
-        current_char = self.source[self.position]
-
-        # Recognize strings enclosed in double quotes
-        if current_char == '"':
-            self.position += 1  # Consume the initial quote
-            string = ''
-            while self.position < len(self.source) and self.source[self.position] != '"':
-                string += self.source[self.position]
-                self.position += 1
-            if self.position == len(self.source):
-                raise Exception("String não finalizada")
-            self.position += 1  # Consume the closing quote
-            self.next = Token('STRING', string)
-
-        # Recognize integers
-        elif current_char.isdigit():
-            num = ''
-            while self.position < len(self.source) and self.source[self.position].isdigit():
-                num += self.source[self.position]
-                self.position += 1
-            self.next = Token('INT', int(num))
-
-        # Recognize identifiers, reserved words, and special functions
-        elif current_char.isalpha() or current_char == '_':
-            identifier = ''
-            while self.position < len(self.source) and (self.source[self.position].isalnum() or self.source[self.position] == '_'):
-                identifier += self.source[self.position]
-                self.position += 1
-
-            # Add support for reserved words
-            if identifier in ['printf', 'if', 'while', 'scanf', 'int', 'str', 'else', 'return', 'void']:
-                self.next = Token('RESERVED', identifier)
+            if match is None:
+                # Only reached on invalid input: skip the whitespace the pattern would have consumed
+                kind = None
+                start = len(buffer) - len(buffer[position:].lstrip())
             else:
-                self.next = Token('ID', identifier)
+                kind = match.lastgroup
+                value = match[kind]
+                end = match.end()
+                # Only a string's group stops short of the end of the match, at its closing quote
+                start = end - len(value) - (kind == 'STRING')
 
-        # Recognize operators, including relational and boolean
-        elif current_char in '+-*/(){}=;><!&|,':
-            if self.source[self.position:self.position+2] in ['<=', '>=', '==', '!=', '&&', '||']:
-                self.next = Token('OPERATOR', self.source[self.position:self.position+2])
-                self.position += 2
+            # Most tokens share the line of the previous one; only count when a newline was crossed
+            if start > next_newline:
+                line += buffer.count('\n', position, start)
+                line_start = buffer.rindex('\n', position, start) + 1
+                next_newline = Tokenizer.find_newline(buffer, start)
+            column = start - line_start + 1
+
+            if kind is None:
+                raise Exception(f"Caractere inesperado: {buffer[start]} (linha {line}, coluna {column})")
+
+            position = end
+
+            if kind == 'OPERATOR':
+                # Names and operators end up in the AST: one shared string per distinct text
+                yield Token(kind, intern(value), line, column)
+            elif kind == 'ID':
+                # Add support for reserved words
+                if value in RESERVED_WORDS:
+                    yield Token('RESERVED', value, line, column)
+                else:
+                    yield Token(kind, intern(value), line, column)
+            elif kind == 'INT':
+                yield Token(kind, int(value), line, column)
+            elif kind == 'STRING':
+                # Point at the opening quote; the literal may span lines
+                yield Token(kind, value, line, column - 1)
+                if position > next_newline:
+                    line += value.count('\n')
+                    line_start = buffer.rindex('\n', start, position) + 1
+                    next_newline = Tokenizer.find_newline(buffer, position)
+            elif kind == 'COMMENT':
+                # Skipped like whitespace; the lines it spans still count
+                if position > next_newline:
+                    line += value.count('\n')
+                    line_start = buffer.rindex('\n', start, position) + 1
+                    next_newline = Tokenizer.find_newline(buffer, position)
+            elif kind == 'UNCLOSED':
+                what = "String não finalizada" if value == '"' else "Comentário não finalizado"
+                raise Exception(f"{what} (linha {line}, coluna {column})")
             else:
-                self.next = Token('OPERATOR', current_char)
-                self.position += 1
+                # Keep answering EOF so lookahead past the end is harmless
+                token = Token(kind, None, line, column)
+                while True:
+                    yield token
 
-        else:
-            raise Exception(f"Caractere inesperado: {current_char}")
+    @staticmethod
+    def find_newline(buffer, start):
+        position = buffer.find('\n', start)
+        return len(buffer) if position < 0 else position
 
 class Parser:
-    def __init__(self, tokenizer):
+    # All parsing state lives on the instance; parse() gives every call its own
+    # instance, so programs can be parsed concurrently from several threads
+    def __init__(self, tokenizer=None):
         self.tokenizer = tokenizer
+        self.literals = {}  # (node class, value) -> the node shared by every such literal
 
     @staticmethod
     def run(code):
-        Parser.tokenizer = Tokenizer(code)
-        functions = []
+        return Parser().parse(code)
 
-        while Parser.tokenizer.next.type != 'EOF':
-            if Parser.tokenizer.next.type == 'RESERVED' and Parser.tokenizer.next.value in ['int', 'void', 'str']:
-                func_decl = Parser.parseFunctionDecl()
-                functions.append(func_decl)
-            else:
-                raise Exception(f"Token inesperado: {Parser.tokenizer.next.value}")
+    def parse(self, source):
+        return Parser(Tokenizer(source)).parseProgram()
+
+    def literal(self, node_class, value):
+        key = (node_class, value)
+        node = self.literals.get(key)
+        if node is None:
+            node = self.literals[key] = node_class(value)
+        return node
+
+    def error(self, message):
+        token = self.tokenizer.next
+        return Exception(f"{message} (linha {token.line}, coluna {token.column})")
+
+    def parseProgram(self):
+        functions = self.parseFunctions()
 
         # Check if 'main' function is declared
         main_declared = any(func.name == 'main' for func in functions)
         if not main_declared:
-            raise Exception("Esperado a função 'main'")
+            raise self.error("Esperado a função 'main'")
 
-        # Create a Program node to hold all functions
-        return Program(functions)
+        # Create a Program node to hold all functions and resolve its variables to frame slots
+        program = Program(functions)
+        Resolver.run(program)
+        return program
 
-    @staticmethod
-    def parseFunctionDecl():
-        if Parser.tokenizer.next.type == 'RESERVED' and Parser.tokenizer.next.value in ['int', 'void', 'str']:
-            return_type = Parser.tokenizer.next.value
-            Parser.tokenizer.selectNext()
+    def parseFunctions(self):
+        functions = []
 
-            if Parser.tokenizer.next.type != 'ID':
-                raise Exception("Esperado nome da função após o tipo")
-            func_name = Parser.tokenizer.next.value
-            Parser.tokenizer.selectNext()
+        while self.tokenizer.next.type != 'EOF':
+            if self.tokenizer.next.type == 'RESERVED' and self.tokenizer.next.value in ['int', 'void', 'str']:
+                func_decl = self.parseFunctionDecl()
+                functions.append(func_decl)
+            else:
+                raise self.error(f"Token inesperado: {self.tokenizer.next.value}")
+        return functions
+
+    def parseFunctionDecl(self):
+        if self.tokenizer.next.type == 'RESERVED' and self.tokenizer.next.value in ['int', 'void', 'str']:
+            return_type = self.tokenizer.next.value
+            self.tokenizer.selectNext()
+
+            if self.tokenizer.next.type != 'ID':
+                raise self.error("Esperado nome da função após o tipo")
+            func_name = self.tokenizer.next.value
+            self.tokenizer.selectNext()
 
-            if Parser.tokenizer.next.value != '(':
-                raise Exception("Esperado '(' após o nome da função")
-            Parser.tokenizer.selectNext()
+            if self.tokenizer.next.value != '(':
+                raise self.error("Esperado '(' após o nome da função")
+            self.tokenizer.selectNext()
 
             params = []
-            if Parser.tokenizer.next.value != ')':
+            if self.tokenizer.next.value != ')':
                 while True:
-                    param_type = Parser.tokenizer.next.value
+                    param_type = self.tokenizer.next.value
                     if param_type not in ['int', 'str']:
-                        raise Exception("Esperado tipo do parâmetro")
-                    Parser.tokenizer.selectNext()
+                        raise self.error("Esperado tipo do parâmetro")
+                    self.tokenizer.selectNext()
 
-                    if Parser.tokenizer.next.type != 'ID':
-                        raise Exception("Esperado nome do parâmetro")
-                    param_name = Parser.tokenizer.next.value
-                    Parser.tokenizer.selectNext()
+                    if self.tokenizer.next.type != 'ID':
+                        raise self.error("Esperado nome do parâmetro")
+                    param_name = self.tokenizer.next.value
+                    self.tokenizer.selectNext()
 
                     params.append((param_type, param_name))
 
-                    if Parser.tokenizer.next.value == ',':
-                        Parser.tokenizer.selectNext()
+                    if self.tokenizer.next.value == ',':
+                        self.tokenizer.selectNext()
                         continue
-                    elif Parser.tokenizer.next.value == ')':
+                    elif self.tokenizer.next.value == ')':
                         break
                     else:
-                        raise Exception("Esperado ',' ou ')' na lista de parâmetros")
+                        raise self.error("Esperado ',' ou ')' na lista de parâmetros")
 
-            Parser.tokenizer.selectNext()  # Consume ')'
+            self.tokenizer.selectNext()  # Consume ')'
 
-            if Parser.tokenizer.next.value != '{':
-                raise Exception("Esperado '{' para iniciar o corpo da função")
+            if self.tokenizer.next.value != '{':
+                raise self.error("Esperado '{' para iniciar o corpo da função")
 
-            body = Parser.parseBlock()
+            body = self.parseBlock()
 
             return FuncDec(return_type, func_name, params, body)
         else:
-            raise Exception("Esperado declaração de função")
+            raise self.error("Esperado declaração de função")
 
-    @staticmethod
-    def parseBlock():
-        if Parser.tokenizer.next.value != '{':
-            raise Exception("Esperado '{' no início do bloco")
+    def parseBlock(self):
+        if self.tokenizer.next.value != '{':
+            raise self.error("Esperado '{' no início do bloco")
 
-        Parser.tokenizer.selectNext()  # Consume '{'
+        self.tokenizer.selectNext()  # Consume '{'
 
         statements = []
 
         # Continue consuming statements until '}'
-        while Parser.tokenizer.next.value != '}':
-            if Parser.tokenizer.next.type == 'EOF':
-                raise Exception("Esperado '}' no final do bloco")
-            statement = Parser.parseStatement()
+        while self.tokenizer.next.value != '}':
+            if self.tokenizer.next.type == 'EOF':
+                raise self.error("Esperado '}' no final do bloco")
+            statement = self.parseStatement()
             statements.append(statement)
             # Consume semicolons after each statement
-            while Parser.tokenizer.next.value == ';':
-                Parser.tokenizer.selectNext()
+            while self.tokenizer.next.value == ';':
+                self.tokenizer.selectNext()
 
-        Parser.tokenizer.selectNext()  # Consume '}'
+        self.tokenizer.selectNext()  # Consume '}'
 
         return Block(statements)
 
-    @staticmethod
-    def parseStatement():
+    def parseStatement(self):
         # Ignore multiple ';'
-        while Parser.tokenizer.next.value == ';':
-            Parser.tokenizer.selectNext()
+        while self.tokenizer.next.value == ';':
+            self.tokenizer.selectNext()
 
         # Variable declaration
-        if Parser.tokenizer.next.type == 'RESERVED' and Parser.tokenizer.next.value in ['int', 'str']:
-            var_type = Parser.tokenizer.next.value
-            Parser.tokenizer.selectNext()
+        if self.tokenizer.next.type == 'RESERVED' and self.tokenizer.next.value in ['int', 'str']:
+            var_type = self.tokenizer.next.value
+            self.tokenizer.selectNext()
             var_list = []
 
             while True:
-                if Parser.tokenizer.next.type != 'ID':
-                    raise Exception("Esperado identificador após o tipo")
-                var_name = Parser.tokenizer.next.value
-                Parser.tokenizer.selectNext()
+                if self.tokenizer.next.type != 'ID':
+                    raise self.error("Esperado identificador após o tipo")
+                var_name = self.tokenizer.next.value
+                self.tokenizer.selectNext()
 
                 # Optional assignment in declaration
-                if Parser.tokenizer.next.value == '=':
-                    Parser.tokenizer.selectNext()
-                    expr = Parser.parseExpression()
+                if self.tokenizer.next.value == '=':
+                    self.tokenizer.selectNext()
+                    expr = self.parseExpression()
                     var_list.append((var_name, expr))
                 else:
                     var_list.append((var_name, None))
 
-                if Parser.tokenizer.next.value == ',':
-                    Parser.tokenizer.selectNext()
+                if self.tokenizer.next.value == ',':
+                    self.tokenizer.selectNext()
                     continue
-                elif Parser.tokenizer.next.value == ';':
-                    Parser.tokenizer.selectNext()
+                elif self.tokenizer.next.value == ';':
+                    self.tokenizer.selectNext()
                     break
                 else:
-                    raise Exception("Esperado ',' ou ';' após declaração")
+                    raise self.error("Esperado ',' ou ';' após declaração")
 
             return VarDec(var_type, var_list)
 
-        elif Parser.tokenizer.next.type == 'ID':
-            identifier = Parser.tokenizer.next.value
-            Parser.tokenizer.selectNext()
-            if Parser.tokenizer.next.value == '=':
-                Parser.tokenizer.selectNext()
-                expr = Parser.parseExpression()
-                if Parser.tokenizer.next.value == ';':
-                    Parser.tokenizer.selectNext()
+        elif self.tokenizer.next.type == 'ID':
+            identifier = self.tokenizer.next.value
+            self.tokenizer.selectNext()
+            if self.tokenizer.next.value == '=':
+                self.tokenizer.selectNext()
+                expr = self.parseExpression()
+                if self.tokenizer.next.value == ';':
+                    self.tokenizer.selectNext()
                 else:
-                    raise Exception("Esperado ';' após expressão")
+                    raise self.error("Esperado ';' após expressão")
                 return Assignment(identifier, expr)
-            elif Parser.tokenizer.next.value == '(':
+            elif self.tokenizer.next.value == '(':
                 # Function call
-                Parser.tokenizer.selectNext()
+                self.tokenizer.selectNext()
                 args = []
-                if Parser.tokenizer.next.value != ')':
+                if self.tokenizer.next.value != ')':
                     while True:
-                        arg = Parser.parseExpression()
+                        arg = self.parseExpression()
                         args.append(arg)
-                        if Parser.tokenizer.next.value == ',':
-                            Parser.tokenizer.selectNext()
+                        if self.tokenizer.next.value == ',':
+                            self.tokenizer.selectNext()
                             continue
-                        elif Parser.tokenizer.next.value == ')':
+                        elif self.tokenizer.next.value == ')':
                             break
                         else:
-                            raise Exception("Esperado ',' ou ')' nos argumentos da chamada de função")
-                Parser.tokenizer.selectNext()  # Consume ')'
-                if Parser.tokenizer.next.value == ';':
-                    Parser.tokenizer.selectNext()
+                            raise self.error("Esperado ',' ou ')' nos argumentos da chamada de função")
+                self.tokenizer.selectNext()  # Consume ')'
+                if self.tokenizer.next.value == ';':
+                    self.tokenizer.selectNext()
                 else:
-                    raise Exception("Esperado ';' após chamada de função")
-                return FuncCall(identifier, args)
+                    raise self.error("Esperado ';' após chamada de função")
+                return CallStatement(identifier, args)
             else:
-                raise Exception("Esperado '=' ou '(' após identificador")
-
-        elif Parser.tokenizer.next.value == 'printf':
-            Parser.tokenizer.selectNext()
-            if Parser.tokenizer.next.value == '(':
-                Parser.tokenizer.selectNext()
-                expr = Parser.parseExpression()
-                if Parser.tokenizer.next.value == ')':
-                    Parser.tokenizer.selectNext()
-                    if Parser.tokenizer.next.value == ';':
-                        Parser.tokenizer.selectNext()
+                raise self.error("Esperado '=' ou '(' após identificador")
+
+        elif self.tokenizer.next.value == 'printf':
+            self.tokenizer.selectNext()
+            if self.tokenizer.next.value == '(':
+                self.tokenizer.selectNext()
+                expr = self.parseExpression()
+                if self.tokenizer.next.value == ')':
+                    self.tokenizer.selectNext()
+                    if self.tokenizer.next.value == ';':
+                        self.tokenizer.selectNext()
                     else:
-                        raise Exception("Esperado ';' após printf")
+                        raise self.error("Esperado ';' após printf")
                     return Print(expr)
                 else:
-                    raise Exception("Esperado ')' após expressão em printf")
+                    raise self.error("Esperado ')' após expressão em printf")
             else:
-                raise Exception("Esperado '(' após printf")
+                raise self.error("Esperado '(' após printf")
 
-        elif Parser.tokenizer.next.value == 'return':
-            Parser.tokenizer.selectNext()
-            expr = Parser.parseExpression()
-            if Parser.tokenizer.next.value == ';':
-                Parser.tokenizer.selectNext()
+        elif self.tokenizer.next.value == 'return':
+            self.tokenizer.selectNext()
+            expr = self.parseExpression()
+            if self.tokenizer.next.value == ';':
+                self.tokenizer.selectNext()
             else:
-                raise Exception("Esperado ';' após return")
+                raise self.error("Esperado ';' após return")
             return ReturnNode(expr)
 
-        elif Parser.tokenizer.next.value == 'if':
-            Parser.tokenizer.selectNext()
-            if Parser.tokenizer.next.value == '(':
-                Parser.tokenizer.selectNext()
-                condition = Parser.parseExpression()
-                if Parser.tokenizer.next.value == ')':
-                    Parser.tokenizer.selectNext()
-                    true_block = Parser.parseStatement()
-                    if Parser.tokenizer.next.value == 'else':
-                        Parser.tokenizer.selectNext()
-                        false_block = Parser.parseStatement()
+        elif self.tokenizer.next.value == 'if':
+            self.tokenizer.selectNext()
+            if self.tokenizer.next.value == '(':
+                self.tokenizer.selectNext()
+                condition = self.parseExpression()
+                if self.tokenizer.next.value == ')':
+                    self.tokenizer.selectNext()
+                    true_block = self.parseStatement()
+                    if self.tokenizer.next.value == 'else':
+                        self.tokenizer.selectNext()
+                        false_block = self.parseStatement()
                         return IfNode(condition, true_block, false_block)
                     return IfNode(condition, true_block)
                 else:
-                    raise Exception("Esperado ')' após condição")
+                    raise self.error("Esperado ')' após condição")
             else:
-                raise Exception("Esperado '(' após 'if'")
-
-        elif Parser.tokenizer.next.value == 'while':
-            Parser.tokenizer.selectNext()
-            if Parser.tokenizer.next.value == '(':
-                Parser.tokenizer.selectNext()
-                condition = Parser.parseExpression()
-                if Parser.tokenizer.next.value == ')':
-                    Parser.tokenizer.selectNext()
-                    body = Parser.parseStatement()
-                    return WhileNode(condition, body)
+                raise self.error("Esperado '(' após 'if'")
+
+        elif self.tokenizer.next.value == 'while':
+            line = self.tokenizer.next.line
+            self.tokenizer.selectNext()
+            if self.tokenizer.next.value == '(':
+                self.tokenizer.selectNext()
+                condition = self.parseExpression()
+                if self.tokenizer.next.value == ')':
+                    self.tokenizer.selectNext()
+                    body = self.parseStatement()
+                    return WhileNode(condition, body, line)
                 else:
-                    raise Exception("Esperado ')' após condição")
+                    raise self.error("Esperado ')' após condição")
             else:
-                raise Exception("Esperado '(' após 'while'")
+                raise self.error("Esperado '(' após 'while'")
 
-        elif Parser.tokenizer.next.value == '{':
-            return Parser.parseBlock()
+        elif self.tokenizer.next.value == '{':
+            return self.parseBlock()
 
         else:
-            if Parser.tokenizer.next.type != 'EOF':
-                raise Exception(f"Token inesperado: {Parser.tokenizer.next.value}")
+            if self.tokenizer.next.type != 'EOF':
+                raise self.error(f"Token inesperado: {self.tokenizer.next.value}")
             return NoOp()
 
-    @staticmethod
-    def parseExpression():
-        result = Parser.parseTerm()
+    def parseExpression(self):
+        result = self.parseTerm()
 
-        while Parser.tokenizer.next.type == 'OPERATOR' and Parser.tokenizer.next.value in ('+', '-', '==', '!=', '>', '<', '>=', '<=', '&&', '||'):
-            op = Parser.tokenizer.next.value
-            Parser.tokenizer.selectNext()
-            right = Parser.parseTerm()
+        while self.tokenizer.next.type == 'OPERATOR' and self.tokenizer.next.value in ('+', '-', '==', '!=', '>', '<', '>=', '<=', '&&', '||'):
+            op = self.tokenizer.next.value
+            self.tokenizer.selectNext()
+            right = self.parseTerm()
             result = BinOp(op, result, right)
 
         return result
 
-    @staticmethod
-    def parseTerm():
-        result = Parser.parseFactor()
+    def parseTerm(self):
+        result = self.parseFactor()
 
-        while Parser.tokenizer.next.type == 'OPERATOR' and Parser.tokenizer.next.value in ('*', '/'):
-            op = Parser.tokenizer.next.value
-            Parser.tokenizer.selectNext()
-            right = Parser.parseFactor()
+        while self.tokenizer.next.type == 'OPERATOR' and self.tokenizer.next.value in ('*', '/'):
+            op = self.tokenizer.next.value
+            self.tokenizer.selectNext()
+            right = self.parseFactor()
             result = BinOp(op, result, right)
 
         return result
 
-    @staticmethod
-    def parseFactor():
+    def parseFactor(self):
         unary = 1
         logical_not = False
 
-        while Parser.tokenizer.next.type == 'OPERATOR' and Parser.tokenizer.next.value in ('-', '+', '!'):
-            if Parser.tokenizer.next.value == '-':
+        while self.tokenizer.next.type == 'OPERATOR' and self.tokenizer.next.value in ('-', '+', '!'):
+            if self.tokenizer.next.value == '-':
                 unary *= -1
-            elif Parser.tokenizer.next.value == '!':
+            elif self.tokenizer.next.value == '!':
                 logical_not = not logical_not
-            Parser.tokenizer.selectNext()
-
-        if Parser.tokenizer.next.value == 'scanf':
-            Parser.tokenizer.selectNext()
-            if Parser.tokenizer.next.value == '(':
-                Parser.tokenizer.selectNext()
-                if Parser.tokenizer.next.value == ')':
-                    Parser.tokenizer.selectNext()
+            self.tokenizer.selectNext()
+
+        if self.tokenizer.next.value == 'scanf':
+            self.tokenizer.selectNext()
+            if self.tokenizer.next.value == '(':
+                self.tokenizer.selectNext()
+                if self.tokenizer.next.value == ')':
+                    self.tokenizer.selectNext()
                     result = ScanfNode()
                     return result
                 else:
-                    raise Exception("Esperado ')' após 'scanf'")
+                    raise self.error("Esperado ')' após 'scanf'")
             else:
-                raise Exception("Esperado '(' após 'scanf'")
-
-        if Parser.tokenizer.next.value == '(':
-            Parser.tokenizer.selectNext()
-            result = Parser.parseExpression()
-            if Parser.tokenizer.next.value != ')':
-                raise Exception("Faltando parêntese de fechamento")
-            Parser.tokenizer.selectNext()
+                raise self.error("Esperado '(' após 'scanf'")
+
+        if self.tokenizer.next.value == '(':
+            self.tokenizer.selectNext()
+            result = self.parseExpression()
+            if self.tokenizer.next.value != ')':
+                raise self.error("Faltando parêntese de fechamento")
+            self.tokenizer.selectNext()
             if unary == -1 or logical_not:
                 result = UnOp('-' if unary == -1 else '!', result)
             return result
 
-        elif Parser.tokenizer.next.type == 'INT':
-            result = IntVal(Parser.tokenizer.next.value)
-            Parser.tokenizer.selectNext()
+        elif self.tokenizer.next.type == 'INT':
+            result = self.literal(IntVal, self.tokenizer.next.value)
+            self.tokenizer.selectNext()
             if unary == -1 or logical_not:
                 result = UnOp('-' if unary == -1 else '!', result)
             return result
 
-        elif Parser.tokenizer.next.type == 'STRING':
-            result = StringVal(Parser.tokenizer.next.value)
-            Parser.tokenizer.selectNext()
+        elif self.tokenizer.next.type == 'STRING':
+            result = self.literal(StringVal, self.tokenizer.next.value)
+            self.tokenizer.selectNext()
             if logical_not:
                 result = UnOp('!', result)
             if unary == -1:
                 result = UnOp('-', result)
             return result
 
-        elif Parser.tokenizer.next.type == 'ID':
-            identifier = Parser.tokenizer.next.value
-            Parser.tokenizer.selectNext()
-            if Parser.tokenizer.next.value == '(':
+        elif self.tokenizer.next.type == 'ID':
+            identifier = self.tokenizer.next.value
+            self.tokenizer.selectNext()
+            if self.tokenizer.next.value == '(':
                 # Function call
-                Parser.tokenizer.selectNext()
+                self.tokenizer.selectNext()
                 args = []
-                if Parser.tokenizer.next.value != ')':
+                if self.tokenizer.next.value != ')':
                     while True:
-                        arg = Parser.parseExpression()
+                        arg = self.parseExpression()
                         args.append(arg)
-                        if Parser.tokenizer.next.value == ',':
-                            Parser.tokenizer.selectNext()
+                        if self.tokenizer.next.value == ',':
+                            self.tokenizer.selectNext()
                             continue
-                        elif Parser.tokenizer.next.value == ')':
+                        elif self.tokenizer.next.value == ')':
                             break
                         else:
-                            raise Exception("Esperado ',' ou ')' nos argumentos da chamada de função")
-                Parser.tokenizer.selectNext()  # Consume ')'
+                            raise self.error("Esperado ',' ou ')' nos argumentos da chamada de função")
+                self.tokenizer.selectNext()  # Consume ')'
                 result = FuncCall(identifier, args)
                 if unary == -1 or logical_not:
                     result = UnOp('-' if unary == -1 else '!', result)
@@ -410,95 +541,513 @@ class Parser:
                 return result
 
         else:
-            raise Exception("Esperado um inteiro, string, sub-expressão ou identificador")
+            raise self.error("Esperado um inteiro, string, sub-expressão ou identificador")
 
-class PrePro:
-    @staticmethod
-    def filter(code: str) -> str:
-        # Remove comments of the type /* */
-        code = re.sub(r'/\*.*?\*/', '', code, flags=re.DOTALL)
-        return code
+# Concatenations shorter than this build plain strings; longer ones start a Rope
+ROPE_THRESHOLD = 64
+
+class Rope:
+    # String value built by repeated '+', so that 's = s + x' in a loop is amortized O(1).
+    # A rope is the first 'count' chunks of a list it may share with the ropes it was
+    # appended from and to: appending to the newest rope extends the shared list, while
+    # appending to an older one copies its prefix first, so aliases never see the change.
+    # The contents are joined only when needed (printf, comparisons, hashing) and cached.
+    __slots__ = ('chunks', 'count', 'length', 'flat')
+
+    def __init__(self, chunks, length):
+        self.chunks = chunks
+        self.count = len(chunks)
+        self.length = length
+        self.flat = None
+
+    def append(self, text):
+        chunks = self.chunks
+        if len(chunks) != self.count:
+            chunks = chunks[:self.count]
+        chunks.append(text)
+        return Rope(chunks, self.length + len(text))
+
+    def __str__(self):
+        if self.flat is None:
+            self.flat = ''.join(self.chunks[:self.count])
+        return self.flat
+
+    def __len__(self):
+        return self.length
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __eq__(self, other):
+        return str(self) == str(other)
+
+    def __ne__(self, other):
+        return str(self) != str(other)
+
+    def __lt__(self, other):
+        return str(self) < str(other)
+
+    def __le__(self, other):
+        return str(self) <= str(other)
+
+    def __gt__(self, other):
+        return str(self) > str(other)
+
+    def __ge__(self, other):
+        return str(self) >= str(other)
+
+def concat(left, right):
+    # '+' with a string operand, for both engines
+    if type(left) is Rope:
+        return left.append(str(right))
+    text = str(left) + str(right)
+    if len(text) < ROPE_THRESHOLD:
+        return text
+    return Rope([text], len(text))
 
 class Node(ABC):
-    def __init__(self, value=None):
-        self.value = value
-        self.children = []
+    # Nodes declare their fields in __slots__: no per-instance __dict__, and children are
+    # named fields wherever their number is fixed. Only Block keeps a list of statements.
+    __slots__ = ()
 
     @abstractmethod
-    def Evaluate(self, symbol_table, func_table):
+    def Evaluate(self, frame, func_table):
         pass
 
+    def Optimize(self):
+        # Returns the node that replaces this one; leaves are kept as they are
+        return self
+
+    def Inline(self, arguments):
+        # Copies an expression returned by a function being inlined, putting arguments[slot]
+        # in place of each parameter; literals and scanf are shared as they are
+        return self
+
+    def Transform(self, replace):
+        # Rebuilds the subtree bottom-up, putting replace(node) in place of every node; nodes
+        # with children override it to transform each field in turn
+        return replace(self)
+
 class Program(Node):
+    __slots__ = ('functions',)
+
     def __init__(self, functions):
-        super().__init__()
         self.functions = functions
 
-    def Evaluate(self, symbol_table, func_table):
+    def Evaluate(self, frame, func_table):
         for func in self.functions:
-            func.Evaluate(symbol_table, func_table)
+            func.Evaluate(frame, func_table)
+
+    def Close(self, closer):
+        for func in self.functions:
+            func.Close(closer)
+
+    def Transpile(self, transpiler):
+        for func in self.functions:
+            func.Transpile(transpiler)
+
+    def Optimize(self):
+        for func in self.functions:
+            func.Optimize()
+        return self
+
+    def Transform(self, replace):
+        self.functions = [func.Transform(replace) for func in self.functions]
+        return replace(self)
 
 class FuncDec(Node):
+    __slots__ = ('return_type', 'name', 'params', 'body', 'frame_size', 'always_returns', 'pure', 'callees')
+
     def __init__(self, return_type, name, params, body):
-        super().__init__()
         self.return_type = return_type
         self.name = name
         self.params = params  # List of (type, name) tuples
         self.body = body
+        self.frame_size = None  # Number of local slots, set by the Resolver
+        self.always_returns = None  # False when control can fall off the end of the body
+        self.pure = None  # True when the function neither does I/O nor calls impure functions
+        self.callees = None  # Names of the functions called from the body
 
-    def Evaluate(self, symbol_table, func_table):
+    def Evaluate(self, frame, func_table):
         func_table.declare(self.name, self)
 
+    def Close(self, closer):
+        closer.functions[self.name].body = self.body.Close(closer)
+
+    def Transpile(self, transpiler):
+        params = ", ".join(f"v{slot}" for slot in range(len(self.params)))
+        transpiler.line(f"def f_{self.name}({params}):")
+        # Locals are read as None until assigned, as in the other engines
+        locals_ = [f"v{slot}" for slot in range(len(self.params), self.frame_size)]
+        if locals_:
+            transpiler.line("    " + " = ".join(locals_) + " = None")
+        transpiler.memo = None
+        transpiler.tail_calls = False
+        transpiler.tail_breaks = False
+        start = len(transpiler.lines)
+        transpiler.block(self.body)
+        if transpiler.tail_calls:
+            # Tail calls assign the parameters and 'continue' a loop around the whole body
+            transpiler.lines[start:] = ["    " + line if line else line for line in transpiler.lines[start:]]
+            transpiler.lines.insert(start, "    while True:")
+            if transpiler.tail_breaks:
+                transpiler.lines.insert(start, "    tail_call = False")
+            transpiler.line("        return None")
+        transpiler.line("")
+
+    def Resolve(self, scope):
+        scope.function = self
+        self.pure = True
+        self.callees = set()
+        for param_type, param_name in self.params:
+            scope.declare(param_name, param_type)
+            scope.assign(param_name)
+        self.body.Resolve(scope)
+        self.frame_size = scope.size()
+        self.body = self.body.Transform(scope.track)
+        # Marked here rather than in Optimize so that --no-optimize keeps tail calls flat too
+        self.body = self.body.Transform(self.mark_tail_call)
+
+    def Optimize(self):
+        self.body = self.body.Optimize()
+        return self
+
+    def mark_tail_call(self, node):
+        # 'return f(...)' inside f itself reuses the frame instead of nesting a call
+        if type(node) is ReturnNode and type(node.expression) is FuncCall and node.expression.name == self.name:
+            return TailCall(node.expression)
+        return node
+
+    def Transform(self, replace):
+        self.body = self.body.Transform(replace)
+        return replace(self)
+
+    def Compile(self, compiler):
+        code = compiler.functions[self.name]
+        compiler.code = code.instructions
+        compiler.memo = code.memo
+        self.body.Compile(compiler)
+        # Falling off the end of a function returns void
+        if code.memo is not None:
+            compiler.emit(OP_RETURN_NONE_MEMO, code.memo)
+        else:
+            compiler.emit(OP_RETURN_NONE)
+
 class FuncCall(Node):
+    __slots__ = ('name', 'args', 'checked', 'func')
+
     def __init__(self, name, args):
-        super().__init__()
         self.name = name
         self.args = args
+        self.checked = False  # True when every argument type was proved statically
+        self.func = None  # FuncDec called, linked by the tree engine on the first call
 
-    def Evaluate(self, symbol_table, func_table):
-        # Retrieve the function declaration
-        func_decl = func_table.get(self.name)
-
-        # Check argument count
-        if len(self.args) != len(func_decl.params):
-            raise Exception(f"Função '{self.name}' chamada com número incorreto de argumentos")
+    def Evaluate(self, frame, func_table):
+        # Link the call site to the function declaration once; the Resolver already
+        # reported undeclared functions and wrong argument counts
+        func_decl = self.func
+        if func_decl is None:
+            func_decl = self.func = func_table.get(self.name)
 
-        # Create a new symbol table for the function scope
-        local_symbol_table = SymbolTable(parent=None)
+        # Preallocate the callee frame: parameters occupy the first slots
+        local_frame = [None] * func_decl.frame_size
 
         # Assign arguments to parameters
-        for arg_expr, (param_type, param_name) in zip(self.args, func_decl.params):
-            arg_value, arg_type = arg_expr.Evaluate(symbol_table, func_table)
-            if arg_type != param_type and not (param_type == 'int' and arg_type == 'bool'):
-                raise Exception(f"Tipo incompatível na chamada da função '{self.name}' para o parâmetro '{param_name}'")
-            local_symbol_table.declare(param_name, param_type)
-            local_symbol_table.set(param_name, arg_value, arg_type)
+        if self.checked:
+            for slot, arg_expr in enumerate(self.args):
+                local_frame[slot] = arg_expr.Evaluate(frame, func_table)[0]
+        else:
+            for slot, (arg_expr, (param_type, param_name)) in enumerate(zip(self.args, func_decl.params)):
+                arg_value, arg_type = arg_expr.Evaluate(frame, func_table)
+                if arg_type != param_type and not (param_type == 'int' and arg_type == 'bool'):
+                    raise Exception(f"Tipo incompatível na chamada da função '{self.name}' para o parâmetro '{param_name}'")
+                local_frame[slot] = arg_value
 
-        # Evaluate the function body
-        try:
-            func_decl.body.Evaluate(local_symbol_table, func_table)
+        # Evaluate the function body; a ReturnNode hands its value back as the completion
+        result = func_decl.body.Evaluate(local_frame, func_table)
+        while result is TAIL_CALL:
+            result = func_decl.body.Evaluate(local_frame, func_table)
+        if result is None:
             # If function has no return, return None or default value
             return (None, 'void')
-        except ReturnException as ret:
-            return (ret.value, ret.var_type)
+        return result
+
+    def Compile(self, compiler):
+        func = compiler.functions.get(self.name)
+        if func is None:
+            compiler.emit(OP_RAISE, f"Função '{self.name}' não declarada")
+            return
+        if len(self.args) != len(func.params):
+            compiler.emit(OP_RAISE, f"Função '{self.name}' chamada com número incorreto de argumentos")
+            return
+        for arg in self.args:
+            arg.Compile(compiler)
+        if func.memo is not None:
+            compiler.emit(OP_CALL_MEMO, func, len(self.args), compiler.steps)
+        elif self.checked:
+            compiler.emit(OP_CALL_UNCHECKED, func, len(self.args), compiler.steps)
+        else:
+            compiler.emit(OP_CALL, func, len(self.args), compiler.steps)
+
+    def Close(self, closer):
+        func = closer.functions[self.name]
+        args = [arg.Close(closer) for arg in self.args]
+        padding = [None] * (func.frame_size - len(args))
+        checks = None if self.checked else list(zip(func.param_types, func.params))
+        name = self.name
+
+        def call(frame):
+            local = [arg(frame) for arg in args]
+            if checks is not None:
+                for value, (expected, (_, param_name)) in zip(local, checks):
+                    if type(value) is not expected and type_name(value) != expected.__name__:
+                        raise Exception(f"Tipo incompatível na chamada da função '{name}' para o parâmetro '{param_name}'")
+            if padding:
+                local += padding
+            result = func.body(local)
+            while result is TAIL_CALL:
+                result = func.body(local)
+            return None if result is RETURN_VOID else result
+        return call
+
+    def Transpile(self, transpiler):
+        return f"f_{self.name}({', '.join(self.transpile_arguments(transpiler))})"
+
+    def transpile_arguments(self, transpiler):
+        func = transpiler.functions[self.name]
+        args = []
+        for arg, (param_type, param_name) in zip(self.args, func.params):
+            code = arg.Transpile(transpiler)
+            if not self.checked:
+                code = f"check_argument({code}, {param_type}, {self.name!r}, {param_name!r})"
+            args.append(code)
+        return args
+
+    def Resolve(self, scope):
+        func = scope.functions.get(self.name)
+        if func is None:
+            raise Exception(f"Função '{self.name}' não declarada")
+        scope.function.callees.add(self.name)
+        if len(self.args) != len(func.params):
+            raise Exception(f"Função '{self.name}' chamada com número incorreto de argumentos")
+        self.checked = True
+        for arg, (param_type, param_name) in zip(self.args, func.params):
+            arg_type = arg.Resolve(scope)
+            if arg_type is None:
+                self.checked = False
+            elif not assignable(param_type, arg_type):
+                raise Exception(f"Tipo incompatível na chamada da função '{self.name}' para o parâmetro '{param_name}'")
+        # A non-void function that can fall off its end returns void at runtime
+        if func.return_type == 'void' or func.always_returns:
+            return func.return_type
+        return None
+
+    def Optimize(self):
+        self.args = [arg.Optimize() for arg in self.args]
+        return self
+
+    def Inline(self, arguments):
+        node = FuncCall(self.name, [arg.Inline(arguments) for arg in self.args])
+        node.checked = self.checked
+        return node
+
+    def Transform(self, replace):
+        self.args = [arg.Transform(replace) for arg in self.args]
+        return replace(self)
+
+class CallStatement(FuncCall):
+    # A function call used as a statement: its result is discarded
+    __slots__ = ()
+
+    def Evaluate(self, frame, func_table):
+        FuncCall.Evaluate(self, frame, func_table)
+
+    def Compile(self, compiler):
+        super().Compile(compiler)
+        compiler.emit(OP_POP)
+
+    def Close(self, closer):
+        call = super().Close(closer)
+
+        def statement(frame):
+            call(frame)
+        return statement
+
+    def Transpile(self, transpiler):
+        transpiler.line(super().Transpile(transpiler))
 
 class ReturnNode(Node):
+    __slots__ = ('expression',)
+
     def __init__(self, expression):
-        super().__init__()
         self.expression = expression
 
-    def Evaluate(self, symbol_table, func_table):
-        value, var_type = self.expression.Evaluate(symbol_table, func_table)
-        # Raise an exception to unwind the call stack
-        raise ReturnException(value, var_type)
+    def Evaluate(self, frame, func_table):
+        # Statements complete with None; a return completes with the (value, type) result,
+        # which Block, IfNode and WhileNode pass up unchanged until FuncCall receives it
+        return self.expression.Evaluate(frame, func_table)
 
-class ReturnException(Exception):
-    def __init__(self, value, var_type):
-        self.value = value
-        self.var_type = var_type
+    def Compile(self, compiler):
+        self.expression.Compile(compiler)
+        if compiler.memo is not None:
+            compiler.emit(OP_RETURN_MEMO, compiler.memo)
+        else:
+            compiler.emit(OP_RETURN)
+
+    def Close(self, closer):
+        expression = self.expression.Close(closer)
+
+        def return_value(frame):
+            value = expression(frame)
+            # Statements complete with None, so a void result needs its own marker
+            return RETURN_VOID if value is None else value
+        return return_value
+
+    def Transpile(self, transpiler):
+        value = self.expression.Transpile(transpiler)
+        if transpiler.memo is not None:
+            value = f"{transpiler.memo}.remember(memo_key, {value})"
+        transpiler.line(f"return {value}")
+
+    def Resolve(self, scope):
+        expr_type = self.expression.Resolve(scope)
+        return_type = scope.function.return_type
+        if expr_type is not None and not assignable(return_type, expr_type):
+            raise Exception(f"Tipo de retorno incompatível na função '{scope.function.name}'. Esperado '{return_type}', recebido '{expr_type}'.")
+
+    def Optimize(self):
+        self.expression = self.expression.Optimize()
+        return self
+
+    def Transform(self, replace):
+        self.expression = self.expression.Transform(replace)
+        return replace(self)
+
+# Completion of a tail call: the arguments are already in the frame, and the caller runs the
+# function body again instead of nesting one more call
+TAIL_CALL = object()
+
+class TailCall(ReturnNode):
+    # 'return f(...)' inside f itself, put in place of the ReturnNode by the Resolver. The
+    # arguments overwrite the current frame and the body starts over, so tail recursion
+    # runs in constant stack and memory in every engine.
+    __slots__ = ()
+
+    def Evaluate(self, frame, func_table):
+        call = self.expression
+        func_decl = call.func
+        if func_decl is None:
+            func_decl = call.func = func_table.get(call.name)
+        values = []
+        for arg_expr, (param_type, param_name) in zip(call.args, func_decl.params):
+            arg_value, arg_type = arg_expr.Evaluate(frame, func_table)
+            if arg_type != param_type and not (param_type == 'int' and arg_type == 'bool'):
+                raise Exception(f"Tipo incompatível na chamada da função '{call.name}' para o parâmetro '{param_name}'")
+            values.append(arg_value)
+        # Locals start over as None, as in a new frame
+        frame[len(values):] = [None] * (len(frame) - len(values))
+        frame[:len(values)] = values
+        return TAIL_CALL
+
+    def Compile(self, compiler):
+        call = self.expression
+        for arg in call.args:
+            arg.Compile(compiler)
+        opcode = OP_TAIL_CALL_UNCHECKED if call.checked else OP_TAIL_CALL
+        compiler.emit(opcode, compiler.functions[call.name], len(call.args), compiler.steps)
+
+    def Close(self, closer):
+        call = self.expression
+        func = closer.functions[call.name]
+        args = [arg.Close(closer) for arg in call.args]
+        checks = None if call.checked else list(zip(func.param_types, func.params))
+        arity = len(args)
+        padding = [None] * (func.frame_size - arity)
+        name = call.name
+
+        def tail_call(frame):
+            values = [arg(frame) for arg in args]
+            if checks is not None:
+                for value, (expected, (_, param_name)) in zip(values, checks):
+                    if type(value) is not expected and type_name(value) != expected.__name__:
+                        raise Exception(f"Tipo incompatível na chamada da função '{name}' para o parâmetro '{param_name}'")
+            frame[:arity] = values
+            frame[arity:] = padding
+            return TAIL_CALL
+        return tail_call
+
+    def Transpile(self, transpiler):
+        call = self.expression
+        args = call.transpile_arguments(transpiler)
+        if args:
+            params = ", ".join(f"v{slot}" for slot in range(len(args)))
+            transpiler.line(f"{params} = {', '.join(args)}")
+        locals_ = [f"v{slot}" for slot in range(len(args), transpiler.functions[call.name].frame_size)]
+        if locals_:
+            transpiler.line(" = ".join(locals_) + " = None")
+        if transpiler.loops:
+            # 'continue' would resume the innermost language loop: leave every loop instead
+            transpiler.line("tail_call = True")
+            transpiler.line("break")
+            transpiler.tail_breaks = True
+        else:
+            transpiler.line("continue")
+        transpiler.tail_calls = True
+
+class InlineCall(Node):
+    # A call to a small function replaced by the Inliner with the expression the function
+    # returns. Arguments that could not be substituted into the expression are evaluated
+    # first, in order, into slots added to the caller's frame.
+    __slots__ = ('name', 'stores', 'expression')
+
+    def __init__(self, name, stores, expression):
+        self.name = name  # The inlined function
+        self.stores = stores  # List of (slot, argument) pairs
+        self.expression = expression
+
+    def Evaluate(self, frame, func_table):
+        for slot, arg in self.stores:
+            frame[slot] = arg.Evaluate(frame, func_table)[0]
+        return self.expression.Evaluate(frame, func_table)
+
+    def Compile(self, compiler):
+        for slot, arg in self.stores:
+            arg.Compile(compiler)
+            compiler.emit(OP_STORE, slot)
+        self.expression.Compile(compiler)
+
+    def Close(self, closer):
+        stores = [(slot, arg.Close(closer)) for slot, arg in self.stores]
+        expression = self.expression.Close(closer)
+        if len(stores) == 1:
+            [(slot, arg)] = stores
+
+            def inline_one(frame):
+                frame[slot] = arg(frame)
+                return expression(frame)
+            return inline_one
+
+        def inline(frame):
+            for slot, arg in stores:
+                frame[slot] = arg(frame)
+            return expression(frame)
+        return inline
+
+    def Transpile(self, transpiler):
+        # '(v := a) is v' stores the argument and is always true, whatever its value; a
+        # conditional is cheaper than building a tuple of the stores and the result
+        stores = " and ".join(f"(v{slot} := {arg.Transpile(transpiler)}) is v{slot}" for slot, arg in self.stores)
+        return f"({self.expression.Transpile(transpiler)} if {stores} else None)"
+
+    def Transform(self, replace):
+        self.stores = [(slot, arg.Transform(replace)) for slot, arg in self.stores]
+        self.expression = self.expression.Transform(replace)
+        return replace(self)
 
 class FuncTable:
-    def __init__(self):
+    def __init__(self, io=None):
         self.functions = {}
+        self.io = io  # ProgramIO used by printf and scanf
 
     def declare(self, name, func_node):
         if name in self.functions:
@@ -512,20 +1061,46 @@ class FuncTable:
             raise Exception(f"Função '{name}' não declarada")
 
 class BinOp(Node):
+    __slots__ = ('value', 'left', 'right', 'type', 'checked')
+
     def __init__(self, value, left, right):
-        super().__init__(value)
-        self.children = [left, right]
+        self.value = value  # The operator
+        self.left = left
+        self.right = right
+        self.type = None  # Static result type, None when only known at runtime
+        self.checked = False  # True when both operand types were proved statically
+
+    def Evaluate(self, frame, func_table):
+        left_val, left_type = self.left.Evaluate(frame, func_table)
+        right_val, right_type = self.right.Evaluate(frame, func_table)
 
-    def Evaluate(self, symbol_table, func_table):
-        left_val, left_type = self.children[0].Evaluate(symbol_table, func_table)
-        right_val, right_type = self.children[1].Evaluate(symbol_table, func_table)
+        if self.checked:
+            # Operand types proved by the Resolver: only the operation itself is left
+            op = self.value
+            if op == '+':
+                if self.type == 'str':
+                    return (concat(left_val, right_val), 'str')
+                return (left_val + right_val, 'int')
+            if op == '-':
+                return (left_val - right_val, 'int')
+            if op == '*':
+                return (left_val * right_val, 'int')
+            if op == '/':
+                if right_val == 0:
+                    raise ValueError("Divisão por zero")
+                return (left_val // right_val, 'int')
+            if op == '&&':
+                return (1 if left_val and right_val else 0, 'int')
+            if op == '||':
+                return (1 if left_val or right_val else 0, 'int')
+            return (1 if COMPARISONS[op](left_val, right_val) else 0, 'int')
 
         # Arithmetic operations
         if self.value in ('+', '-', '*', '/'):
             if self.value == '+':
                 # String concatenation
                 if left_type == 'str' or right_type == 'str':
-                    return (str(left_val) + str(right_val), 'str')
+                    return (concat(left_val, right_val), 'str')
                 # Numeric operation
                 elif left_type in ('int', 'bool') and right_type in ('int', 'bool'):
                     return (int(left_val) + int(right_val), 'int')
@@ -579,13 +1154,148 @@ class BinOp(Node):
             else:
                 raise Exception("Tipos incompatíveis para operadores relacionais")
 
+    def Compile(self, compiler):
+        op = self.value
+        if op in COMPARISONS:
+            self.left.Compile(compiler)
+            self.right.Compile(compiler)
+            compiler.emit(OP_COMPARE_UNCHECKED if self.checked else OP_COMPARE, None, COMPARISONS[op])
+        elif compiler.strings and op == '+' and self.type != 'int':
+            # Concatenations are charged against the string size limit
+            self.left.Compile(compiler)
+            self.right.Compile(compiler)
+            compiler.emit(OP_ADD_LIMITED)
+        elif compiler.products and op == '*':
+            # And products against the memory limit, before they are computed
+            self.left.Compile(compiler)
+            self.right.Compile(compiler)
+            compiler.emit(OP_MUL_LIMITED)
+        else:
+            form, left, right = compiler.operands(self.left, self.right)
+            first = OP_BINARY_CONST_UNCHECKED if self.checked and self.type == 'int' else OP_BINARY_CONST
+            compiler.emit(first + form, left, right, op)
+
+    def Close(self, closer):
+        left = self.left.Close(closer)
+        right = self.right.Close(closer)
+        op = self.value
+        if not self.checked:
+            # Operand types only known at runtime: check them on every evaluation
+            return lambda frame: binary_operation(op, left(frame), right(frame))
+        if op == '+':
+            if self.type == 'str':
+                return lambda frame: concat(left(frame), right(frame))
+            return lambda frame: left(frame) + right(frame)
+        if op == '-':
+            return lambda frame: left(frame) - right(frame)
+        if op == '*':
+            return lambda frame: left(frame) * right(frame)
+        if op == '/':
+            def divide(frame):
+                dividend = left(frame)
+                divisor = right(frame)
+                if divisor == 0:
+                    raise ValueError("Divisão por zero")
+                return dividend // divisor
+            return divide
+        if op == '&&' or op == '||':
+            # Both operands are always evaluated, as in Evaluate
+            def logical(frame):
+                a = left(frame)
+                b = right(frame)
+                return 1 if (a and b if op == '&&' else a or b) else 0
+            return logical
+        if op == '==':
+            return lambda frame: 1 if left(frame) == right(frame) else 0
+        if op == '!=':
+            return lambda frame: 1 if left(frame) != right(frame) else 0
+        if op == '<':
+            return lambda frame: 1 if left(frame) < right(frame) else 0
+        if op == '<=':
+            return lambda frame: 1 if left(frame) <= right(frame) else 0
+        if op == '>':
+            return lambda frame: 1 if left(frame) > right(frame) else 0
+        return lambda frame: 1 if left(frame) >= right(frame) else 0
+
+    def Transpile(self, transpiler):
+        left = self.left.Transpile(transpiler)
+        right = self.right.Transpile(transpiler)
+        op = self.value
+        if not self.checked:
+            return f"binary_operation({op!r}, {left}, {right})"
+        if op == '+' and self.type == 'str':
+            return f"concat({left}, {right})"
+        if op in ('+', '-', '*'):
+            return f"({left} {op} {right})"
+        if op == '/':
+            return f"divide({left}, {right})"
+        # '&' and '|' on bools evaluate both sides, as Evaluate does
+        if op == '&&':
+            return f"(1 if ({left} != 0) & ({right} != 0) else 0)"
+        if op == '||':
+            return f"(1 if ({left} != 0) | ({right} != 0) else 0)"
+        # Parenthesized so that Python never chains comparisons
+        return f"(1 if ({left}) {op} ({right}) else 0)"
+
+    def Resolve(self, scope):
+        left_type = self.left.Resolve(scope)
+        right_type = self.right.Resolve(scope)
+        self.checked = left_type is not None and right_type is not None
+        numeric = left_type in ('int', 'bool') and right_type in ('int', 'bool')
+
+        # Same rules as Evaluate, applied to whichever operand types are known
+        if self.value == '+':
+            if left_type == 'str' or right_type == 'str':
+                self.type = 'str'
+            elif numeric:
+                self.type = 'int'
+            elif self.checked:
+                raise Exception("Tipos incompatíveis para '+'")
+        else:
+            self.type = 'int'
+            if self.checked and not numeric:
+                if self.value in ('-', '*', '/'):
+                    raise Exception(f"Tipos incompatíveis para '{self.value}'")
+                if self.value in ('&&', '||'):
+                    raise Exception("Tipos incompatíveis para operadores lógicos")
+                if left_type != right_type:
+                    raise Exception("Tipos incompatíveis para operadores relacionais")
+        return self.type
+
+    def Optimize(self):
+        self.left = self.left.Optimize()
+        self.right = self.right.Optimize()
+        return Optimizer.fold(self, self.left, self.right)
+
+    def Inline(self, arguments):
+        node = BinOp(self.value, self.left.Inline(arguments), self.right.Inline(arguments))
+        node.type = self.type
+        node.checked = self.checked
+        return node
+
+    def Transform(self, replace):
+        self.left = self.left.Transform(replace)
+        self.right = self.right.Transform(replace)
+        return replace(self)
+
 class UnOp(Node):
-    def __init__(self, value, child):
-        super().__init__(value)
-        self.children = [child]
+    __slots__ = ('value', 'operand', 'checked')
+
+    def __init__(self, value, operand):
+        self.value = value  # The operator
+        self.operand = operand
+        self.checked = False  # True when the operand was proved to be an int
 
-    def Evaluate(self, symbol_table, func_table):
-        child_val, child_type = self.children[0].Evaluate(symbol_table, func_table)
+    def Evaluate(self, frame, func_table):
+        child_val, child_type = self.operand.Evaluate(frame, func_table)
+
+        if self.checked:
+            # The operand was proved to be an int
+            if self.value == '-':
+                return (-child_val, 'int')
+            if self.value == '!':
+                return (0 if child_val else 1, 'int')
+            return (child_val, 'int')
 
         if self.value == '+':
             if child_type in ('int', 'bool'):
@@ -603,174 +1313,3242 @@ class UnOp(Node):
             else:
                 raise Exception("Operador '!' aplicado a tipo inválido")
 
+    def Compile(self, compiler):
+        self.operand.Compile(compiler)
+        # Unary '+' on a proven int is the value itself
+        if not self.checked:
+            compiler.emit(OP_UNARY, self.value)
+        elif self.value != '+':
+            compiler.emit(OP_UNARY_UNCHECKED, self.value)
+
+    def Close(self, closer):
+        operand = self.operand.Close(closer)
+        op = self.value
+        if not self.checked:
+            return lambda frame: unary_operation(op, operand(frame))
+        if op == '-':
+            return lambda frame: -operand(frame)
+        if op == '!':
+            return lambda frame: 0 if operand(frame) else 1
+        return operand
+
+    def Transpile(self, transpiler):
+        operand = self.operand.Transpile(transpiler)
+        if not self.checked:
+            return f"unary_operation({self.value!r}, {operand})"
+        if self.value == '-':
+            return f"(-{operand})"
+        if self.value == '!':
+            return f"(0 if {operand} else 1)"
+        return operand
+
+    def Resolve(self, scope):
+        child_type = self.operand.Resolve(scope)
+        if child_type is not None:
+            if child_type not in ('int', 'bool'):
+                if self.value == '!':
+                    raise Exception("Operador '!' aplicado a tipo inválido")
+                raise Exception(f"Operador '{self.value}' unário aplicado a tipo inválido")
+            self.checked = True
+        return 'int'
+
+    def Optimize(self):
+        child = self.operand = self.operand.Optimize()
+        if Optimizer.is_constant(child):
+            return Optimizer.fold(self, child)
+        # '+x' and '-(-x)' are x itself once x is known to be an int
+        if self.value == '+' and Optimizer.produces_int(child):
+            return child
+        if self.value == '-' and isinstance(child, UnOp) and child.value == '-' and Optimizer.produces_int(child.operand):
+            return child.operand
+        # '!!x' is x when x is already 0 or 1
+        if self.value == '!' and isinstance(child, UnOp) and child.value == '!' and Optimizer.produces_bool(child.operand):
+            return child.operand
+        return self
+
+    def Inline(self, arguments):
+        node = UnOp(self.value, self.operand.Inline(arguments))
+        node.checked = self.checked
+        return node
+
+    def Transform(self, replace):
+        self.operand = self.operand.Transform(replace)
+        return replace(self)
+
 class IntVal(Node):
+    # Literals are never modified once parsed, so the parser shares one node per value
+    __slots__ = ('value',)
+
     def __init__(self, value):
-        super().__init__(value)
+        self.value = value
 
-    def Evaluate(self, symbol_table, func_table):
+    def Evaluate(self, frame, func_table):
         return (self.value, 'int')
 
+    def Compile(self, compiler):
+        compiler.emit(OP_CONST, self.value)
+
+    def Close(self, closer):
+        value = self.value
+        return lambda frame: value
+
+    def Transpile(self, transpiler):
+        return repr(self.value)
+
+    def Resolve(self, scope):
+        return 'int'
+
 class StringVal(Node):
+    __slots__ = ('value',)
+
     def __init__(self, value):
-        super().__init__(value)
+        self.value = value
 
-    def Evaluate(self, symbol_table, func_table):
+    def Evaluate(self, frame, func_table):
         return (self.value, 'str')
 
+    def Compile(self, compiler):
+        compiler.emit(OP_CONST, self.value)
+
+    def Close(self, closer):
+        value = self.value
+        return lambda frame: value
+
+    def Transpile(self, transpiler):
+        return repr(self.value)
+
+    def Resolve(self, scope):
+        return 'str'
+
 class NoOp(Node):
-    def Evaluate(self, symbol_table, func_table):
-        return (None, None)
+    __slots__ = ()
+
+    def Evaluate(self, frame, func_table):
+        return None
+
+    def Compile(self, compiler):
+        pass
+
+    def Close(self, closer):
+        return lambda frame: None
+
+    def Transpile(self, transpiler):
+        pass
+
+    def Resolve(self, scope):
+        return None
 
 class SymbolTable:
-    def __init__(self, parent=None):
-        self.symbols = {}
-        self.parent = parent
+    # Compile-time scope of one function, followed along the statements as they run: maps
+    # each variable to its frame slot and tracks, at the current statement, which variables
+    # are declared on every path that reaches it (with their type), which may be declared
+    # on some path (with their type, None when paths disagree) and which were assigned a
+    # value on every path. Only what fails on every path is rejected: a variable that only
+    # some paths declare gets a flag slot, set by its declarations and checked at run time
+    # wherever the path taken decides whether a use or a declaration fails.
+    def __init__(self, functions=None):
+        self.slots = {}
+        self.flags = {}  # Flag slot of the variables checked at run time
+        self.declared = {}
+        self.maybe_declared = {}
+        self.assigned = set()
+        self.unsure = set()  # Reads and assignments of a variable some path did not declare
+        self.functions = functions  # Every FuncDec of the program, by name
+        self.function = None  # FuncDec being resolved
+
+    def size(self):
+        return len(self.slots) + len(self.flags)
 
     def declare(self, identifier, var_type):
-        if identifier in self.symbols:
+        # Returns the slot of the variable and whether some path may have declared it already
+        if identifier in self.declared:
             raise Exception(f"Variável '{identifier}' já declarada.")
-        self.symbols[identifier] = [None, var_type]
+        redeclared = identifier in self.maybe_declared
+        if redeclared:
+            self.flag(identifier)
+        self.declared[identifier] = var_type
+        self.maybe_declared[identifier] = var_type
+        self.assigned.discard(identifier)
+        if identifier not in self.slots:
+            self.slots[identifier] = self.size()
+        return self.slots[identifier], redeclared
 
     def get(self, identifier):
-        if identifier in self.symbols:
-            value, var_type = self.symbols[identifier]
-            return value, var_type
-        elif self.parent:
-            return self.parent.get(identifier)
-        else:
+        # Returns the slot and type of the variable and whether some path did not declare it
+        if identifier in self.declared:
+            return self.slots[identifier], self.declared[identifier], False
+        if identifier not in self.maybe_declared:
             raise Exception(f"Variável '{identifier}' não declarada.")
+        if self.maybe_declared[identifier] is None:
+            raise Exception(f"Variável '{identifier}' declarada com tipos diferentes conforme o caminho.")
+        self.flag(identifier)
+        return self.slots[identifier], self.maybe_declared[identifier], True
 
-    def set(self, identifier, value, var_type):
-        if identifier in self.symbols:
-            expected_type = self.symbols[identifier][1]
-            if var_type != expected_type and not (expected_type == 'int' and var_type == 'bool'):
-                raise Exception(f"Tipo incompatível para '{identifier}'. Esperado '{expected_type}', recebido '{var_type}'.")
-            self.symbols[identifier][0] = value
-        elif self.parent:
-            self.parent.set(identifier, value, var_type)
-        else:
-            raise Exception(f"Variável '{identifier}' não declarada.")
+    def flag(self, identifier):
+        if identifier not in self.flags:
+            self.flags[identifier] = self.size()
 
-class Identifier(Node):
-    def __init__(self, value):
-        super().__init__(value)
+    def loop(self, declarations):
+        # What a loop body declares may already be declared when the body runs again
+        for name, var_type in declarations:
+            if name not in self.declared:
+                self.maybe_declared[name] = var_type if self.maybe_declared.get(name, var_type) == var_type else None
 
-    def Evaluate(self, symbol_table, func_table):
-        return symbol_table.get(self.value)
+    def assign(self, identifier):
+        self.assigned.add(identifier)
 
-class Assignment(Node):
-    def __init__(self, identifier, expression):
-        super().__init__()
-        self.identifier = identifier
-        self.children = [expression]
+    def state(self):
+        return dict(self.declared), dict(self.maybe_declared), set(self.assigned)
 
-    def Evaluate(self, symbol_table, func_table):
-        value, var_type = self.children[0].Evaluate(symbol_table, func_table)
-        symbol_table.set(self.identifier, value, var_type)
+    def restore(self, state):
+        self.declared, self.maybe_declared, self.assigned = dict(state[0]), dict(state[1]), set(state[2])
 
-class VarDec(Node):
-    def __init__(self, var_type, var_list):
-        super().__init__()
-        self.var_type = var_type
-        self.var_list = var_list  # List of tuples (name, expression or None)
+    def merge(self, states):
+        # The state after paths that join: what holds on all of them
+        declared, maybe_declared, assigned = states[0]
+        maybe_declared = dict(maybe_declared)
+        for other in states[1:]:
+            declared = {name: var_type for name, var_type in declared.items() if other[0].get(name) == var_type}
+            for name, var_type in other[1].items():
+                maybe_declared[name] = var_type if maybe_declared.get(name, var_type) == var_type else None
+            assigned = assigned & other[2]
+        self.restore((declared, maybe_declared, assigned))
 
-    def Evaluate(self, symbol_table, func_table):
-        for var_name, expr in self.var_list:
-            symbol_table.declare(var_name, self.var_type)
-            if expr:
-                value, expr_type = expr.Evaluate(symbol_table, func_table)
-                # Allow assignment of 'bool' to 'int'
-                if expr_type != self.var_type and not (self.var_type == 'int' and expr_type == 'bool'):
-                    raise Exception(f"Tipo incompatível na atribuição para '{var_name}'. Esperado '{self.var_type}', recebido '{expr_type}'.")
-                symbol_table.set(var_name, value, expr_type)
+    def track(self, node):
+        # Run over the function once it is resolved, when every variable needing a flag is
+        # known: declarations set the flag, and unsure reads and assigned values check it
+        if type(node) is VarDec:
+            node.flags = [self.flags.get(var_name) for var_name, _ in node.var_list]
+        elif node in self.unsure:
+            if type(node) is Assignment:
+                node.expression = CheckDeclared(node.expression, self.flags[node.identifier], node.identifier)
+            else:
+                return CheckDeclared(node, self.flags[node.value], node.value)
+        return node
 
-class ScanfNode(Node):
-    def Evaluate(self, symbol_table, func_table):
-        value = int(input())
-        return (value, 'int')
+def assignable(expected_type, var_type):
+    return var_type == expected_type or (expected_type == 'int' and var_type == 'bool')
 
-class Print(Node):
-    def __init__(self, expression):
-        super().__init__()
-        self.children = [expression]
+# Largest returned expression, in nodes, of a function the Inliner puts at its call sites
+DEFAULT_INLINE_SIZE = 16
 
-    def Evaluate(self, symbol_table, func_table):
-        value, var_type = self.children[0].Evaluate(symbol_table, func_table)
-        print(value)
+class Optimizer:
+    # AST pass run between parsing and evaluation: folds constant subexpressions with the
+    # exact semantics of Evaluate, prunes branches behind literal conditions and drops NoOps
+    @staticmethod
+    def run(program, inline_size=DEFAULT_INLINE_SIZE, fuse=True):
+        program.Optimize()
+        if inline_size:
+            Inliner.run(program, inline_size)
+        if fuse:
+            Fuser.run(program)
+        return program
 
-class Block(Node):
-    def __init__(self, statements):
-        super().__init__()
-        self.children = statements
+    @staticmethod
+    def is_constant(node):
+        return isinstance(node, (IntVal, StringVal))
 
-    def Evaluate(self, symbol_table, func_table):
-        for statement in self.children:
-            statement.Evaluate(symbol_table, func_table)
+    @staticmethod
+    def fold(node, *operands):
+        if not all(Optimizer.is_constant(operand) for operand in operands):
+            return node
+        try:
+            value, value_type = node.Evaluate(None, None)
+        except Exception:
+            # Operations that fail (e.g. division by zero) must still fail at runtime
+            return node
+        if value_type == 'str':
+            return StringVal(str(value))
+        return IntVal(int(value))
 
-class IfNode(Node):
-    def __init__(self, condition, if_block, else_block=None):
-        super().__init__()
-        self.children = [condition, if_block]
-        if else_block:
-            self.children.append(else_block)
-
-    def Evaluate(self, symbol_table, func_table):
-        condition_val, condition_type = self.children[0].Evaluate(symbol_table, func_table)
-        if condition_type not in ('int', 'bool'):
-            raise Exception("Condição do 'if' deve ser do tipo 'int' ou 'bool'")
-        if bool(int(condition_val)):
-            self.children[1].Evaluate(symbol_table, func_table)
-        elif len(self.children) == 3:
-            self.children[2].Evaluate(symbol_table, func_table)
+    @staticmethod
+    def produces_bool(node):
+        if isinstance(node, BinOp):
+            return node.value in ('==', '!=', '<', '<=', '>', '>=', '&&', '||')
+        return isinstance(node, UnOp) and node.value == '!'
 
-class WhileNode(Node):
-    def __init__(self, condition, block):
-        super().__init__()
-        self.children = [condition, block]
+    @staticmethod
+    def produces_int(node):
+        # Conservative: True only when the node can only ever evaluate to an int (or raise)
+        if isinstance(node, (IntVal, UnOp, ScanfNode)):
+            return True
+        if isinstance(node, Identifier):
+            return node.var_type == 'int'
+        if isinstance(node, BinOp):
+            return node.value != '+' or (Optimizer.produces_int(node.left) and Optimizer.produces_int(node.right))
+        return False
 
-    def Evaluate(self, symbol_table, func_table):
-        while True:
-            condition_val, condition_type = self.children[0].Evaluate(symbol_table, func_table)
-            if condition_type not in ('int', 'bool'):
-                raise Exception("Condição do 'while' deve ser do tipo 'int' ou 'bool'")
-            if not bool(int(condition_val)):
-                break
-            self.children[1].Evaluate(symbol_table, func_table)
+class Inliner:
+    # Replaces calls to small non-recursive functions whose body is a single 'return' with
+    # the returned expression, so loops calling helpers stop paying for a frame per call.
+    # Literal and variable arguments are substituted into the expression: expressions cannot
+    # assign, so a variable keeps its value while the expression runs. Other arguments are
+    # stored once into new slots of the caller's frame. Only calls whose argument types were
+    # all proved are inlined, since the checks of a call would otherwise be lost.
+    def __init__(self, candidates):
+        self.candidates = candidates  # Name -> copy of the returned expression
+        self.caller = None
+        self.expanding = set()  # Functions being inlined, so mutual calls are not expanded forever
+        self.inlined = 0
 
-def main():
-    if len(sys.argv) > 1:
-        file_name = sys.argv[1]
-        try:
-            with open(file_name, 'r') as file:
-                code = file.read()
-        except FileNotFoundError:
-            print(f"Erro: Arquivo '{file_name}' não encontrado.", file=sys.stderr)
-            sys.exit(1)
-    else:
-        print("Erro: Nenhum arquivo de entrada fornecido.", file=sys.stderr)
-        sys.exit(1)
+    @staticmethod
+    def run(program, max_size=DEFAULT_INLINE_SIZE):
+        candidates = {}
+        for func in program.functions:
+            expression = Inliner.returned_expression(func)
+            if expression is not None and count_nodes(expression) <= max_size:
+                # Copied now: inlining into this function's own body must not change it
+                params = []
+                for slot, (param_type, param_name) in enumerate(func.params):
+                    param = Identifier(param_name)
+                    param.slot, param.var_type = slot, param_type
+                    params.append(param)
+                candidates[func.name] = (func.params, expression.Inline(params))
+        inliner = Inliner(candidates)
+        for func in program.functions:
+            inliner.caller = func
+            func.body = func.body.Transform(inliner.replace)
+        return inliner.inlined
 
-    try:
-        # Remove comments from code
-        filtered_code = PrePro.filter(code)
+    @staticmethod
+    def returned_expression(func):
+        body = func.body
+        if (type(body) is not Block or len(body.children) != 1 or type(body.children[0]) is not ReturnNode
+                or func.name in func.callees or func.frame_size != len(func.params)):
+            return None
+        return body.children[0].expression
 
-        # Run the parser and generate the AST
-        ast = Parser.run(filtered_code)
+    def replace(self, node):
+        if type(node) is not FuncCall or not node.checked or node.name in self.expanding:
+            return node
+        candidate = self.candidates.get(node.name)
+        if candidate is None:
+            return node
+        params, expression = candidate
+        caller = self.caller
+        stores = []
+        arguments = []
+        for arg, (param_type, param_name) in zip(node.args, params):
+            if isinstance(arg, (IntVal, StringVal, Identifier)):
+                arguments.append(arg)
+                continue
+            param = Identifier(param_name)
+            param.slot, param.var_type = caller.frame_size, param_type
+            caller.frame_size += 1
+            stores.append((param.slot, arg))
+            arguments.append(param)
+        self.inlined += 1
+        # Calls in the inlined expression are inlined in turn, and constants folded
+        self.expanding.add(node.name)
+        expression = expression.Inline(arguments).Transform(self.replace).Optimize()
+        self.expanding.discard(node.name)
+        if not stores:
+            return expression
+        return InlineCall(node.name, stores, expression)
 
-        # Create the global symbol table and function table
-        symbol_table = SymbolTable()
-        func_table = FuncTable()
+def count_nodes(node):
+    count = 0
 
-        # Evaluate the AST (Program node)
-        ast.Evaluate(symbol_table, func_table)
+    def visit(current):
+        nonlocal count
+        count += 1
+        return current
 
-        # Start execution by calling 'main' function
-        main_call = FuncCall('main', [])
-        main_call.Evaluate(symbol_table, func_table)
+    node.Transform(visit)
+    return count
 
-    except Exception as e:
-        print(f"Erro: {e}", file=sys.stderr)
-        sys.exit(1)
+class Resolver:
+    # Static semantic analysis run once after parsing: gives every local a frame slot, checks
+    # that variables and functions are declared before use, and infers the type of every
+    # expression, rejecting anything the runtime checks would reject (return types included).
+    # Nodes whose operand types were all proved are marked 'checked' so engines can skip
+    # their runtime checks; only results of non-void functions that may fall off their end
+    # (and so return void) and variables read before some path assigned them stay unknown.
+    @staticmethod
+    def run(program):
+        functions = {}
+        for func in program.functions:
+            if func.name in functions:
+                raise Exception(f"Função '{func.name}' já declarada")
+            functions[func.name] = func
+            func.always_returns = Resolver.always_returns(func.body)
+        for func in program.functions:
+            func.Resolve(SymbolTable(functions))
+        Resolver.propagate_purity(functions)
+
+    @staticmethod
+    def propagate_purity(functions):
+        # A function calling an impure function is impure too; propagate until nothing changes
+        changed = True
+        while changed:
+            changed = False
+            for func in functions.values():
+                if func.pure and not all(functions[name].pure for name in func.callees):
+                    func.pure = False
+                    changed = True
+
+    @staticmethod
+    def declarations(statement):
+        # (name, type) of every variable a statement declares, in nested statements too
+        if isinstance(statement, VarDec):
+            return [(var_name, statement.var_type) for var_name, _ in statement.var_list]
+        if isinstance(statement, Block):
+            return [declaration for child in statement.children for declaration in Resolver.declarations(child)]
+        if isinstance(statement, IfNode):
+            return Resolver.declarations(statement.then_branch) + (
+                Resolver.declarations(statement.else_branch) if statement.else_branch is not None else [])
+        if isinstance(statement, WhileNode):
+            return Resolver.declarations(statement.body)
+        return []
+
+    @staticmethod
+    def always_returns(statement):
+        if isinstance(statement, ReturnNode):
+            return True
+        if isinstance(statement, Block):
+            return any(Resolver.always_returns(child) for child in statement.children)
+        if isinstance(statement, IfNode):
+            return (statement.else_branch is not None and Resolver.always_returns(statement.then_branch)
+                    and Resolver.always_returns(statement.else_branch))
+        if isinstance(statement, WhileNode):
+            # There is no 'break': a loop on a nonzero literal only ends through a return
+            condition = statement.condition
+            return isinstance(condition, IntVal) and condition.value != 0
+        return False
+
+class Identifier(Node):
+    __slots__ = ('value', 'slot', 'var_type')
+
+    def __init__(self, value):
+        self.value = value  # The variable name
+        self.slot = None
+        self.var_type = None
+
+    def Evaluate(self, frame, func_table):
+        return (frame[self.slot], self.var_type)
+
+    def Compile(self, compiler):
+        compiler.emit(OP_LOAD, self.slot)
+
+    def Close(self, closer):
+        slot = self.slot
+        return lambda frame: frame[slot]
+
+    def Transpile(self, transpiler):
+        return f"v{self.slot}"
+
+    def Resolve(self, scope):
+        self.slot, self.var_type, unsure = scope.get(self.value)
+        if unsure:
+            scope.unsure.add(self)
+        # A variable that some path declared without assigning holds None: its type is not
+        # proved, so whatever uses it keeps its runtime checks
+        if self.value not in scope.assigned:
+            return None
+        return self.var_type
+
+    def Inline(self, arguments):
+        return arguments[self.slot]
+
+class Assignment(Node):
+    __slots__ = ('identifier', 'expression', 'slot', 'var_type', 'checked')
+
+    def __init__(self, identifier, expression):
+        self.identifier = identifier
+        self.expression = expression
+        self.slot = None
+        self.var_type = None
+        self.checked = False  # True when the Resolver proved the expression type matches
+
+    def Evaluate(self, frame, func_table):
+        value, var_type = self.expression.Evaluate(frame, func_table)
+        if not self.checked and not assignable(self.var_type, var_type):
+            raise Exception(f"Tipo incompatível para '{self.identifier}'. Esperado '{self.var_type}', recebido '{var_type}'.")
+        frame[self.slot] = value
+
+    def Compile(self, compiler):
+        if self.checked and compiler.assign(self.expression, self.slot):
+            return
+        self.expression.Compile(compiler)
+        if self.checked:
+            compiler.emit(OP_STORE, self.slot)
+        else:
+            compiler.emit(OP_STORE_CHECKED, self.slot, PYTHON_TYPES[self.var_type], f"Tipo incompatível para '{self.identifier}'")
+
+    def Close(self, closer):
+        expression = self.expression.Close(closer)
+        slot = self.slot
+        if self.checked:
+            def assign(frame):
+                frame[slot] = expression(frame)
+            return assign
+        expected = PYTHON_TYPES[self.var_type]
+        message = f"Tipo incompatível para '{self.identifier}'"
+
+        def assign_checked(frame):
+            frame[slot] = check_store(expression(frame), expected, message)
+        return assign_checked
+
+    def Transpile(self, transpiler):
+        value = self.expression.Transpile(transpiler)
+        if not self.checked:
+            value = f"check_store({value}, {self.var_type}, {f'Tipo incompatível para {self.identifier!r}'!r})"
+        transpiler.line(f"v{self.slot} = {value}")
+
+    def Resolve(self, scope):
+        self.slot, self.var_type, unsure = scope.get(self.identifier)
+        if unsure:
+            scope.unsure.add(self)
+        expr_type = self.expression.Resolve(scope)
+        if expr_type is not None:
+            if not assignable(self.var_type, expr_type):
+                raise Exception(f"Tipo incompatível para '{self.identifier}'. Esperado '{self.var_type}', recebido '{expr_type}'.")
+            self.checked = True
+        scope.assign(self.identifier)
+
+    def Optimize(self):
+        self.expression = self.expression.Optimize()
+        return self
+
+    def Transform(self, replace):
+        self.expression = self.expression.Transform(replace)
+        return replace(self)
+
+class CheckDeclared(Node):
+    # Read of a variable, or value assigned to one, that only some paths declare: fails as
+    # an undeclared variable does unless the declaration on this path set the flag slot
+    __slots__ = ('expression', 'flag', 'message')
+
+    def __init__(self, expression, flag, name):
+        self.expression = expression
+        self.flag = flag
+        self.message = f"Variável '{name}' não declarada."
+
+    def Evaluate(self, frame, func_table):
+        result = self.expression.Evaluate(frame, func_table)
+        if frame[self.flag] is None:
+            raise Exception(self.message)
+        return result
+
+    def Compile(self, compiler):
+        self.expression.Compile(compiler)
+        compiler.emit(OP_DECLARED, self.flag, self.message)
+
+    def Close(self, closer):
+        expression = self.expression.Close(closer)
+        flag = self.flag
+        message = self.message
+        return lambda frame: check_declared(frame[flag], expression(frame), message)
+
+    def Transpile(self, transpiler):
+        return f"check_declared(v{self.flag}, {self.expression.Transpile(transpiler)}, {self.message!r})"
+
+    def Optimize(self):
+        self.expression = self.expression.Optimize()
+        return self
+
+    def Transform(self, replace):
+        self.expression = self.expression.Transform(replace)
+        return replace(self)
+
+class VarDec(Node):
+    __slots__ = ('var_type', 'var_list', 'slots', 'checked', 'flags', 'redeclared')
+
+    def __init__(self, var_type, var_list):
+        self.var_type = var_type
+        self.var_list = var_list  # List of tuples (name, expression or None)
+        self.slots = None  # Frame slot of each declared name, set by the Resolver
+        self.checked = None  # Per entry: True when the initializer type was proved statically
+        self.flags = None  # Per entry: flag slot set by the declaration, or None
+        self.redeclared = None  # Per entry: True when some path may have declared the name already
+
+    def declarations(self):
+        return zip(self.var_list, self.slots, self.checked, self.flags, self.redeclared)
+
+    def Evaluate(self, frame, func_table):
+        for (var_name, expr), slot, checked, flag, redeclared in self.declarations():
+            if flag is not None:
+                if redeclared and frame[flag] is not None:
+                    raise Exception(f"Variável '{var_name}' já declarada.")
+                frame[flag] = True
+            if expr:
+                value, expr_type = expr.Evaluate(frame, func_table)
+                # Allow assignment of 'bool' to 'int'
+                if not checked and not assignable(self.var_type, expr_type):
+                    raise Exception(f"Tipo incompatível na atribuição para '{var_name}'. Esperado '{self.var_type}', recebido '{expr_type}'.")
+                frame[slot] = value
+            else:
+                frame[slot] = None
+
+    def Compile(self, compiler):
+        for (var_name, expr), slot, checked, flag, redeclared in self.declarations():
+            if flag is not None:
+                compiler.emit(OP_DECLARE, flag, f"Variável '{var_name}' já declarada." if redeclared else None)
+            if expr:
+                expr.Compile(compiler)
+            else:
+                compiler.emit(OP_CONST, None)
+            if not expr or checked:
+                compiler.emit(OP_STORE, slot)
+            else:
+                compiler.emit(OP_STORE_CHECKED, slot, PYTHON_TYPES[self.var_type], f"Tipo incompatível na atribuição para '{var_name}'")
+
+    def Close(self, closer):
+        stores = []
+        for (var_name, expr), slot, checked, flag, redeclared in self.declarations():
+            message = None if checked else f"Tipo incompatível na atribuição para '{var_name}'"
+            declared = f"Variável '{var_name}' já declarada." if redeclared else None
+            stores.append((slot, expr.Close(closer) if expr else None, message, flag, declared))
+        expected = PYTHON_TYPES[self.var_type]
+
+        def declare(frame):
+            for slot, expression, message, flag, declared in stores:
+                if flag is not None:
+                    frame[flag] = True if declared is None else check_undeclared(frame[flag], declared)
+                if expression is None:
+                    frame[slot] = None
+                elif message is None:
+                    frame[slot] = expression(frame)
+                else:
+                    frame[slot] = check_store(expression(frame), expected, message)
+        return declare
+
+    def Transpile(self, transpiler):
+        for (var_name, expr), slot, checked, flag, redeclared in self.declarations():
+            if flag is not None:
+                transpiler.line(f"v{flag} = " + (f"check_undeclared(v{flag}, {f'Variável {var_name!r} já declarada.'!r})"
+                                                  if redeclared else "True"))
+            if not expr:
+                transpiler.line(f"v{slot} = None")
+                continue
+            value = expr.Transpile(transpiler)
+            if not checked:
+                value = f"check_store({value}, {self.var_type}, {f'Tipo incompatível na atribuição para {var_name!r}'!r})"
+            transpiler.line(f"v{slot} = {value}")
+
+    def Resolve(self, scope):
+        self.slots = []
+        self.checked = []
+        self.flags = [None] * len(self.var_list)
+        self.redeclared = []
+        for var_name, expr in self.var_list:
+            # Declared before the initializer is resolved, as in 'int x = x;'
+            slot, redeclared = scope.declare(var_name, self.var_type)
+            self.slots.append(slot)
+            self.redeclared.append(redeclared)
+            expr_type = expr.Resolve(scope) if expr else None
+            if expr_type is not None and not assignable(self.var_type, expr_type):
+                raise Exception(f"Tipo incompatível na atribuição para '{var_name}'. Esperado '{self.var_type}', recebido '{expr_type}'.")
+            self.checked.append(expr_type is not None)
+            if expr:
+                scope.assign(var_name)
+
+    def Optimize(self):
+        self.var_list = [(var_name, expr.Optimize() if expr else None) for var_name, expr in self.var_list]
+        return self
+
+    def Transform(self, replace):
+        self.var_list = [(var_name, expr.Transform(replace) if expr else None) for var_name, expr in self.var_list]
+        return replace(self)
+
+class ScanfNode(Node):
+    __slots__ = ()
+
+    def Evaluate(self, frame, func_table):
+        return (func_table.io.read_int(), 'int')
+
+    def Compile(self, compiler):
+        compiler.emit(OP_SCANF)
+
+    def Close(self, closer):
+        read_int = closer.io.read_int
+        return lambda frame: read_int()
+
+    def Transpile(self, transpiler):
+        return "read_int()"
+
+    def Resolve(self, scope):
+        scope.function.pure = False
+        return 'int'
+
+class Print(Node):
+    __slots__ = ('expression',)
+
+    def __init__(self, expression):
+        self.expression = expression
+
+    def Evaluate(self, frame, func_table):
+        value, var_type = self.expression.Evaluate(frame, func_table)
+        func_table.io.write(value)
+
+    def Compile(self, compiler):
+        self.expression.Compile(compiler)
+        compiler.emit(OP_PRINT)
+
+    def Close(self, closer):
+        expression = self.expression.Close(closer)
+        write = closer.io.write
+
+        def print_value(frame):
+            write(expression(frame))
+        return print_value
+
+    def Transpile(self, transpiler):
+        transpiler.line(f"write({self.expression.Transpile(transpiler)})")
+
+    def Resolve(self, scope):
+        scope.function.pure = False
+        self.expression.Resolve(scope)
+
+    def Optimize(self):
+        self.expression = self.expression.Optimize()
+        return self
+
+    def Transform(self, replace):
+        self.expression = self.expression.Transform(replace)
+        return replace(self)
+
+class Block(Node):
+    __slots__ = ('children',)
+
+    def __init__(self, statements):
+        self.children = statements
+
+    def Evaluate(self, frame, func_table):
+        for statement in self.children:
+            result = statement.Evaluate(frame, func_table)
+            if result is not None:
+                return result
+
+    def Compile(self, compiler):
+        for statement in self.children:
+            statement.Compile(compiler)
+
+    def Close(self, closer):
+        statements = [statement.Close(closer) for statement in self.children]
+        if len(statements) == 1:
+            return statements[0]
+
+        def block(frame):
+            for statement in statements:
+                result = statement(frame)
+                if result is not None:
+                    return result
+        return block
+
+    def Transpile(self, transpiler):
+        for statement in self.children:
+            statement.Transpile(transpiler)
+
+    def Resolve(self, scope):
+        for statement in self.children:
+            statement.Resolve(scope)
+
+    def Optimize(self):
+        statements = []
+        for statement in self.children:
+            statement = statement.Optimize()
+            # Empty statements and empty nested blocks do nothing (blocks do not open scopes)
+            if isinstance(statement, NoOp) or (type(statement) is Block and not statement.children):
+                continue
+            statements.append(statement)
+        self.children = statements
+        return self
+
+    def Transform(self, replace):
+        self.children = [statement.Transform(replace) for statement in self.children]
+        return replace(self)
+
+class IfNode(Node):
+    __slots__ = ('condition', 'then_branch', 'else_branch', 'checked')
+
+    def __init__(self, condition, then_branch, else_branch=None):
+        self.condition = condition
+        self.then_branch = then_branch
+        self.else_branch = else_branch
+        self.checked = False  # True when the condition was proved to be an int
+
+    def Evaluate(self, frame, func_table):
+        condition_val, condition_type = self.condition.Evaluate(frame, func_table)
+        if not self.checked:
+            if condition_type not in ('int', 'bool'):
+                raise Exception("Condição do 'if' deve ser do tipo 'int' ou 'bool'")
+            condition_val = int(condition_val)
+        if condition_val:
+            return self.then_branch.Evaluate(frame, func_table)
+        elif self.else_branch is not None:
+            return self.else_branch.Evaluate(frame, func_table)
+
+    def Compile(self, compiler):
+        jump_false = compiler.jump_unless(self, 'if')
+        self.then_branch.Compile(compiler)
+        if self.else_branch is not None:
+            jump_end = compiler.emit(OP_JUMP)
+            compiler.patch(jump_false, len(compiler.code))
+            self.else_branch.Compile(compiler)
+            compiler.patch(jump_end, len(compiler.code))
+        else:
+            compiler.patch(jump_false, len(compiler.code))
+
+    def Close(self, closer):
+        condition = self.condition.Close(closer)
+        if not self.checked:
+            condition = checked_condition(condition, 'if')
+        then_branch = self.then_branch.Close(closer)
+        if self.else_branch is None:
+            def if_then(frame):
+                if condition(frame):
+                    return then_branch(frame)
+            return if_then
+        else_branch = self.else_branch.Close(closer)
+
+        def if_else(frame):
+            if condition(frame):
+                return then_branch(frame)
+            return else_branch(frame)
+        return if_else
+
+    def Transpile(self, transpiler):
+        condition = self.condition.Transpile(transpiler)
+        if not self.checked:
+            condition = f"check_condition({condition}, 'if')"
+        transpiler.line(f"if {condition}:")
+        transpiler.block(self.then_branch)
+        if self.else_branch is not None:
+            transpiler.line("else:")
+            transpiler.block(self.else_branch)
+
+    def Resolve(self, scope):
+        condition_type = self.condition.Resolve(scope)
+        if condition_type is not None:
+            if condition_type not in ('int', 'bool'):
+                raise Exception("Condição do 'if' deve ser do tipo 'int' ou 'bool'")
+            self.checked = True
+        # The statements after the 'if' see as declared what both branches declared, and
+        # check at run time what only one did; a branch that always returns does not reach them
+        before = scope.state()
+        reaching = []
+        for branch in (self.then_branch, self.else_branch):
+            scope.restore(before)
+            if branch is not None:
+                branch.Resolve(scope)
+            if branch is None or not Resolver.always_returns(branch):
+                reaching.append(scope.state())
+        scope.merge(reaching or [before])
+
+    def Optimize(self):
+        condition = self.condition = self.condition.Optimize()
+        self.then_branch = self.then_branch.Optimize()
+        if self.else_branch is not None:
+            self.else_branch = self.else_branch.Optimize()
+        if isinstance(condition, IntVal):
+            # Only the branch selected by a literal condition can ever run
+            if condition.value:
+                return self.then_branch
+            return self.else_branch if self.else_branch is not None else NoOp()
+        return self
+
+    def Transform(self, replace):
+        self.condition = self.condition.Transform(replace)
+        self.then_branch = self.then_branch.Transform(replace)
+        if self.else_branch is not None:
+            self.else_branch = self.else_branch.Transform(replace)
+        return replace(self)
+
+class WhileNode(Node):
+    __slots__ = ('condition', 'body', 'checked', 'line')
+
+    def __init__(self, condition, body, line=None):
+        self.condition = condition
+        self.body = body
+        self.checked = False  # True when the condition was proved to be an int
+        self.line = line  # Source line of the 'while' keyword, for the profiler
+
+    def Evaluate(self, frame, func_table):
+        checked = self.checked
+        while True:
+            condition_val, condition_type = self.condition.Evaluate(frame, func_table)
+            if not checked:
+                if condition_type not in ('int', 'bool'):
+                    raise Exception("Condição do 'while' deve ser do tipo 'int' ou 'bool'")
+                condition_val = int(condition_val)
+            if not condition_val:
+                break
+            result = self.body.Evaluate(frame, func_table)
+            if result is not None:
+                return result
+
+    def Compile(self, compiler):
+        loop_start = len(compiler.code)
+        if compiler.steps and compiler.branch(self, 'while') is None:
+            # A test that does not count its step itself is preceded by an instruction that does
+            compiler.emit(OP_STEP)
+        jump_false = compiler.jump_unless(self, 'while')
+        body_start = len(compiler.code)
+        self.body.Compile(compiler)
+        if not compiler.repeat_while(self, body_start):
+            compiler.emit(OP_JUMP, loop_start)
+        compiler.patch(jump_false, len(compiler.code))
+
+    def Close(self, closer):
+        condition = self.condition.Close(closer)
+        if not self.checked:
+            condition = checked_condition(condition, 'while')
+        body = self.body.Close(closer)
+
+        def loop(frame):
+            while condition(frame):
+                result = body(frame)
+                if result is not None:
+                    return result
+        return loop
+
+    def Transpile(self, transpiler):
+        condition = self.condition.Transpile(transpiler)
+        if not self.checked:
+            condition = f"check_condition({condition}, 'while')"
+        transpiler.line(f"while {condition}:")
+        transpiler.loop(self.body)
+
+    def Resolve(self, scope):
+        condition_type = self.condition.Resolve(scope)
+        if condition_type is not None:
+            if condition_type not in ('int', 'bool'):
+                raise Exception("Condição do 'while' deve ser do tipo 'int' ou 'bool'")
+            self.checked = True
+        # The body may run again and find what it declares already declared, or not run at
+        # all: its declarations are checked at run time, and so are the uses after the loop
+        scope.loop(Resolver.declarations(self.body))
+        before = scope.state()
+        self.body.Resolve(scope)
+        scope.restore(before)
+
+    def Optimize(self):
+        condition = self.condition = self.condition.Optimize()
+        self.body = self.body.Optimize()
+        if isinstance(condition, IntVal) and not condition.value:
+            return NoOp()
+        return self
+
+    def Transform(self, replace):
+        self.condition = self.condition.Transform(replace)
+        self.body = self.body.Transform(replace)
+        return replace(self)
+
+# Fused nodes: the shapes that dominate loops, rewritten by the Fuser into one node whose
+# Evaluate works on the frame directly instead of nesting Evaluate calls that each build a
+# (value, type) tuple. They keep every field of the node they replace, so the other
+# engines and passes handle them as that node.
+
+class IncrementVariable(Assignment):
+    # 'x = x + k' and 'x = x - k' on an int variable, with k a literal
+    __slots__ = ('amount',)
+
+    def __init__(self, assignment, amount):
+        super().__init__(assignment.identifier, assignment.expression)
+        self.slot = assignment.slot
+        self.var_type = assignment.var_type
+        self.checked = assignment.checked
+        self.amount = amount  # Negative for a subtraction
+
+    def Evaluate(self, frame, func_table):
+        try:
+            frame[self.slot] += self.amount
+        except TypeError:
+            # The variable was never assigned: fail as the unfused assignment does
+            Assignment.Evaluate(self, frame, func_table)
+
+class AccumulateVariable(Assignment):
+    # 'x = x + y' on int variables
+    __slots__ = ('operand',)
+
+    def __init__(self, assignment):
+        super().__init__(assignment.identifier, assignment.expression)
+        self.slot = assignment.slot
+        self.var_type = assignment.var_type
+        self.checked = assignment.checked
+        self.operand = assignment.expression.right.slot
+
+    def Evaluate(self, frame, func_table):
+        try:
+            frame[self.slot] += frame[self.operand]
+        except TypeError:
+            Assignment.Evaluate(self, frame, func_table)
+
+COMPARISONS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt,
+               '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+# Comparisons that hold exactly when the key's does not: ints and strings are totally ordered
+NEGATED_COMPARISONS = {'==': operator.ne, '!=': operator.eq, '<': operator.ge,
+                       '<=': operator.gt, '>': operator.le, '>=': operator.lt}
+
+class CompareConstant(BinOp):
+    # A comparison between a variable and a literal, e.g. 'while (i < 100)'
+    __slots__ = ('compare', 'slot', 'constant')
+
+    def __init__(self, binop):
+        super().__init__(binop.value, binop.left, binop.right)
+        self.type = binop.type
+        self.checked = binop.checked
+        self.compare = COMPARISONS[binop.value]
+        self.slot = binop.left.slot
+        self.constant = binop.right.value
+
+    def Evaluate(self, frame, func_table):
+        return (1 if self.compare(frame[self.slot], self.constant) else 0, 'int')
+
+class CompareVariables(BinOp):
+    # A comparison between two variables, e.g. 'if (a == b)'
+    __slots__ = ('compare', 'slot', 'other')
+
+    def __init__(self, binop):
+        super().__init__(binop.value, binop.left, binop.right)
+        self.type = binop.type
+        self.checked = binop.checked
+        self.compare = COMPARISONS[binop.value]
+        self.slot = binop.left.slot
+        self.other = binop.right.slot
+
+    def Evaluate(self, frame, func_table):
+        return (1 if self.compare(frame[self.slot], frame[self.other]) else 0, 'int')
+
+class Fuser:
+    # Peephole pass run last by the Optimizer: replaces the nodes matching a fused shape.
+    # Only shapes whose operand types the Resolver proved are fused, since fused nodes
+    # skip the runtime type checks.
+    @staticmethod
+    def run(program):
+        program.Transform(Fuser.fuse)
+
+    @staticmethod
+    def fuse(node):
+        kind = type(node)
+        if kind is Assignment and node.checked and node.var_type == 'int':
+            expression = node.expression
+            if (type(expression) is not BinOp or not expression.checked or expression.value not in ('+', '-')
+                    or type(expression.left) is not Identifier or expression.left.slot != node.slot):
+                return node
+            right = expression.right
+            if type(right) is IntVal:
+                return IncrementVariable(node, right.value if expression.value == '+' else -right.value)
+            if type(right) is Identifier and right.var_type == 'int' and expression.value == '+':
+                return AccumulateVariable(node)
+        elif kind is BinOp and node.checked and node.value in COMPARISONS and type(node.left) is Identifier:
+            if type(node.right) in (IntVal, StringVal):
+                return CompareConstant(node)
+            if type(node.right) is Identifier:
+                return CompareVariables(node)
+        return node
+
+# VM opcodes: small ints numbered in the order the VM tests them, so that the opcodes
+# running most often in loops and calls are found after the fewest comparisons and each
+# family of instruction forms sharing one handler is told apart with a single '<='.
+# Instructions are (opcode, a, b, c) tuples. The _UNCHECKED opcodes are emitted where
+# the Resolver proved the operand types, and skip their runtime checks.
+(
+    OP_LOAD,            # a: slot
+    OP_STORE,           # a: slot
+    # Binary operator c on proved ints; the _CONST and _LOCALS forms read their left
+    # operand from slot a and their right operand from constant b or slot b themselves
+    OP_BINARY_CONST_UNCHECKED, OP_BINARY_LOCALS_UNCHECKED, OP_BINARY_UNCHECKED,
+    # The same, storing the result in a local: c is the (operator, slot) pair
+    OP_ASSIGN_CONST, OP_ASSIGN_LOCALS, OP_ASSIGN,
+    # Comparison b on proved operands, jumping to a when false; operands as in the binary
+    # forms, given in c
+    OP_BRANCH_CONST_UNCHECKED, OP_BRANCH_LOCALS_UNCHECKED, OP_BRANCH_UNCHECKED,
+    # The same, counting one step first: the loop tests under a step budget
+    OP_LOOP_CONST, OP_LOOP_LOCALS, OP_LOOP,
+    OP_JUMP,            # a: target
+    OP_CONST,           # a: value
+    # Call of Code a with b arguments from the stack; counts a step when c is True
+    OP_CALL_UNCHECKED, OP_CALL,
+    OP_RETURN, OP_RETURN_NONE,
+    OP_JUMP_IF_FALSE_UNCHECKED, OP_JUMP_IF_FALSE,  # a: target, b: statement named in the error
+    # The same forms with their runtime type checks, for operands not proved
+    OP_BINARY_CONST, OP_BINARY_LOCALS, OP_BINARY,
+    # '+' charging the strings it builds and '*' charging its product, on the stack
+    OP_ADD_LIMITED, OP_MUL_LIMITED,
+    OP_BRANCH_CONST, OP_BRANCH_LOCALS, OP_BRANCH,
+    OP_COMPARE_UNCHECKED, OP_COMPARE,  # b: comparison
+    OP_STORE_CHECKED,   # a: slot, b: expected Python type, c: error message
+    OP_UNARY_UNCHECKED, OP_UNARY,  # a: operator
+    OP_PRINT,
+    OP_SCANF,
+    OP_POP,
+    OP_TAIL_CALL_UNCHECKED, OP_TAIL_CALL,  # a: Code, b: argument count, c: as in OP_CALL
+    OP_STEP,            # Counts one step
+    OP_CALL_MEMO,       # a: Code, b: argument count, c: as in OP_CALL
+    OP_RETURN_MEMO, OP_RETURN_NONE_MEMO,  # a: MemoTable
+    OP_DECLARE,         # a: flag slot to set, b: error message if it may be set already
+    OP_DECLARED,        # a: flag slot that must be set, b: error message
+    OP_RAISE,           # a: error message
+) = VM_OPCODES = range(47)
+
+# Declared types mapped to the Python type of the raw values the VM stores
+PYTHON_TYPES = {'int': int, 'str': str}
+
+# Python types of language strings in the VM
+STRING_TYPES = (str, Rope)
+
+def type_name(value):
+    if isinstance(value, (str, Rope)):
+        return 'str'
+    if isinstance(value, int):
+        return 'int'
+    return 'void'
+
+class Code:
+    def __init__(self, name, params, frame_size, memo=None):
+        self.name = name
+        self.params = params  # List of (type, name) tuples
+        self.param_types = [PYTHON_TYPES[param_type] for param_type, _ in params]
+        self.frame_size = frame_size
+        self.padding = [None] * (frame_size - len(params))  # Locals appended to the arguments
+        self.instructions = []  # List of (opcode, a, b, c) tuples
+        self.memo = memo  # MemoTable of a memoized function; its key sits after the last slot
+
+class Compiler:
+    def __init__(self, functions, limits=None):
+        self.functions = functions
+        # The accounting emitted for Limits, only where a limit that is set needs it
+        self.steps = limits is not None and limits.counts_steps()
+        self.strings = limits is not None and limits.charges_strings()
+        self.products = limits is not None and limits.charges_products()
+        self.code = None
+        self.memo = None  # MemoTable of the function being compiled
+
+    @staticmethod
+    def run(program, limits=None):
+        # Create every code object first so calls can be resolved regardless of declaration order
+        functions = {}
+        for func in program.functions:
+            if func.name in functions:
+                raise Exception(f"Função '{func.name}' já declarada")
+            memo = func.body.table if isinstance(func.body, MemoizedFunction) else None
+            functions[func.name] = Code(func.name, func.params, func.frame_size, memo)
+
+        compiler = Compiler(functions, limits)
+        for func in program.functions:
+            func.Compile(compiler)
+        return functions
+
+    def emit(self, op, a=None, b=None, c=None):
+        self.code.append((op, a, b, c))
+        return len(self.code) - 1
+
+    def patch(self, index, target):
+        op, _, b, c = self.code[index]
+        self.code[index] = (op, target, b, c)
+
+    def operands(self, left, right):
+        # A variable combined with a literal or another variable is read by the instruction
+        # itself; other operands are computed onto the stack. Returns the offset of the
+        # instruction form from the first opcode of its family (_CONST, _LOCALS, stack) and
+        # the operands of the form.
+        if type(left) is Identifier:
+            if type(right) is IntVal or type(right) is StringVal:
+                return 0, left.slot, right.value
+            if type(right) is Identifier:
+                return 1, left.slot, right.slot
+        left.Compile(self)
+        right.Compile(self)
+        return 2, None, None
+
+    def assign(self, expression, slot):
+        # 'x = a op b' on proved ints: the operation stores its result itself. Returns False,
+        # emitting nothing, for any other expression.
+        if (not isinstance(expression, BinOp) or not expression.checked or expression.type != 'int'
+                or expression.value in COMPARISONS or (self.products and expression.value == '*')):
+            return False
+        form, left, right = self.operands(expression.left, expression.right)
+        self.emit(OP_ASSIGN_CONST + form, left, right, (expression.value, slot))
+        return True
+
+    def branch(self, node, statement):
+        # First opcode of the branches that test the condition of an 'if' or 'while' by
+        # themselves, or None when the condition is computed onto the stack. Under a step
+        # budget, loop tests count their step, which only the forms for proved operands do.
+        condition = node.condition
+        if not (isinstance(condition, BinOp) and condition.value in COMPARISONS):
+            return None
+        if statement == 'while' and self.steps:
+            return OP_LOOP_CONST if condition.checked else None
+        return OP_BRANCH_CONST_UNCHECKED if condition.checked else OP_BRANCH_CONST
+
+    def repeat_while(self, node, body_start):
+        # Ends the body of a loop whose condition is a comparison with the negated comparison,
+        # jumping back to the body while the condition holds, instead of a jump to the test at
+        # the top. Returns False, emitting nothing, for other conditions.
+        first = self.branch(node, 'while')
+        if first is None:
+            return False
+        condition = node.condition
+        form, left, right = self.operands(condition.left, condition.right)
+        self.emit(first + form, body_start, NEGATED_COMPARISONS[condition.value], (left, right))
+        return True
+
+    def jump_unless(self, node, statement):
+        # Emits the jump taken when the condition of an 'if' or 'while' is false and returns
+        # its index, to be patched with the target; a comparison jumps by itself
+        condition = node.condition
+        first = self.branch(node, statement)
+        if first is not None:
+            form, left, right = self.operands(condition.left, condition.right)
+            return self.emit(first + form, None, COMPARISONS[condition.value], (left, right))
+        condition.Compile(self)
+        opcode = OP_JUMP_IF_FALSE_UNCHECKED if node.checked else OP_JUMP_IF_FALSE
+        return self.emit(opcode, None, statement)
+
+# Default cap on active language-level calls in the VM, whose call stack lives on the heap
+DEFAULT_MAX_DEPTH = 1_000_000
+
+class VM:
+    def __init__(self, functions, max_depth=DEFAULT_MAX_DEPTH, io=None, limits=None):
+        self.functions = functions
+        self.max_depth = max_depth
+        self.io = ProgramIO() if io is None else io
+        self.limits = limits
+
+    def run(self, entry='main'):
+        func = self.functions[entry]
+        if func.params:
+            raise Exception(f"Função '{entry}' chamada com número incorreto de argumentos")
+
+        code = func.instructions
+        pc = 0
+        frame = [None] * func.frame_size
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        write = self.io.write
+        read_int = self.io.read_int
+        limits = self.limits
+        steps = 1  # The call of main, as in the other engines
+        next_check = limits.check(steps) if limits is not None else None
+        # Saved (code, pc, frame) of every caller; calls never recurse on the Python stack
+        frames = []
+        max_callers = self.max_depth - 1
+
+        # The opcodes as locals, which the dispatch loop reads faster than module globals
+        (OP_LOAD, OP_STORE, OP_BINARY_CONST_UNCHECKED, OP_BINARY_LOCALS_UNCHECKED,
+         OP_BINARY_UNCHECKED, OP_ASSIGN_CONST, OP_ASSIGN_LOCALS, OP_ASSIGN,
+         OP_BRANCH_CONST_UNCHECKED, OP_BRANCH_LOCALS_UNCHECKED, OP_BRANCH_UNCHECKED,
+         OP_LOOP_CONST, OP_LOOP_LOCALS, OP_LOOP, OP_JUMP, OP_CONST, OP_CALL_UNCHECKED, OP_CALL,
+         OP_RETURN, OP_RETURN_NONE, OP_JUMP_IF_FALSE_UNCHECKED, OP_JUMP_IF_FALSE,
+         OP_BINARY_CONST, OP_BINARY_LOCALS, OP_BINARY, OP_ADD_LIMITED, OP_MUL_LIMITED,
+         OP_BRANCH_CONST, OP_BRANCH_LOCALS, OP_BRANCH, OP_COMPARE_UNCHECKED, OP_COMPARE,
+         OP_STORE_CHECKED, OP_UNARY_UNCHECKED, OP_UNARY, OP_PRINT, OP_SCANF, OP_POP,
+         OP_TAIL_CALL_UNCHECKED, OP_TAIL_CALL, OP_STEP, OP_CALL_MEMO, OP_RETURN_MEMO,
+         OP_RETURN_NONE_MEMO, OP_DECLARE, OP_DECLARED, OP_RAISE) = VM_OPCODES
+
+        # The tests follow the numbering of the opcodes (see OP_LOAD)
+        while True:
+            op, a, b, c = code[pc]
+            pc += 1
+
+            if op == OP_LOAD:
+                push(frame[a])
+
+            elif op == OP_STORE:
+                frame[a] = pop()
+
+            elif op <= OP_BINARY_UNCHECKED:
+                if op == OP_BINARY_CONST_UNCHECKED:
+                    left = frame[a]
+                    right = b
+                elif op == OP_BINARY_LOCALS_UNCHECKED:
+                    left = frame[a]
+                    right = frame[b]
+                else:
+                    right = pop()
+                    left = pop()
+                if c == '+':
+                    push(left + right)
+                elif c == '-':
+                    push(left - right)
+                elif c == '*':
+                    push(left * right)
+                elif c == '/':
+                    if right == 0:
+                        raise ValueError("Divisão por zero")
+                    push(left // right)
+                elif c == '&&':
+                    push(1 if left and right else 0)
+                else:
+                    push(1 if left or right else 0)
+
+            elif op <= OP_ASSIGN:
+                if op == OP_ASSIGN_CONST:
+                    left = frame[a]
+                    right = b
+                elif op == OP_ASSIGN_LOCALS:
+                    left = frame[a]
+                    right = frame[b]
+                else:
+                    right = pop()
+                    left = pop()
+                symbol, slot = c
+                if symbol == '+':
+                    frame[slot] = left + right
+                elif symbol == '-':
+                    frame[slot] = left - right
+                elif symbol == '*':
+                    frame[slot] = left * right
+                elif symbol == '/':
+                    if right == 0:
+                        raise ValueError("Divisão por zero")
+                    frame[slot] = left // right
+                elif symbol == '&&':
+                    frame[slot] = 1 if left and right else 0
+                else:
+                    frame[slot] = 1 if left or right else 0
+
+            elif op <= OP_LOOP:
+                if op == OP_BRANCH_CONST_UNCHECKED:
+                    slot, right = c
+                    if not b(frame[slot], right):
+                        pc = a
+                elif op == OP_BRANCH_LOCALS_UNCHECKED:
+                    slot, other = c
+                    if not b(frame[slot], frame[other]):
+                        pc = a
+                elif op == OP_BRANCH_UNCHECKED:
+                    right = pop()
+                    if not b(pop(), right):
+                        pc = a
+                else:
+                    steps += 1
+                    if steps >= next_check:
+                        next_check = limits.check(steps)
+                    if op == OP_LOOP_CONST:
+                        slot, right = c
+                        left = frame[slot]
+                    elif op == OP_LOOP_LOCALS:
+                        slot, other = c
+                        left = frame[slot]
+                        right = frame[other]
+                    else:
+                        right = pop()
+                        left = pop()
+                    if not b(left, right):
+                        pc = a
+
+            elif op == OP_JUMP:
+                pc = a
+
+            elif op == OP_CONST:
+                push(a)
+
+            elif op <= OP_CALL:
+                if b == 1:
+                    args = [pop()]
+                elif b:
+                    args = stack[-b:]
+                    del stack[-b:]
+                else:
+                    args = []
+                if op != OP_CALL_UNCHECKED:
+                    for value, expected, (_, param_name) in zip(args, a.param_types, a.params):
+                        if type(value) is not expected and type_name(value) != expected.__name__:
+                            raise Exception(f"Tipo incompatível na chamada da função '{a.name}' para o parâmetro '{param_name}'")
+                if c:
+                    steps += 1
+                    if steps >= next_check:
+                        next_check = limits.check(steps)
+                if len(frames) >= max_callers:
+                    raise Exception(f"Profundidade máxima de recursão excedida ({self.max_depth} chamadas)")
+                frames.append((code, pc, frame))
+                code = a.instructions
+                pc = 0
+                frame = args
+                if a.padding:
+                    frame += a.padding
+
+            elif op <= OP_RETURN_NONE:
+                value = pop() if op == OP_RETURN else None
+                if not frames:
+                    return value
+                code, pc, frame = frames.pop()
+                push(value)
+
+            elif op == OP_JUMP_IF_FALSE_UNCHECKED:
+                if not pop():
+                    pc = a
+
+            elif op == OP_JUMP_IF_FALSE:
+                value = pop()
+                if type(value) is not int:
+                    raise Exception(f"Condição do '{b}' deve ser do tipo 'int' ou 'bool'")
+                if not value:
+                    pc = a
+
+            elif op <= OP_BINARY:
+                if op == OP_BINARY_CONST:
+                    left = frame[a]
+                    right = b
+                elif op == OP_BINARY_LOCALS:
+                    left = frame[a]
+                    right = frame[b]
+                else:
+                    right = pop()
+                    left = pop()
+                if type(left) is int and type(right) is int:
+                    if c == '+':
+                        push(left + right)
+                    elif c == '-':
+                        push(left - right)
+                    elif c == '*':
+                        push(left * right)
+                    elif c == '/':
+                        if right == 0:
+                            raise ValueError("Divisão por zero")
+                        push(left // right)
+                    elif c == '&&':
+                        push(1 if left and right else 0)
+                    else:
+                        push(1 if left or right else 0)
+                elif c == '+' and (type(left) in STRING_TYPES or type(right) in STRING_TYPES):
+                    push(concat(left, right))
+                elif c == '&&' or c == '||':
+                    raise Exception("Tipos incompatíveis para operadores lógicos")
+                else:
+                    raise Exception(f"Tipos incompatíveis para '{c}'")
+
+            elif op <= OP_MUL_LIMITED:
+                if op == OP_ADD_LIMITED:
+                    right = pop()
+                    left = pop()
+                    if type(left) is int and type(right) is int:
+                        push(left + right)
+                    elif type(left) in STRING_TYPES or type(right) in STRING_TYPES:
+                        value = concat(left, right)
+                        limits.charge(len(value))
+                        push(value)
+                    else:
+                        raise Exception("Tipos incompatíveis para '+'")
+                else:
+                    right = pop()
+                    left = pop()
+                    if type(left) is not int or type(right) is not int:
+                        raise Exception("Tipos incompatíveis para '*'")
+                    limits.charge_product(left, right)
+                    push(left * right)
+
+            elif op <= OP_BRANCH:
+                if op == OP_BRANCH_CONST:
+                    slot, right = c
+                    left = frame[slot]
+                elif op == OP_BRANCH_LOCALS:
+                    slot, other = c
+                    left = frame[slot]
+                    right = frame[other]
+                else:
+                    right = pop()
+                    left = pop()
+                # A Rope and a str are both strings
+                if type(left) is not type(right) and type_name(left) != type_name(right):
+                    raise Exception("Tipos incompatíveis para operadores relacionais")
+                if not b(left, right):
+                    pc = a
+
+            elif op == OP_COMPARE_UNCHECKED:
+                right = pop()
+                push(1 if b(pop(), right) else 0)
+
+            elif op == OP_COMPARE:
+                right = pop()
+                left = pop()
+                if type(left) is not type(right) and type_name(left) != type_name(right):
+                    raise Exception("Tipos incompatíveis para operadores relacionais")
+                push(1 if b(left, right) else 0)
+
+            elif op == OP_STORE_CHECKED:
+                value = pop()
+                if type(value) is not b and type_name(value) != b.__name__:
+                    raise Exception(f"{c}. Esperado '{b.__name__}', recebido '{type_name(value)}'.")
+                frame[a] = value
+
+            elif op == OP_UNARY_UNCHECKED:
+                if a == '-':
+                    push(-pop())
+                else:
+                    push(0 if pop() else 1)
+
+            elif op == OP_UNARY:
+                value = pop()
+                if type(value) is not int:
+                    if a == '!':
+                        raise Exception("Operador '!' aplicado a tipo inválido")
+                    raise Exception(f"Operador '{a}' unário aplicado a tipo inválido")
+                if a == '-':
+                    push(-value)
+                elif a == '!':
+                    push(0 if value else 1)
+                else:
+                    push(value)
+
+            elif op == OP_PRINT:
+                write(pop())
+
+            elif op == OP_SCANF:
+                push(read_int())
+
+            elif op == OP_POP:
+                pop()
+
+            elif op <= OP_TAIL_CALL:
+                # A function calling itself in 'return f(...)': its arguments become the new
+                # frame and the code starts over, without saving a caller
+                if b:
+                    args = stack[-b:]
+                    del stack[-b:]
+                else:
+                    args = []
+                if op == OP_TAIL_CALL:
+                    for value, expected, (_, param_name) in zip(args, a.param_types, a.params):
+                        if type(value) is not expected and type_name(value) != expected.__name__:
+                            raise Exception(f"Tipo incompatível na chamada da função '{a.name}' para o parâmetro '{param_name}'")
+                if c:
+                    steps += 1
+                    if steps >= next_check:
+                        next_check = limits.check(steps)
+                pc = 0
+                if a.padding:
+                    args += a.padding
+                if a.memo is not None:
+                    # The result is stored under the arguments of the call that entered the
+                    # function, whose key stays after the last slot
+                    args.append(frame[-1])
+                frame = args
+
+            elif op == OP_STEP:
+                steps += 1
+                if steps >= next_check:
+                    next_check = limits.check(steps)
+
+            elif op == OP_CALL_MEMO:
+                if b:
+                    args = stack[-b:]
+                    del stack[-b:]
+                else:
+                    args = []
+                if c:
+                    steps += 1
+                    if steps >= next_check:
+                        next_check = limits.check(steps)
+                key = tuple(args)
+                memo = a.memo
+                if key in memo.results:
+                    memo.hits += 1
+                    memo.results.move_to_end(key)
+                    push(memo.results[key])
+                    continue
+                memo.misses += 1
+                for value, expected, (_, param_name) in zip(args, a.param_types, a.params):
+                    if type(value) is not expected and type_name(value) != expected.__name__:
+                        raise Exception(f"Tipo incompatível na chamada da função '{a.name}' para o parâmetro '{param_name}'")
+                if len(frames) >= max_callers:
+                    raise Exception(f"Profundidade máxima de recursão excedida ({self.max_depth} chamadas)")
+                frames.append((code, pc, frame))
+                code = a.instructions
+                pc = 0
+                frame = args
+                frame.extend([None] * (a.frame_size - b))
+                frame.append(key)
+
+            elif op <= OP_RETURN_NONE_MEMO:
+                value = pop() if op == OP_RETURN_MEMO else None
+                a.store(frame[-1], value)
+                if not frames:
+                    return value
+                code, pc, frame = frames.pop()
+                push(value)
+
+            elif op == OP_DECLARE:
+                if b is not None and frame[a] is not None:
+                    raise Exception(b)
+                frame[a] = True
+
+            elif op == OP_DECLARED:
+                if frame[a] is None:
+                    raise Exception(b)
+
+            elif op == OP_RAISE:
+                raise Exception(a)
+
+            else:
+                raise Exception(f"Instrução desconhecida: {op}")
+
+# Result of a closure-engine 'return' whose value is void: a statement closure that returns
+# None completed normally
+RETURN_VOID = object()
+
+def binary_operation(op, left, right):
+    # Closure-engine binary operator whose operand types were not proved statically
+    if type(left) is int and type(right) is int:
+        if op == '+':
+            return left + right
+        if op == '-':
+            return left - right
+        if op == '*':
+            return left * right
+        if op == '/':
+            if right == 0:
+                raise ValueError("Divisão por zero")
+            return left // right
+        if op == '&&':
+            return 1 if left and right else 0
+        if op == '||':
+            return 1 if left or right else 0
+    elif op == '+':
+        if type(left) in STRING_TYPES or type(right) in STRING_TYPES:
+            return concat(left, right)
+        raise Exception("Tipos incompatíveis para '+'")
+    elif op in ('-', '*', '/'):
+        raise Exception(f"Tipos incompatíveis para '{op}'")
+    elif op in ('&&', '||'):
+        raise Exception("Tipos incompatíveis para operadores lógicos")
+    elif type(left) is not type(right) and type_name(left) != type_name(right):
+        raise Exception("Tipos incompatíveis para operadores relacionais")
+    if op == '==':
+        return 1 if left == right else 0
+    if op == '!=':
+        return 1 if left != right else 0
+    if op == '<':
+        return 1 if left < right else 0
+    if op == '<=':
+        return 1 if left <= right else 0
+    if op == '>':
+        return 1 if left > right else 0
+    return 1 if left >= right else 0
+
+def unary_operation(op, value):
+    # Closure-engine unary operator whose operand type was not proved statically
+    if type(value) is not int:
+        if op == '!':
+            raise Exception("Operador '!' aplicado a tipo inválido")
+        raise Exception(f"Operador '{op}' unário aplicado a tipo inválido")
+    if op == '-':
+        return -value
+    if op == '!':
+        return 0 if value else 1
+    return value
+
+def check_condition(value, statement):
+    if type(value) is not int:
+        raise Exception(f"Condição do '{statement}' deve ser do tipo 'int' ou 'bool'")
+    return value
+
+def checked_condition(condition, statement):
+    # Wraps an 'if'/'while' condition whose type was not proved statically
+    return lambda frame: check_condition(condition(frame), statement)
+
+def check_store(value, expected, message):
+    if type(value) is not expected and type_name(value) != expected.__name__:
+        raise Exception(f"{message}. Esperado '{expected.__name__}', recebido '{type_name(value)}'.")
+    return value
+
+def check_declared(flag, value, message):
+    # Use of a variable that only some paths declare, once its value is computed
+    if flag is None:
+        raise Exception(message)
+    return value
+
+def check_undeclared(flag, message):
+    # Declaration of a variable that some path may have declared already; returns the flag
+    if flag is not None:
+        raise Exception(message)
+    return True
+
+def check_argument(value, expected, name, param_name):
+    if type(value) is not expected and type_name(value) != expected.__name__:
+        raise Exception(f"Tipo incompatível na chamada da função '{name}' para o parâmetro '{param_name}'")
+    return value
+
+def divide(dividend, divisor):
+    if divisor == 0:
+        raise ValueError("Divisão por zero")
+    return dividend // divisor
+
+def charge_string(limits, value):
+    if type(value) in STRING_TYPES:
+        limits.charge(len(value))
+    return value
+
+def charge_product(limits, left, right):
+    if type(left) is not int or type(right) is not int:
+        raise Exception("Tipos incompatíveis para '*'")
+    limits.charge_product(left, right)
+    return left * right
+
+class Transpiler:
+    # Python engine: translates the whole program into one Python module, where functions
+    # become 'def f_<name>' and frame slots become locals 'v<slot>', so CPython's own
+    # bytecode runs the loops. Expression nodes return Python source, statements emit lines.
+    # Runtime objects the code refers to (profiler, limits, memo tables) are passed in the
+    # module globals as k0, k1, ...
+    def __init__(self, functions):
+        self.functions = functions
+        self.lines = []
+        self.depth = 0
+        self.constants = {}
+        self.memo = None  # Name of the MemoTable of the function being translated
+        self.loops = 0  # Language loops around the statement being translated
+        self.tail_calls = False  # Whether the function being translated has tail calls
+        self.tail_breaks = False  # Whether a tail call leaves the loops being translated
+
+    @staticmethod
+    def run(program):
+        transpiler = Transpiler({func.name: func for func in program.functions})
+        program.Transpile(transpiler)
+        return "\n".join(transpiler.lines), transpiler.constants
+
+    def line(self, text):
+        self.lines.append("    " * self.depth + text if text else "")
+
+    def block(self, statement):
+        self.depth += 1
+        start = len(self.lines)
+        statement.Transpile(self)
+        if len(self.lines) == start:
+            self.line("pass")
+        self.depth -= 1
+
+    def loop(self, body):
+        # Translates the body of a language loop. A tail call in it sets 'tail_call' and
+        # breaks out; each loop around it does the same, up to the 'while True' of the function.
+        outer = self.tail_breaks
+        self.tail_breaks = False
+        self.loops += 1
+        self.block(body)
+        self.loops -= 1
+        if self.tail_breaks:
+            self.line("if tail_call:")
+            if self.loops:
+                self.line("    break")
+            else:
+                self.line("    tail_call = False")
+                self.line("    continue")
+        self.tail_breaks = outer or self.tail_breaks
+
+    def constant(self, value):
+        for name, known in self.constants.items():
+            if known is value:
+                return name
+        name = f"k{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+# Functions and types the generated Python code refers to
+TRANSPILER_RUNTIME = {
+    'int': int, 'str': str,
+    'concat': concat, 'divide': divide,
+    'binary_operation': binary_operation, 'unary_operation': unary_operation,
+    'check_condition': check_condition, 'check_store': check_store, 'check_argument': check_argument,
+    'check_declared': check_declared, 'check_undeclared': check_undeclared,
+    'charge_string': charge_string, 'charge_product': charge_product,
+}
+
+def run_python(program, io):
+    source, constants = Transpiler.run(program)
+    namespace = {'__builtins__': __builtins__, **TRANSPILER_RUNTIME, **constants,
+                 'write': io.write, 'read_int': io.read_int}
+    exec(compile(source, '<programa>', 'exec'), namespace)
+    main_func = namespace['f_main']
+    if main_func.__code__.co_argcount:
+        raise Exception("Função 'main' chamada com número incorreto de argumentos")
+    main_func()
+
+class ClosureFunction:
+    # A function of the closure engine; the body closure takes the frame and returns None,
+    # RETURN_VOID or the returned value
+    def __init__(self, func):
+        self.name = func.name
+        self.params = func.params
+        self.param_types = [PYTHON_TYPES[param_type] for param_type, _ in func.params]
+        self.frame_size = func.frame_size
+        self.body = None  # Set once every function exists, so calls can refer to any of them
+
+class ClosureCompiler:
+    # Closure engine: turns every node, once, into a Python closure over its children's
+    # closures. Closures work on raw values like the VM, and operations whose operand types
+    # the Resolver proved skip their runtime checks.
+    def __init__(self, functions, io):
+        self.functions = functions
+        self.io = io
+
+    @staticmethod
+    def run(program, io):
+        functions = {func.name: ClosureFunction(func) for func in program.functions}
+        program.Close(ClosureCompiler(functions, io))
+        return functions
+
+class ProgramIO:
+    # printf/scanf backend shared by both engines. Output is joined and written in blocks of
+    # about CHUNK_SIZE characters and flushed when the program ends or fails; input is read
+    # in CHUNK_SIZE blocks, each split at once into whitespace-separated tokens converted as
+    # scanf takes them, so a bad token fails only when it is read. read_int is the __next__
+    # of a chain over the blocks: scanf runs no Python code except to read the next block.
+    # Line-buffered mode keeps the print()/input() behaviour of one line per call, for
+    # interactive use.
+    def __init__(self, stdin=None, stdout=None, line_buffered=False):
+        self.stdin = sys.stdin if stdin is None else stdin
+        self.stdout = sys.stdout if stdout is None else stdout
+        # Bulk reads block until a whole chunk arrives, which would hang a terminal
+        self.line_buffered = line_buffered or self.stdin.isatty()
+        self.pending = []
+        self.pending_size = 0
+        self.read_int = itertools.chain.from_iterable(self.scan()).__next__
+        if self.line_buffered:
+            self.write = self.write_line
+            self.read_int = self.read_line
+
+    def write(self, value):
+        text = f"{value}\n"
+        self.pending.append(text)
+        self.pending_size += len(text)
+        if self.pending_size >= CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.stdout.write(''.join(self.pending))
+            self.pending.clear()
+            self.pending_size = 0
+        self.stdout.flush()
+
+    def scan(self):
+        # The ints of each block, then EOFError for the scanf that finds the input ended
+        rest = ''
+        while True:
+            # Whatever the program printed so far (a prompt, say) goes out before blocking
+            self.flush()
+            chunk = self.stdin.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            text = rest + chunk
+            words = text.split()
+            # The last word may continue in the next chunk
+            rest = words.pop() if words and not text[-1].isspace() else ''
+            yield map(int, words)
+        if rest:
+            yield map(int, [rest])
+        raise EOFError("EOF when reading a line")
+
+    def write_line(self, value):
+        self.stdout.write(f"{value}\n")
+        self.stdout.flush()
+
+    def read_line(self):
+        line = self.stdin.readline()
+        if not line:
+            raise EOFError("EOF when reading a line")
+        return int(line)
+
+class ProfiledFunction(Block):
+    # Replaces a function body under --profile and times every call of the function. It runs
+    # the statements itself: a wrapper around the body would use up one more Python frame
+    # per call and lower the recursion depth the tree engine can reach.
+    __slots__ = ('name', 'profiler')
+
+    def __init__(self, body, name, profiler):
+        super().__init__(body.children)
+        self.name = name
+        self.profiler = profiler
+
+    def Evaluate(self, frame, func_table):
+        self.profiler.enter(self.name)
+        try:
+            for statement in self.children:
+                result = statement.Evaluate(frame, func_table)
+                if result is not None:
+                    return result
+        finally:
+            self.profiler.exit()
+
+    def Close(self, closer):
+        statements = [statement.Close(closer) for statement in self.children]
+        profiler = self.profiler
+        name = self.name
+
+        def profiled(frame):
+            profiler.enter(name)
+            try:
+                for statement in statements:
+                    result = statement(frame)
+                    if result is not None:
+                        return result
+            finally:
+                profiler.exit()
+        return profiled
+
+    def Transpile(self, transpiler):
+        profiler = transpiler.constant(self.profiler)
+        transpiler.line(f"{profiler}.enter({self.name!r})")
+        transpiler.line("try:")
+        transpiler.block(Block(self.children))
+        transpiler.line("finally:")
+        transpiler.depth += 1
+        transpiler.line(f"{profiler}.exit()")
+        transpiler.depth -= 1
+
+class ProfiledLoop(Node):
+    # Replaces the body of a 'while' under --profile: counts its iterations
+    __slots__ = ('body', 'function', 'line', 'iterations')
+
+    def __init__(self, body, function, line):
+        self.body = body
+        self.function = function
+        self.line = line
+        self.iterations = 0
+
+    def Evaluate(self, frame, func_table):
+        self.iterations += 1
+        return self.body.Evaluate(frame, func_table)
+
+    def Close(self, closer):
+        body = self.body.Close(closer)
+
+        def counted(frame):
+            self.iterations += 1
+            return body(frame)
+        return counted
+
+    def Transpile(self, transpiler):
+        transpiler.line(f"{transpiler.constant(self)}.iterations += 1")
+        self.body.Transpile(transpiler)
+
+    def Transform(self, replace):
+        self.body = self.body.Transform(replace)
+        return replace(self)
+
+class Profiler:
+    # --profile for the tree, closure and python engines: wraps function and loop bodies in
+    # nodes that record call counts, inclusive and exclusive time per function and iterations
+    # per loop. Uninstrumented trees run exactly as before, so profiling costs nothing when off.
+    def __init__(self):
+        self.calls = {}
+        self.inclusive = {}
+        self.exclusive = {}
+        self.active = {}  # Activations of each function currently on the stack
+        self.stacks = {}  # Exclusive time per call stack, for the collapsed-stack output
+        self.loops = []
+        # One [name, stack path, start, time spent in callees] entry per active call
+        self.stack = []
+
+    def instrument(self, program):
+        for func in program.functions:
+            body = func.body.Transform(lambda node: self.wrap_loop(node, func.name))
+            func.body = ProfiledFunction(body, func.name, self)
+
+    def wrap_loop(self, node, function):
+        if isinstance(node, WhileNode):
+            loop = ProfiledLoop(node.body, function, node.line)
+            node.body = loop
+            self.loops.append(loop)
+        return node
+
+    def enter(self, name):
+        path = f"{self.stack[-1][1]};{name}" if self.stack else name
+        self.stack.append([name, path, time.perf_counter(), 0.0])
+        self.active[name] = self.active.get(name, 0) + 1
+
+    def exit(self):
+        name, path, start, callees = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.exclusive[name] = self.exclusive.get(name, 0.0) + elapsed - callees
+        self.stacks[path] = self.stacks.get(path, 0.0) + elapsed - callees
+        self.active[name] -= 1
+        # Recursive activations are already covered by the outermost one
+        if not self.active[name]:
+            self.inclusive[name] = self.inclusive.get(name, 0.0) + elapsed
+        if self.stack:
+            self.stack[-1][3] += elapsed
+
+    def report(self):
+        lines = [f"{'função':<24}{'chamadas':>12}{'inclusivo (s)':>16}{'exclusivo (s)':>16}"]
+        for name in sorted(self.calls, key=self.exclusive.get, reverse=True):
+            lines.append(f"{name:<24}{self.calls[name]:>12}{self.inclusive[name]:>16.6f}{self.exclusive[name]:>16.6f}")
+        if self.loops:
+            lines.append("")
+            lines.append(f"{'laço':<24}{'iterações':>12}")
+            for loop in sorted(self.loops, key=lambda loop: loop.iterations, reverse=True):
+                lines.append(f"{f'{loop.function}:{loop.line} (while)':<24}{loop.iterations:>12}")
+        return "\n".join(lines)
+
+    def write_collapsed(self, file_name):
+        # One "main;f;g <microseconds>" line per stack, the input format of flamegraph.pl
+        with open(file_name, 'w') as file:
+            for path, seconds in sorted(self.stacks.items()):
+                file.write(f"{path} {round(seconds * 1e6)}\n")
+
+class LimitExceeded(Exception):
+    # A run hit one of its --max-steps/--timeout/--max-string-size/--max-memory limits; each
+    # kind of limit has its own exit status
+    exit_code = 3
+
+class StepLimitExceeded(LimitExceeded):
+    exit_code = 3
+
+class TimeLimitExceeded(LimitExceeded):
+    exit_code = 4
+
+class StringLimitExceeded(LimitExceeded):
+    exit_code = 5
+
+class MemoryLimitExceeded(LimitExceeded):
+    exit_code = 6
+
+# Steps between two checks of the step budget
+LIMIT_CHECK_INTERVAL = 1024
+
+# Integers up to this many bits cost nothing against --max-memory
+FREE_INT_BITS = 64
+
+class LimitedFunction(Block):
+    # Replaces a function body under a step budget, so that each call costs one step,
+    # remembered results included. Like MemoizedFunction it runs the statements itself, and
+    # an already wrapped body becomes its single statement.
+    __slots__ = ('limits',)
+
+    def __init__(self, body, limits):
+        super().__init__(body.children if type(body) is Block else [body])
+        self.limits = limits
+
+    def Evaluate(self, frame, func_table):
+        next(self.limits.ticks)
+        for statement in self.children:
+            result = statement.Evaluate(frame, func_table)
+            if result is not None:
+                return result
+
+    def Close(self, closer):
+        statements = [statement.Close(closer) for statement in self.children]
+        ticks = self.limits.ticks
+
+        def limited(frame):
+            next(ticks)
+            for statement in statements:
+                result = statement(frame)
+                if result is not None:
+                    return result
+        return limited
+
+    def Transpile(self, transpiler):
+        transpiler.line(f"next({transpiler.constant(self.limits.ticks)})")
+        Block.Transpile(self, transpiler)
+
+class LimitedWhile(WhileNode):
+    # WhileNode under a step budget: every test of the condition costs one step. The loop
+    # runs over the ticks of the budget, so that counting is left to C.
+    __slots__ = ('limits',)
+
+    def __init__(self, loop, limits):
+        super().__init__(loop.condition, loop.body, loop.line)
+        self.checked = loop.checked
+        self.limits = limits
+
+    def Evaluate(self, frame, func_table):
+        condition = self.condition
+        block = self.body
+        checked = self.checked
+        for _ in self.limits.ticks:
+            condition_val, condition_type = condition.Evaluate(frame, func_table)
+            if not checked:
+                if condition_type not in ('int', 'bool'):
+                    raise Exception("Condição do 'while' deve ser do tipo 'int' ou 'bool'")
+                condition_val = int(condition_val)
+            if not condition_val:
+                break
+            result = block.Evaluate(frame, func_table)
+            if result is not None:
+                return result
+
+    def Close(self, closer):
+        condition = self.condition.Close(closer)
+        if not self.checked:
+            condition = checked_condition(condition, 'while')
+        body = self.body.Close(closer)
+        ticks = self.limits.ticks
+
+        def loop(frame):
+            for _ in ticks:
+                if not condition(frame):
+                    return None
+                result = body(frame)
+                if result is not None:
+                    return result
+        return loop
+
+    def Transpile(self, transpiler):
+        condition = self.condition.Transpile(transpiler)
+        if not self.checked:
+            condition = f"check_condition({condition}, 'while')"
+        transpiler.line(f"for _ in {transpiler.constant(self.limits.ticks)}:")
+        transpiler.line(f"    if not {condition}:")
+        transpiler.line("        break")
+        transpiler.loop(self.body)
+
+class LimitedConcat(Node):
+    # Wraps a '+' that may concatenate: charges the size of every string it builds
+    __slots__ = ('operation', 'limits')
+
+    def __init__(self, operation, limits):
+        self.operation = operation
+        self.limits = limits
+
+    def Evaluate(self, frame, func_table):
+        value, value_type = self.operation.Evaluate(frame, func_table)
+        if value_type == 'str':
+            self.limits.charge(len(value))
+        return (value, value_type)
+
+    def Close(self, closer):
+        operation = self.operation.Close(closer)
+        limits = self.limits
+
+        def charged(frame):
+            value = operation(frame)
+            if type(value) in STRING_TYPES:
+                limits.charge(len(value))
+            return value
+        return charged
+
+    def Transpile(self, transpiler):
+        return f"charge_string({transpiler.constant(self.limits)}, {self.operation.Transpile(transpiler)})"
+
+    def Transform(self, replace):
+        self.operation = self.operation.Transform(replace)
+        return replace(self)
+
+class LimitedProduct(Node):
+    # Wraps a '*' under --max-memory: charges the size of the product before computing it
+    __slots__ = ('operation', 'limits')
+
+    def __init__(self, operation, limits):
+        self.operation = operation
+        self.limits = limits
+
+    def Evaluate(self, frame, func_table):
+        left_val, left_type = self.operation.left.Evaluate(frame, func_table)
+        right_val, right_type = self.operation.right.Evaluate(frame, func_table)
+        if left_type not in ('int', 'bool') or right_type not in ('int', 'bool'):
+            raise Exception("Tipos incompatíveis para '*'")
+        self.limits.charge_product(int(left_val), int(right_val))
+        return (int(left_val) * int(right_val), 'int')
+
+    def Close(self, closer):
+        left = self.operation.left.Close(closer)
+        right = self.operation.right.Close(closer)
+        limits = self.limits
+        return lambda frame: charge_product(limits, left(frame), right(frame))
+
+    def Transpile(self, transpiler):
+        left = self.operation.left.Transpile(transpiler)
+        right = self.operation.right.Transpile(transpiler)
+        return f"charge_product({transpiler.constant(self.limits)}, {left}, {right})"
+
+    def Transform(self, replace):
+        self.operation = self.operation.Transform(replace)
+        return replace(self)
+
+class Limits:
+    # Execution limits for untrusted programs. Steps are function calls and tests of loop
+    # conditions, which bound everything else a program can do; the budget is checked every
+    # LIMIT_CHECK_INTERVAL steps. The timeout is a SIGALRM timer, so a few steps doing a lot
+    # of work cannot outrun it; outside the main thread, where signals cannot be handled,
+    # the clock is checked with the step budget instead. String size is the total number of
+    # characters built by concatenation. Memory is that plus the bytes of every product
+    # larger than FREE_INT_BITS, charged before multiplying, since a single product of huge
+    # integers runs in C for longer than any timeout. Each kind of accounting is added to the
+    # program only when a limit needs it, so a lone --timeout costs nothing.
+    def __init__(self, max_steps=None, timeout=None, max_string_size=None, max_memory=None):
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.max_string_size = max_string_size
+        self.max_memory = max_memory
+        self.deadline = None
+        self.previous_handler = None  # SIGALRM handler to restore once the run ends
+        self.steps = 0
+        self.next_check = 0
+        self.string_size = 0
+        self.memory = 0
+        # The step budget of the tree, closure and Python engines: one item per step, taken
+        # with next() or a 'for' loop, which run in C between two checks
+        self.ticks = itertools.chain.from_iterable(self.budget())
+
+    def counts_steps(self):
+        return self.max_steps is not None or (self.timeout is not None and not self.alarm_available())
+
+    def charges_strings(self):
+        return self.max_string_size is not None or self.max_memory is not None
+
+    def charges_products(self):
+        return self.max_memory is not None
+
+    @staticmethod
+    def alarm_available():
+        return threading.current_thread() is threading.main_thread()
+
+    def start(self):
+        if self.timeout is not None:
+            self.deadline = time.perf_counter() + self.timeout
+            if self.alarm_available():
+                self.previous_handler = signal.signal(signal.SIGALRM, self.expire)
+                signal.setitimer(signal.ITIMER_REAL, self.timeout)
+        self.next_check = self.check(self.steps)
+
+    def stop(self):
+        if self.previous_handler is not None:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self.previous_handler)
+            self.previous_handler = None
+
+    def expire(self, signum, frame):
+        raise TimeLimitExceeded(f"Tempo limite excedido ({self.timeout} s)")
+
+    def check(self, steps):
+        # Returns the step count at which to check again
+        if self.max_steps is not None and steps > self.max_steps:
+            raise StepLimitExceeded(f"Limite de passos excedido ({self.max_steps} passos)")
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            self.expire(None, None)
+        next_check = steps + LIMIT_CHECK_INTERVAL
+        if self.max_steps is not None:
+            next_check = min(next_check, self.max_steps + 1)
+        return next_check
+
+    def budget(self):
+        # The steps up to the next check, then the check of the step that reaches it, as the
+        # VM does with its own counter
+        step = self.steps + 1
+        while True:
+            yield itertools.repeat(None, self.next_check - step)
+            step = self.steps = self.next_check
+            self.next_check = self.check(step)
+
+    def charge(self, size):
+        self.string_size += size
+        if self.max_string_size is not None and self.string_size > self.max_string_size:
+            raise StringLimitExceeded(f"Limite de tamanho de strings excedido ({self.max_string_size} caracteres)")
+        self.charge_memory(size)
+
+    def charge_product(self, left, right):
+        # Called with the int operands of a '*' before it runs: the product has at most the
+        # sum of their sizes
+        bits = left.bit_length() + right.bit_length()
+        if bits > FREE_INT_BITS:
+            self.charge_memory((bits + 7) // 8)
+
+    def charge_memory(self, size):
+        self.memory += size
+        if self.max_memory is not None and self.memory > self.max_memory:
+            raise MemoryLimitExceeded(f"Limite de memória excedido ({self.max_memory} bytes)")
+
+    def instrument(self, program):
+        for func in program.functions:
+            func.body = func.body.Transform(self.wrap)
+            if self.counts_steps():
+                func.body = LimitedFunction(func.body, self)
+
+    def wrap(self, node):
+        if isinstance(node, WhileNode) and self.counts_steps():
+            return LimitedWhile(node, self)
+        if isinstance(node, BinOp) and node.value == '+' and node.type != 'int' and self.charges_strings():
+            return LimitedConcat(node, self)
+        if isinstance(node, BinOp) and node.value == '*' and self.charges_products():
+            return LimitedProduct(node, self)
+        return node
+
+# Default number of results kept per memoized function
+DEFAULT_MEMO_SIZE = 100_000
+
+class MemoTable:
+    # LRU table of the results of one pure function, keyed by its argument values
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def store(self, key, result):
+        self.results[key] = result
+        if len(self.results) > self.size:
+            self.results.popitem(last=False)
+
+    def remember(self, key, result):
+        self.store(key, result)
+        return result
+
+class MemoizedFunction(Block):
+    # Replaces the body of a pure function under --memoize. Like ProfiledFunction it runs
+    # the statements itself, so memoized recursion keeps the depth the tree engine allows;
+    # an already wrapped body becomes its single statement.
+    __slots__ = ('arity', 'table')
+
+    def __init__(self, body, arity, table):
+        super().__init__(body.children if type(body) is Block else [body])
+        self.arity = arity
+        self.table = table
+
+    def Evaluate(self, frame, func_table):
+        # Parameters occupy the first slots of the frame
+        key = tuple(frame[:self.arity])
+        table = self.table
+        if key in table.results:
+            table.hits += 1
+            table.results.move_to_end(key)
+            return table.results[key]
+        table.misses += 1
+        result = None
+        for statement in self.children:
+            result = statement.Evaluate(frame, func_table)
+            if result is not None:
+                break
+        # A tail call comes back with new arguments, whose result is stored instead
+        if result is not TAIL_CALL:
+            table.store(key, result)
+        return result
+
+    def Close(self, closer):
+        statements = [statement.Close(closer) for statement in self.children]
+        arity = self.arity
+        table = self.table
+
+        def memoized(frame):
+            key = tuple(frame[:arity])
+            if key in table.results:
+                table.hits += 1
+                table.results.move_to_end(key)
+                return table.results[key]
+            table.misses += 1
+            result = None
+            for statement in statements:
+                result = statement(frame)
+                if result is not None:
+                    break
+            if result is not TAIL_CALL:
+                table.store(key, result)
+            return result
+        return memoized
+
+    def Transpile(self, transpiler):
+        table = transpiler.constant(self.table)
+        params = "".join(f"v{slot}, " for slot in range(self.arity))
+        transpiler.line(f"memo_key = ({params})")
+        transpiler.line(f"if memo_key in {table}.results:")
+        transpiler.depth += 1
+        transpiler.line(f"{table}.hits += 1")
+        transpiler.line(f"{table}.results.move_to_end(memo_key)")
+        transpiler.line(f"return {table}.results[memo_key]")
+        transpiler.depth -= 1
+        transpiler.line(f"{table}.misses += 1")
+        # Returns inside the body store their value on the way out
+        transpiler.memo = table
+        for statement in self.children:
+            statement.Transpile(transpiler)
+        transpiler.memo = None
+        transpiler.line(f"{table}.store(memo_key, None)")
+
+class Memoizer:
+    # --memoize: caches the results of pure non-void functions, as marked by the Resolver,
+    # in one bounded LRU table per function. 'main' runs once and is never memoized.
+    def __init__(self, size=DEFAULT_MEMO_SIZE):
+        self.size = size
+        self.tables = []
+
+    def instrument(self, program):
+        for func in program.functions:
+            if func.pure and func.return_type != 'void' and func.name != 'main':
+                table = MemoTable(func.name, self.size)
+                func.body = MemoizedFunction(func.body, len(func.params), table)
+                self.tables.append(table)
+
+    def report(self):
+        lines = []
+        for table in self.tables:
+            calls = table.hits + table.misses
+            rate = table.hits / calls if calls else 0.0
+            lines.append(f"memoização de '{table.name}': {table.hits} acerto(s), {table.misses} falha(s), taxa {rate:.1%}")
+        return "\n".join(lines)
+
+ENGINES = ('tree', 'vm', 'closure', 'python')
+
+# Default size cap of the on-disk AST cache, in bytes
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+
+def interpreter_version():
+    # Any change to this file or to the Python version invalidates cached trees
+    with open(__file__, 'rb') as file:
+        digest = hashlib.sha256(file.read()).hexdigest()
+    return f"{sys.implementation.cache_tag}-{digest[:16]}"
+
+class CacheUnpickler(pickle.Unpickler):
+    # Cached trees may have been pickled from '__main__' or from an imported 'main' module;
+    # both map to the node classes of this module, and nothing else may be loaded
+    def find_class(self, module, name):
+        node_class = globals().get(name)
+        if isinstance(node_class, type) and issubclass(node_class, Node):
+            return node_class
+        raise pickle.UnpicklingError(f"Classe não permitida no cache: {module}.{name}")
+
+class ASTCache:
+    # On-disk cache of parsed programs, like __pycache__: each entry is keyed by the hash of
+    # the source plus the interpreter version, and the least recently used entries are
+    # evicted once the directory grows past max_bytes. A long-lived process (a --serve
+    # worker) also keeps entries pickled in memory, up to max_bytes too; its directory may
+    # then be None. Every hit unpickles a fresh tree, since runs modify the tree they get.
+    SUFFIX = '.ast'
+
+    def __init__(self, directory, max_bytes=DEFAULT_CACHE_SIZE, in_memory=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = interpreter_version()
+        self.memory = OrderedDict() if in_memory else None  # Key -> pickled tree
+        self.memory_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def parse(self, file):
+        digest = hashlib.sha256(self.version.encode())
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), ''):
+            digest.update(chunk.encode())
+        key = digest.hexdigest()
+
+        program = self.recall(key)
+        if program is None and self.directory is not None:
+            program = self.load(key)
+        if program is not None:
+            self.hits += 1
+            return program
+
+        self.misses += 1
+        file.seek(0)
+        program = Parser.run(file)
+        self.store(key, program)
+        return program
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ASTCache.SUFFIX)
+
+    def recall(self, key):
+        if self.memory is None or key not in self.memory:
+            return None
+        self.memory.move_to_end(key)
+        return CacheUnpickler(io.BytesIO(self.memory[key])).load()
+
+    def remember(self, key, data):
+        if self.memory is None or len(data) > self.max_bytes:
+            return
+        self.memory[key] = data
+        self.memory_size += len(data)
+        while self.memory_size > self.max_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_size -= len(evicted)
+            self.evictions += 1
+
+    def load(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            return None
+        try:
+            data = zlib.decompress(data)
+            program = CacheUnpickler(io.BytesIO(data)).load()
+        except Exception:
+            # Corrupt or foreign entry: drop it and parse again
+            self.remove(path)
+            return None
+        # Refresh the entry's position in the LRU order
+        os.utime(path)
+        self.remember(key, data)
+        return program
+
+    def store(self, key, program):
+        try:
+            data = pickle.dumps(program, pickle.HIGHEST_PROTOCOL)
+        except RecursionError:
+            # Trees nested too deeply for pickle are simply not cached
+            return
+        self.remember(key, data)
+        if self.directory is None:
+            return
+        path = self.path(key)
+        data = zlib.compress(data, 1)
+        os.makedirs(self.directory, exist_ok=True)
+        # Write then rename, so concurrent runs never read a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(ASTCache.SUFFIX):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            self.evictions += 1
+            total -= size
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def report(self):
+        return f"cache: {self.hits} acerto(s), {self.misses} falha(s), {self.evictions} remoção(ões)"
+
+# A line starting a function declaration; --watch cuts the source into regions at these lines
+FUNCTION_HEADER = re.compile(r"^(?:int|str|void)[ \t]+\w+[ \t]*\(", re.MULTILINE)
+
+# Seconds between checks of the watched file
+WATCH_INTERVAL = 0.05
+
+class WatchRegion:
+    # Functions parsed from one region of the watched source, resolved and optimized, plus
+    # what their resolution depended on: the signature of every function they call
+    def __init__(self, functions, first_line):
+        self.functions = functions
+        self.first_line = first_line
+        self.loops = []  # Loops remember their source line, for the profiler
+        self.calls = []  # Call sites, linked again to their callee on every run
+        self.local_pure = None  # Purity of each function before propagation through calls
+        self.dependencies = None  # Callee name -> signature, set once resolved
+
+class IncrementalParser:
+    # --watch: the source is cut into regions, each starting at a function header, and the
+    # functions of a region whose text is unchanged since the last version are reused as
+    # they are, already resolved and optimized. Only new regions, and regions calling a
+    # function whose signature changed, are tokenized and parsed again. Any error falls
+    # back to a full parse, which reports it exactly as a normal run would.
+    def __init__(self, optimize=True):
+        self.optimize = optimize
+        self.regions = {}  # Region text -> WatchRegion
+        self.reparsed = 0
+
+    @staticmethod
+    def signature(func):
+        # What resolving a call depends on
+        if func is None:
+            return None
+        return (func.return_type, tuple(func.params), func.always_returns)
+
+    def parse(self, source):
+        try:
+            return self.update(source)
+        except Exception:
+            # A region cut inside a comment or string, or an error in the program. The regions
+            # of the last good version stay cached for the next save.
+            program = Parser.run(source)
+            if self.optimize:
+                # No inlining, as in regions: they depend only on the signatures of their callees
+                Optimizer.run(program, inline_size=0)
+            self.reparsed = len(program.functions)
+            return program
+
+    def update(self, source):
+        starts = [match.start() for match in FUNCTION_HEADER.finditer(source)]
+        if not starts or starts[0] != 0:
+            starts.insert(0, 0)
+        starts.append(len(source))
+
+        texts = []
+        regions = []
+        new_regions = []
+        seen = set()
+        line = 1
+        for start, end in zip(starts, starts[1:]):
+            text = source[start:end]
+            region = self.regions.get(text)
+            if region is None or text in seen:
+                region = self.parse_region(text, line)
+                new_regions.append(region)
+            elif region.first_line != line:
+                IncrementalParser.shift_lines(region, line - region.first_line)
+            seen.add(text)
+            texts.append(text)
+            regions.append(region)
+            line += text.count('\n')
+
+        functions = {}
+        for region in regions:
+            for func in region.functions:
+                if func.name in functions:
+                    raise Exception(f"Função '{func.name}' já declarada")
+                functions[func.name] = func
+        if 'main' not in functions:
+            raise Exception("Esperado a função 'main'")
+
+        # Reused regions calling a function whose signature changed are resolved again, from
+        # their text, since optimization may already have dropped code that now fails
+        for index, region in enumerate(regions):
+            if region.dependencies is not None and any(
+                    IncrementalParser.signature(functions.get(name)) != signature
+                    for name, signature in region.dependencies.items()):
+                region = self.parse_region(texts[index], region.first_line)
+                for func in region.functions:
+                    functions[func.name] = func
+                regions[index] = region
+                new_regions.append(region)
+
+        for region in new_regions:
+            for func in region.functions:
+                func.Resolve(SymbolTable(functions))
+            region.local_pure = [func.pure for func in region.functions]
+            region.dependencies = {name: IncrementalParser.signature(functions.get(name))
+                                   for func in region.functions for name in func.callees}
+            if self.optimize:
+                for func in region.functions:
+                    func.Optimize()
+                    func.Transform(Fuser.fuse)
+
+        for region in regions:
+            for func, pure in zip(region.functions, region.local_pure):
+                func.pure = pure
+            # A reused call site may still be linked to the previous version of its callee
+            for call in region.calls:
+                call.func = None
+        Resolver.propagate_purity(functions)
+
+        self.regions = dict(zip(texts, regions))
+        self.reparsed = sum(len(region.functions) for region in new_regions)
+        return Program([func for region in regions for func in region.functions])
+
+    def parse_region(self, text, first_line):
+        region = WatchRegion(Parser(Tokenizer(text, first_line=first_line)).parseFunctions(), first_line)
+
+        def collect(node):
+            if isinstance(node, WhileNode):
+                region.loops.append(node)
+            elif isinstance(node, FuncCall):
+                region.calls.append(node)
+            return node
+
+        for func in region.functions:
+            func.always_returns = Resolver.always_returns(func.body)
+            func.Transform(collect)
+        return region
+
+    @staticmethod
+    def shift_lines(region, delta):
+        for loop in region.loops:
+            loop.line += delta
+        region.first_line += delta
+
+def execute(ast, engine='tree', max_depth=DEFAULT_MAX_DEPTH, io=None, limits=None):
+    io = ProgramIO() if io is None else io
+    try:
+        run_engine(ast, engine, max_depth, io, limits)
+    finally:
+        if limits is not None:
+            limits.stop()
+        # Buffered output is written even when the program fails
+        io.flush()
+
+def run_engine(ast, engine, max_depth, io, limits):
+    if engine == 'vm':
+        functions = Compiler.run(ast, limits)
+        if limits is not None:
+            limits.start()
+        VM(functions, max_depth, io, limits).run()
+        return
+
+    if limits is not None:
+        limits.instrument(ast)
+        limits.start()
+
+    if engine == 'closure':
+        main_func = ClosureCompiler.run(ast, io)['main']
+        if main_func.params:
+            raise Exception("Função 'main' chamada com número incorreto de argumentos")
+        frame = [None] * main_func.frame_size
+        try:
+            while main_func.body(frame) is TAIL_CALL:
+                pass
+        except RecursionError:
+            raise Exception("Profundidade máxima de recursão excedida; use --engine=vm para recursão profunda")
+        return
+
+    if engine == 'python':
+        try:
+            run_python(ast, io)
+        except RecursionError:
+            raise Exception("Profundidade máxima de recursão excedida; use --engine=vm para recursão profunda")
+        return
+
+    # Create the function table; each call allocates its own frame
+    func_table = FuncTable(io)
+
+    # Evaluate the AST (Program node)
+    ast.Evaluate(None, func_table)
+
+    # Start execution by calling 'main' function
+    main_call = FuncCall('main', [])
+    main_call.func = func_table.get('main')
+    if main_call.func.params:
+        raise Exception("Função 'main' chamada com número incorreto de argumentos")
+    try:
+        main_call.Evaluate(None, func_table)
+    except RecursionError:
+        # Each source-level call nests several Python frames in this engine
+        raise Exception("Profundidade máxima de recursão excedida; use --engine=vm para recursão profunda")
+
+def parse_args(argv):
+    arg_parser = argparse.ArgumentParser(description="Interpretador da linguagem da disciplina Lógica da Computação")
+    arg_parser.add_argument('file', nargs='?', help="arquivo fonte a ser executado")
+    arg_parser.add_argument('--engine', choices=ENGINES, default='tree',
+                            help="backend de execução: 'tree' percorre a AST, 'vm' compila para bytecode, "
+                                 "'closure' transforma cada nó em uma closure Python, 'python' traduz o programa "
+                                 "para um módulo Python (padrão: tree)")
+    arg_parser.add_argument('--max-depth', type=int, default=DEFAULT_MAX_DEPTH,
+                            help=f"máximo de chamadas ativas na VM (padrão: {DEFAULT_MAX_DEPTH})")
+    arg_parser.add_argument('--batch', metavar='DIR',
+                            help="executa todos os arquivos .c do diretório; a entrada de x.c vem de x.in, se existir; "
+                                 "código de saída 1 se algum programa terminar com erro")
+    arg_parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                            help="processos usados no modo --batch (padrão: número de CPUs)")
+    arg_parser.add_argument('--results', default='results.jsonl',
+                            help="arquivo JSON lines com o resultado de cada programa no modo --batch (padrão: results.jsonl)")
+    arg_parser.add_argument('--cache-dir', metavar='DIR',
+                            help="guarda as ASTs em DIR e pula a análise léxica e sintática de fontes inalterados")
+    arg_parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                            help=f"tamanho máximo do cache em bytes, com remoção LRU (padrão: {DEFAULT_CACHE_SIZE})")
+    arg_parser.add_argument('--stats', action='store_true',
+                            help="mostra em stderr os acertos e falhas do cache de ASTs e da memoização")
+    arg_parser.add_argument('--no-optimize', dest='optimize', action='store_false',
+                            help="desliga o dobramento de constantes, a remoção de código morto, a eliminação de chamadas de cauda "
+                                 "e a expansão de funções")
+    arg_parser.add_argument('--inline-size', type=int, default=DEFAULT_INLINE_SIZE, metavar='N',
+                            help="expande nas chamadas as funções não recursivas que só retornam uma expressão de até N nós; "
+                                 f"0 desliga, como fazem --profile e --memoize (padrão: {DEFAULT_INLINE_SIZE})")
+    arg_parser.add_argument('--opt-stats', action='store_true',
+                            help="mostra em stderr o número de nós da AST antes e depois da otimização")
+    arg_parser.add_argument('--line-buffered', action='store_true',
+                            help="escreve cada printf e lê cada scanf imediatamente, linha a linha (padrão quando a entrada é um terminal)")
+    arg_parser.add_argument('--profile', nargs='?', const='profile.folded', metavar='FILE',
+                            help="mostra em stderr chamadas e tempo por função e iterações por laço, e grava as pilhas "
+                                 "em FILE no formato do flamegraph (padrão: profile.folded); não disponível com --engine=vm nem com --batch")
+    arg_parser.add_argument('--max-steps', type=int, metavar='N',
+                            help="interrompe o programa após N passos (chamadas de função e iterações de laço); código de saída 3")
+    arg_parser.add_argument('--timeout', type=float, metavar='SEGUNDOS',
+                            help="interrompe o programa após SEGUNDOS de execução; código de saída 4")
+    arg_parser.add_argument('--max-string-size', type=int, metavar='N',
+                            help="interrompe o programa se as concatenações criarem mais de N caracteres no total; código de saída 5")
+    arg_parser.add_argument('--max-memory', type=int, metavar='BYTES',
+                            help="interrompe o programa se as strings concatenadas e os inteiros de mais de "
+                                 f"{FREE_INT_BITS} bits criados por multiplicações somarem mais de BYTES no total; "
+                                 "código de saída 6")
+    arg_parser.add_argument('--memoize', action='store_true',
+                            help="guarda os resultados de funções puras (sem E/S) e os reaproveita em chamadas com os mesmos argumentos")
+    arg_parser.add_argument('--memoize-size', type=int, default=DEFAULT_MEMO_SIZE, metavar='N',
+                            help=f"máximo de resultados guardados por função, com remoção LRU (padrão: {DEFAULT_MEMO_SIZE})")
+    arg_parser.add_argument('--dump-python', action='store_true',
+                            help="mostra o código Python gerado para o programa pela engine 'python', sem executá-lo")
+    arg_parser.add_argument('--watch', action='store_true',
+                            help="executa o programa de novo a cada alteração do arquivo, reanalisando só as funções alteradas")
+    arg_parser.add_argument('--serve', metavar='SOCKET',
+                            help="inicia um servidor que mantém o interpretador carregado e executa em -j processos os "
+                                 "programas recebidos pelo socket Unix SOCKET; --cache-dir e --cache-size valem para todos")
+    arg_parser.add_argument('--connect', metavar='SOCKET',
+                            help="executa o programa no servidor de --serve, com os demais argumentos")
+    arg_parser.add_argument('--server-stats', action='store_true',
+                            help="com --connect, mostra os processos ocupados, a fila e a latência dos programas no servidor")
+    args = arg_parser.parse_args(argv)
+    if args.profile and (args.engine == 'vm' or args.batch):
+        arg_parser.error("--profile não pode ser usado com --engine=vm nem com --batch")
+    if args.watch and (args.batch or args.cache_dir or args.profile or args.memoize or args.max_steps is not None
+                       or args.timeout is not None or args.max_string_size is not None or args.max_memory is not None):
+        # The watched tree is reused between runs, so nothing may instrument it
+        arg_parser.error("--watch não pode ser usado com --batch, --cache-dir, --profile, --memoize nem limites de execução")
+    if args.serve and (args.file or args.connect or args.batch or args.watch):
+        arg_parser.error("--serve não recebe arquivo nem pode ser usado com --connect, --batch ou --watch")
+    if args.connect and (args.batch or args.watch or args.profile):
+        # The program runs in a server process, which writes nothing of its own to disk
+        arg_parser.error("--connect não pode ser usado com --batch, --watch nem --profile")
+    if args.server_stats and not args.connect:
+        arg_parser.error("--server-stats requer --connect")
+    if args.profile or args.memoize:
+        # Both work per function: a function expanded at its call sites is never called
+        args.inline_size = 0
+    return args
+
+def run_file(file_name, args, cache=None):
+    # Runs one source file and returns its exit status; errors go to stderr
+    try:
+        file = open(file_name, 'r')
+    except FileNotFoundError:
+        print(f"Erro: Arquivo '{file_name}' não encontrado.", file=sys.stderr)
+        return 1
+
+    with file:
+        ast = parse_source(file, args, cache)
+    if ast is None:
+        return 1
+    return run_program(ast, args)
+
+def parse_source(file, args, cache=None):
+    # Parses and optimizes a program read from a text stream; errors go to stderr and
+    # return None
+    try:
+        # Run the parser and generate the AST; the tokenizer streams the file
+        # and skips comments itself, so the source is never loaded whole
+        ast = Parser.run(file) if cache is None else cache.parse(file)
+
+        if args.optimize:
+            nodes_before = count_nodes(ast) if args.opt_stats else None
+            Optimizer.run(ast, args.inline_size)
+            if args.opt_stats:
+                print(f"otimização: {nodes_before} nós antes, {count_nodes(ast)} depois", file=sys.stderr)
+    except Exception as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return None
+    return ast
+
+def run_program(ast, args):
+    # Runs a parsed and optimized program and returns its exit status
+    try:
+        if args.dump_python:
+            print(Transpiler.run(ast)[0])
+            return 0
+
+        profiler = None
+        if args.profile:
+            profiler = Profiler()
+            profiler.instrument(ast)
+        memoizer = None
+        if args.memoize:
+            memoizer = Memoizer(args.memoize_size)
+            memoizer.instrument(ast)
+        limits = None
+        if (args.max_steps is not None or args.timeout is not None or args.max_string_size is not None
+                or args.max_memory is not None):
+            limits = Limits(args.max_steps, args.timeout, args.max_string_size, args.max_memory)
+        try:
+            execute(ast, args.engine, args.max_depth, ProgramIO(line_buffered=args.line_buffered), limits)
+        finally:
+            # A failing program still gets the profile of what ran
+            if profiler is not None:
+                print(profiler.report(), file=sys.stderr)
+                profiler.write_collapsed(args.profile)
+            if memoizer is not None and memoizer.tables and args.stats:
+                print(memoizer.report(), file=sys.stderr)
+
+    except LimitExceeded as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return e.exit_code
+    except Exception as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+def watch(args):
+    # --watch: runs the program, then again every time the file is saved, reparsing only
+    # the functions that changed. Ctrl-C stops a running program; another one ends the watch.
+    parser = IncrementalParser(args.optimize)
+    last_version = None
+    try:
+        while True:
+            try:
+                stat = os.stat(args.file)
+                version = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                version = None
+            if version is None or version == last_version:
+                time.sleep(WATCH_INTERVAL)
+                continue
+            last_version = version
+
+            start = time.perf_counter()
+            try:
+                with open(args.file, 'r') as file:
+                    ast = parser.parse(file.read())
+            except Exception as e:
+                print(f"Erro: {e}", file=sys.stderr)
+                continue
+            parsed = time.perf_counter()
+            try:
+                status = run_program(ast, args)
+            except KeyboardInterrupt:
+                print("Execução interrompida", file=sys.stderr)
+                status = 130
+            finished = time.perf_counter()
+            print(f"[watch] análise {(parsed - start) * 1000:.1f} ms ({parser.reparsed} de "
+                  f"{len(ast.functions)} funções reanalisadas), execução {(finished - parsed) * 1000:.1f} ms, "
+                  f"total {(finished - start) * 1000:.1f} ms, código de saída {status}", file=sys.stderr)
+    except KeyboardInterrupt:
+        return 0
+
+def run_batch_job(file_name, args):
+    # Runs in a pool worker: the program gets its own stdin and captured stdout/stderr
+    input_name = os.path.splitext(file_name)[0] + '.in'
+    stdin = open(input_name, 'r') if os.path.exists(input_name) else io.StringIO()
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    cache = ASTCache(args.cache_dir, args.cache_size) if args.cache_dir else None
+    saved = sys.stdin, sys.stdout, sys.stderr
+    sys.stdin, sys.stdout, sys.stderr = stdin, stdout, stderr
+    start = time.perf_counter()
+    try:
+        status = run_file(file_name, args, cache)
+    finally:
+        elapsed = time.perf_counter() - start
+        sys.stdin, sys.stdout, sys.stderr = saved
+        stdin.close()
+    return {
+        'file': file_name,
+        'status': status,
+        'stdout': stdout.getvalue(),
+        'stderr': stderr.getvalue(),
+        'time': round(elapsed, 6),
+        'cache': None if cache is None else ('hit' if cache.hits else 'miss'),
+    }
+
+def run_batch(args):
+    if not os.path.isdir(args.batch):
+        print(f"Erro: Diretório '{args.batch}' não encontrado.", file=sys.stderr)
+        return 1
+    file_names = sorted(os.path.join(args.batch, name) for name in os.listdir(args.batch) if name.endswith('.c'))
+
+    failures = 0
+    cache_results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool, open(args.results, 'w') as results:
+        # Results are written in file order as soon as each one is available
+        for result in pool.map(run_batch_job, file_names, [args] * len(file_names)):
+            results.write(json.dumps(result, ensure_ascii=False) + '\n')
+            failures += result['status'] != 0
+            cache_results.append(result['cache'])
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(file_names)} programas em {elapsed:.2f} s, {failures} com erro; resultados em {args.results}", file=sys.stderr)
+    if args.stats and args.cache_dir:
+        print(f"cache: {cache_results.count('hit')} acerto(s), {cache_results.count('miss')} falha(s)", file=sys.stderr)
+    # Every result is written either way; the status only tells whether any program failed
+    return 1 if failures else 0
+
+# Number of recent jobs whose latency the server reports
+LATENCY_WINDOW = 1000
+
+# The frames of client.py, on the server's asyncio streams
+def write_frame(writer, kind, payload):
+    writer.write(FRAME_HEADER.pack(kind, len(payload)) + payload)
+
+async def read_frame(reader):
+    kind, size = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    return kind, await reader.readexactly(size)
+
+class FrameStream:
+    # sys.stdout or sys.stderr of a job in a worker: every write goes to the server at once
+    def __init__(self, sock, kind):
+        self.sock = sock
+        self.kind = kind
+
+    def write(self, text):
+        if text:
+            send_frame(self.sock, self.kind, text.encode())
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+class FrameInput:
+    # sys.stdin of a job in a worker: every read is answered with the client's stdin
+    def __init__(self, sock, tty):
+        self.sock = sock
+        self.tty = tty  # Whether the client's stdin is a terminal, as ProgramIO asks
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+
+    def read(self, size=-1):
+        return self.request(size)
+
+    def readline(self):
+        return self.request(0)
+
+    def request(self, size):
+        send_frame(self.sock, FRAME_INPUT, str(size).encode())
+        kind, data = receive_frame(self.sock)
+        if kind != FRAME_INPUT_DATA:
+            raise EOFError("EOF when reading a line")
+        return self.decoder.decode(data, final=not data)
+
+    def isatty(self):
+        return self.tty
+
+def serve_job(sock, job, cache):
+    # Runs one job in a worker exactly as main() would run the file from the client's
+    # directory, with stdin read from the client and the output streamed back; returns the
+    # exit status
+    os.chdir(job['cwd'])
+    saved = sys.stdin, sys.stdout, sys.stderr
+    sys.stdin = FrameInput(sock, job['tty'])
+    sys.stdout = FrameStream(sock, FRAME_STDOUT)
+    sys.stderr = FrameStream(sock, FRAME_STDERR)
+    # --stats reports the cache for this job, as for a single local run
+    cache.hits = cache.misses = cache.evictions = 0
+    try:
+        args = parse_args(job['argv'])
+        if not args.file:
+            print("Erro: Nenhum arquivo de entrada fornecido.", file=sys.stderr)
+            status = 1
+        else:
+            status = run_file(args.file, args, cache)
+        if args.stats:
+            print(cache.report(), file=sys.stderr)
+    except SystemExit as e:
+        # Invalid arguments: argparse already wrote the message
+        status = e.code if isinstance(e.code, int) else 1
+    finally:
+        sys.stdin, sys.stdout, sys.stderr = saved
+    return status
+
+def serve_worker(sock, cache):
+    # Forked from the server's event loop: drop its signal handling. Ctrl-C in the server's
+    # terminal stops the server, which then kills the workers.
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        kind, payload = receive_frame(sock)
+        if kind is None:
+            return
+        status = serve_job(sock, json.loads(payload), cache)
+        send_frame(sock, FRAME_EXIT, json.dumps({'status': status}).encode())
+
+class ServerWorker:
+    # A forked worker process, seen from the server through its end of a socket pair
+    def __init__(self, pid, reader, writer):
+        self.pid = pid
+        self.reader = reader
+        self.writer = writer
+
+    def kill(self):
+        self.writer.close()
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+            os.waitpid(self.pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+
+class Server:
+    # --serve: an asyncio server on a Unix socket that hands each job to an idle worker from
+    # a pool forked at startup, so jobs skip starting Python and importing the interpreter.
+    # Workers keep parsed trees in memory (and in --cache-dir, if given) across jobs. A job
+    # whose client disconnects, or whose worker dies, gets its worker replaced.
+    def __init__(self, path, workers, cache_dir=None, cache_size=DEFAULT_CACHE_SIZE):
+        self.path = path
+        self.size = workers
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.workers = set()
+        self.stopping = False
+        self.idle = None  # Queue of idle ServerWorkers, created inside the event loop
+        self.waiting = 0  # Jobs waiting for a worker
+        self.busy = 0
+        self.jobs = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)  # Seconds from request to exit status
+
+    async def run(self):
+        self.idle = asyncio.Queue()
+        for _ in range(self.size):
+            await self.spawn()
+        server = await asyncio.start_unix_server(self.handle, path=self.path)
+        print(f"[serve] {self.size} processo(s) atendendo em {self.path}", file=sys.stderr)
+        stopped = asyncio.get_running_loop().create_future()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopped.set_result, None)
+        try:
+            async with server:
+                await stopped
+        finally:
+            # Busy workers would not notice the server going away
+            self.stopping = True
+            for worker in list(self.workers):
+                self.retire(worker)
+
+    async def spawn(self):
+        parent_sock, child_sock = socket.socketpair()
+        pid = os.fork()
+        if pid == 0:
+            # The child never returns into the server's event loop
+            parent_sock.close()
+            status = 0
+            try:
+                serve_worker(child_sock, ASTCache(self.cache_dir, self.cache_size, in_memory=True))
+            except BaseException:
+                status = 1
+            finally:
+                os._exit(status)
+        child_sock.close()
+        reader, writer = await asyncio.open_connection(sock=parent_sock)
+        worker = ServerWorker(pid, reader, writer)
+        self.workers.add(worker)
+        self.idle.put_nowait(worker)
+
+    def retire(self, worker):
+        worker.kill()
+        self.workers.discard(worker)
+
+    async def handle(self, reader, writer):
+        try:
+            kind, payload = await read_frame(reader)
+            if kind == FRAME_STATS:
+                write_frame(writer, FRAME_STATS_REPLY, json.dumps(self.stats()).encode())
+            elif kind == FRAME_JOB:
+                await self.run_job(payload, reader, writer)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            # The server is stopping
+            pass
+        finally:
+            writer.close()
+
+    async def run_job(self, payload, reader, writer):
+        received = time.perf_counter()
+        self.waiting += 1
+        try:
+            worker = await self.idle.get()
+        finally:
+            self.waiting -= 1
+        started = time.perf_counter()
+        self.busy += 1
+        # Frames are relayed both ways until the worker reports the exit status; the client
+        # only sends stdin, so its connection closing means nobody waits for the job anymore
+        from_client = asyncio.ensure_future(read_frame(reader))
+        from_worker = asyncio.ensure_future(read_frame(worker.reader))
+        completed = False
+        try:
+            write_frame(worker.writer, FRAME_JOB, payload)
+            while True:
+                await asyncio.wait({from_client, from_worker}, return_when=asyncio.FIRST_COMPLETED)
+                if from_worker.done():
+                    try:
+                        kind, data = from_worker.result()
+                    except asyncio.IncompleteReadError:
+                        self.retire(worker)
+                        worker = None
+                        write_frame(writer, FRAME_STDERR, "Erro: o processo do servidor terminou inesperadamente\n".encode())
+                        kind, data = FRAME_EXIT, json.dumps({'status': 1}).encode()
+                    if kind == FRAME_EXIT:
+                        completed = True
+                        break
+                    write_frame(writer, kind, data)
+                    await writer.drain()
+                    from_worker = asyncio.ensure_future(read_frame(worker.reader))
+                if from_client.done():
+                    kind, data = from_client.result()
+                    if kind == FRAME_INPUT_DATA:
+                        write_frame(worker.writer, kind, data)
+                    from_client = asyncio.ensure_future(read_frame(reader))
+            finished = time.perf_counter()
+            self.jobs += 1
+            self.latencies.append(finished - received)
+            result = json.loads(data)
+            result['queued'] = started - received
+            result['elapsed'] = finished - started
+            write_frame(writer, FRAME_EXIT, json.dumps(result).encode())
+        finally:
+            from_client.cancel()
+            from_worker.cancel()
+            self.busy -= 1
+            if worker is not None and not completed:
+                # Still running a job nobody is waiting for
+                self.retire(worker)
+                worker = None
+            if worker is None:
+                if not self.stopping:
+                    await self.spawn()
+            else:
+                self.idle.put_nowait(worker)
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction):
+            return round(latencies[round(fraction * (len(latencies) - 1))] * 1000, 3) if latencies else None
+
+        return {
+            'workers': self.size,
+            'busy': self.busy,
+            'queue': self.waiting,
+            'jobs': self.jobs,
+            'latency_ms': {
+                'last': round(self.latencies[-1] * 1000, 3) if latencies else None,
+                'mean': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': percentile(1.0),
+            },
+        }
+
+def serve(args):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(args.serve)
+    except (FileNotFoundError, ConnectionRefusedError):
+        pass
+    else:
+        print(f"Erro: já há um servidor atendendo em '{args.serve}'", file=sys.stderr)
+        return 1
+    finally:
+        probe.close()
+    if os.path.exists(args.serve):
+        # Left behind by a server that was killed
+        os.remove(args.serve)
+
+    # Workers change to each client's directory
+    cache_dir = os.path.abspath(args.cache_dir) if args.cache_dir else None
+    server = Server(args.serve, max(1, args.jobs), cache_dir, args.cache_size)
+    try:
+        asyncio.run(server.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(args.serve):
+            os.remove(args.serve)
+    return 0
+
+def main():
+    args = parse_args(sys.argv[1:])
+    if args.batch:
+        sys.exit(run_batch(args))
+    if args.serve:
+        sys.exit(serve(args))
+    if args.connect:
+        sys.exit(connect(sys.argv[1:]))
+
+    if not args.file:
+        print("Erro: Nenhum arquivo de entrada fornecido.", file=sys.stderr)
+        sys.exit(1)
+    if args.watch:
+        sys.exit(watch(args))
+
+    cache = ASTCache(args.cache_dir, args.cache_size) if args.cache_dir else None
+    status = run_file(args.file, args, cache)
+    if args.stats and cache is not None:
+        print(cache.report(), file=sys.stderr)
+    if status:
+        sys.exit(status)
 
 if __name__ == "__main__":
     main()